@@ -0,0 +1,129 @@
+"""Benchmarks the roster downloader against a local mock roster server.
+
+The pages in testdata/ are served from localhost with a fixed delay per
+response, then downloaded with download_roster_webpages.iter_webpage_content()
+over each transport:
+  requests: The requests module, HTTP/1.1 with a connection per request.
+  http1: An httpx client, HTTP/1.1 with pooled connections.
+  http2: An httpx client, HTTP/2 multiplexed over one connection.
+
+The httpx transports need:
+pip install --user httpx[http2]
+"""
+import argparse
+import logging
+import time
+
+import download_roster_webpages
+from util import concurrency
+from util import http2_transport
+from util import mock_roster_server
+
+LOGGER = None
+TRANSPORTS = ('requests', 'http1', 'http2')
+
+
+def _make_transport(name):
+  if name == 'requests':
+    return None
+  return http2_transport.HttpxTransport(http2=name == 'http2',
+                                        prior_knowledge=name == 'http2')
+
+
+def run_benchmark(name, pages, requests_count, workers, delay_seconds):
+  """Downloads pages from a mock server over one transport.
+
+  Arguments:
+    name: A string of the transport, one of TRANSPORTS.
+    pages: A dict of {page name: bytes} to serve.
+    requests_count: An int of how many pages to download.
+    workers: An int of how many downloads run at the same time.
+    delay_seconds: A number of seconds the server waits before each response.
+
+  Returns:
+    A dict of the benchmark results.
+  """
+  names = sorted(pages)
+  with mock_roster_server.MockRosterServer(
+      pages, delay_seconds, http2=name == 'http2') as server:
+    urls = ['%s/%d/%s' % (server.base_url, i, names[i % len(names)])
+            for i in range(requests_count)]
+    transport = _make_transport(name)
+    download_roster_webpages.TRANSPORT = transport
+    start = time.time()
+    received = failed = 0
+    try:
+      for _, _, content in download_roster_webpages.iter_webpage_content(
+          urls, urls, workers=workers):
+        if content is None:
+          failed += 1
+        else:
+          received += len(content)
+    finally:
+      download_roster_webpages.TRANSPORT = None
+      if transport:
+        transport.close()
+    seconds = time.time() - start
+  return {
+    'transport': name,
+    'seconds': round(seconds, 3),
+    'pages_per_second': round(requests_count / seconds, 1),
+    'megabytes': round(received / 1e6, 1),
+    'connections': server.connections,
+    'failed': failed,
+  }
+
+
+def main():
+  download_roster_webpages.LOGGER = LOGGER
+  # The mock server is local, so don't rate limit or throttle it.
+  download_roster_webpages.SCHEDULER.rate = 1e6
+  download_roster_webpages.SCHEDULER.burst = 1e6
+  download_roster_webpages.LIMITER = concurrency.AimdLimiter(
+      initial=flags.workers, maximum=flags.workers, slow_seconds=None)
+  download_roster_webpages.OPTIONS.early_abort = not flags.full_pages
+  pages = mock_roster_server.read_pages(flags.testdata_dir)
+
+  transports = [t.strip() for t in flags.transports.split(',')]
+  if not http2_transport.available():
+    LOGGER.warning('httpx and h2 are not installed, only benchmarking '
+                   'requests')
+    transports = ['requests']
+  print('%-10s %8s %8s %8s %12s %7s' % ('transport', 'seconds', 'pages/s',
+                                          'MB', 'connections', 'failed'))
+  for name in transports:
+    result = run_benchmark(name, pages, flags.requests, flags.workers,
+                           flags.delay_ms / 1000)
+    print('%-10s %8.3f %8.1f %8.1f %12d %7d' % (
+        result['transport'], result['seconds'], result['pages_per_second'],
+        result['megabytes'], result['connections'], result['failed']))
+
+
+def _set_arguments():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--testdata_dir', metavar='DIR', default='testdata',
+                      help='The directory of saved roster pages to serve.')
+  parser.add_argument('--transports', default=','.join(TRANSPORTS),
+                      help='A comma-separated list of the transports to '
+                        'benchmark: {}.'.format(', '.join(TRANSPORTS)))
+  parser.add_argument('--requests', metavar='N', type=int, default=200,
+                      help='How many pages to download with each transport.')
+  parser.add_argument('--workers', metavar='N', type=int, default=16,
+                      help='How many pages are downloaded at the same time.')
+  parser.add_argument('--delay_ms', metavar='MS', type=float, default=50,
+                      help='How long the server waits before each response.')
+  parser.add_argument('--full_pages', action='store_true',
+                      help='Download whole pages instead of stopping once the '
+                        'roster section has been received.')
+  return parser.parse_args()
+
+
+def _set_logger():
+  logging.basicConfig(level=logging.WARNING)
+  return logging.getLogger(__name__)
+
+
+if __name__ == '__main__':
+  flags = _set_arguments()
+  LOGGER = _set_logger()
+  main()
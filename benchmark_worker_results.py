@@ -0,0 +1,137 @@
+"""Benchmarks how parsed teams are sent back from the parser worker processes.
+
+The pages in testdata/ are parsed once, then each team is sent the way a
+worker would send it, through pickle, and read back the way the parent reads
+it:
+  pickle: The list of player dicts is pickled.
+  columnar: The players are packed into one buffer with util/columnar.py,
+      and the parent reads them with a ColumnarTable.
+For each, the time the worker spends packing the team, the time the parent
+spends receiving it, and the time the parent spends writing its CSV rows with
+convert_roster_webpages_to_csv.set_csv_rows() are measured, in microseconds
+per team.
+"""
+import argparse
+import logging
+import os
+import pickle
+import time
+
+import convert_roster_webpages_to_csv
+import ncaa_roster_parser
+from util import columnar
+
+LOGGER = None
+METHODS = ('pickle', 'columnar')
+
+
+def _send_pickle(team):
+  return pickle.dumps(team, pickle.HIGHEST_PROTOCOL)
+
+
+def _receive_pickle(data):
+  return pickle.loads(data)
+
+
+def _send_columnar(team):
+  return pickle.dumps(columnar.encode(team, ncaa_roster_parser.FIELDS),
+                      pickle.HIGHEST_PROTOCOL)
+
+
+def _receive_columnar(data):
+  return columnar.ColumnarTable(pickle.loads(data))
+
+
+def _write_csv_rows(team):
+  return convert_roster_webpages_to_csv.set_csv_rows(
+      ['school'], [''], [''], [''], [''], [''], [''], {'school': team})
+
+
+def _time(function, args, repeat):
+  """Returns the mean number of microseconds of a call of a function on each
+  of the args, and the last result."""
+  start = time.perf_counter()
+  for _ in range(repeat):
+    results = [function(arg) for arg in args]
+  seconds = time.perf_counter() - start
+  return seconds / repeat / len(args) * 1e6, results
+
+
+def run_benchmark(name, teams, repeat):
+  """Sends teams through pickle one way and reads them back.
+
+  Arguments:
+    name: A string of the method, one of METHODS.
+    teams: A list of the lists of player dicts to send.
+    repeat: An int of how many times every team is sent.
+
+  Returns:
+    A dict of the benchmark results.
+  """
+  send, receive = {
+    'pickle': (_send_pickle, _receive_pickle),
+    'columnar': (_send_columnar, _receive_columnar),
+  }[name]
+  send_us, sent = _time(send, teams, repeat)
+  receive_us, _ = _time(receive, sent, repeat)
+  # Tables decode their values once, so each read is of a new table.
+  received = [[receive(data) for data in sent] for _ in range(repeat)]
+  read_us = 0
+  for tables in received:
+    read_us += _time(_write_csv_rows, tables, 1)[0] / repeat
+  return {
+    'method': name,
+    'send_us': round(send_us, 1),
+    'receive_us': round(receive_us, 1),
+    'read_us': round(read_us, 1),
+    'total_us': round(send_us + receive_us + read_us, 1),
+    'bytes': sum(len(data) for data in sent) // len(sent),
+  }
+
+
+def _parse_teams(testdata_dir):
+  """Returns a list of the non-empty teams of the pages of a directory."""
+  teams = []
+  for filename in sorted(os.listdir(testdata_dir)):
+    if not filename.endswith('.webpage'):
+      continue
+    with open(os.path.join(testdata_dir, filename), 'rb') as fo:
+      webpage = fo.read()
+    result = convert_roster_webpages_to_csv._parse_school_page(
+        filename, webpage, '')
+    if result and result[1]:
+      teams.append(result[1])
+  return teams
+
+
+def main():
+  convert_roster_webpages_to_csv.LOGGER = LOGGER
+  teams = _parse_teams(flags.testdata_dir)
+  print('%d teams, %d players' % (len(teams), sum(len(t) for t in teams)))
+  print('%-10s %10s %12s %9s %10s %7s' % ('method', 'send us', 'receive us',
+                                          'csv us', 'total us', 'bytes'))
+  for name in METHODS:
+    result = run_benchmark(name, teams, flags.repeat)
+    print('%-10s %10.1f %12.1f %9.1f %10.1f %7d' % (
+        result['method'], result['send_us'], result['receive_us'],
+        result['read_us'], result['total_us'], result['bytes']))
+
+
+def _set_arguments():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--testdata_dir', metavar='DIR', default='testdata',
+                      help='The directory of saved roster pages to parse.')
+  parser.add_argument('--repeat', metavar='N', type=int, default=200,
+                      help='How many times every team is sent.')
+  return parser.parse_args()
+
+
+def _set_logger():
+  logging.basicConfig(level=logging.ERROR)
+  return logging.getLogger(__name__)
+
+
+if __name__ == '__main__':
+  flags = _set_arguments()
+  LOGGER = _set_logger()
+  main()
@@ -7,59 +7,50 @@ Data is saved to a local .csv file.
 These modules are required:
 pip install --user google
 pip install --user wikitables
+They are only imported to search and to fetch the Wikipedia article.
+
+The Wikipedia program table is saved into a local snapshot file, so repeated
+runs don't fetch it again. Use --offline to always read the snapshot.
 """
 
 import argparse
-from googlesearch import search
 import logging
+import os
 import re
 from urllib.parse import urlparse, urlunparse, parse_qs
-from wikitables import import_tables
+
+from util import crawl_checkpoint
+from util import lib_wiki
+from util import query_cache
+from util import queue_logging
+from util import roster_file_util
+from util import run_report
 
 LOGFILE = '/tmp/collect_roster_urls.log'
+REPORT_FILE = '/tmp/collect_roster_urls_report.json'
+QUERY_CACHE_FILE = 'google_query_cache.json'
+WIKI_SNAPSHOT_FILE = 'wikipedia_snapshot.json'
 LOGGER = None
+REPORT = run_report.RunReport('collect')
 
 
 def _clean_text(text):
-  """Cleans raw text from the Wikipedia table.
+  """Cleans the raw text of a single Wikipedia table cell.
 
-  Replaces any non-ASCII character with a space.
-  Converts em dashes to regular dash.
-  Removes all bracketed text, like footnote links (e.g, [a])
-  
   Args:
     text: A string of the text to clean.
-  
+
   Returns:
     A string of the clean text.
   """
-  # Format the text of each table cell by removing non-ascii characters
-  # and ignoring text after comment/formatting characters.
-  clean_text = ''
-  open_bracket = False
-  for c in text:
-    if c in '>]}': open_bracket = False
-    elif open_bracket: continue
-    elif c in '{[<': open_bracket = True
-    elif c == '–': clean_text += '-'
-    elif ord(c) > 128: clean_text += ' '
-    else: clean_text += c
-  clean_text = clean_text.strip()
-  # The wikitables module unfortunately includes all citation text if a table
-  # cell includes a link to one in the wiki page. This is a cheat to fix some
-  # institution name table cells at the time of running this script (Nov. 2019)
-  if clean_text.startswith('California Baptist'):
-    clean_text = 'California Baptist'
-  if clean_text.startswith('Merrimack'):
-    clean_text = 'Merrimack'
-  return clean_text
+  return lib_wiki.CleanCells([text], keep_trailing_text=True)[0]
 
 
 def _parse_school_data(programs, schools_filter):
   """Converts a list of wiki table rows into a dict.
 
   Args:
-    programs: A list of wiki table rows.
+    programs: A list of wiki table rows, each a dict of {column: raw text}.
     schools_filter: A list of school names. If provided, only the school names
         in the filter list are returned.
 
@@ -69,17 +60,18 @@ def _parse_school_data(programs, schools_filter):
       Value: A dict of attributes about the school. Each wiki table column
           is the key of this dict.
   """
+  programs = [p for p in programs if 'Institution' in p]
+  clean_values = iter(lib_wiki.CleanCells(
+      [val for program in programs for val in program.values()],
+      keep_trailing_text=True))
   schools = {}
   for program in programs:
-    if 'Institution' in program:
-      school_name = _clean_text(program['Institution'].value)
-      rowData = {}
-      if schools_filter and school_name not in schools_filter:
-        # Skip if not in the filter
-        continue
-      for col_name in program.keys():
-        rowData[col_name] = _clean_text(program[col_name].value)
-      schools[rowData['Institution']] = rowData
+    rowData = {col_name: next(clean_values) for col_name in program.keys()}
+    rowData['Institution'] = lib_wiki.CutCitedName(rowData['Institution'])
+    if schools_filter and rowData['Institution'] not in schools_filter:
+      # Skip if not in the filter
+      continue
+    schools[rowData['Institution']] = rowData
   return schools
 
 
@@ -114,23 +106,121 @@ def _standardize_url(url):
   return url
 
 
-def _search_for_roster_urls(schools):
+def _search_results(query, cache=None, refresh=False):
+  """Yields the Google search results for the query.
+
+  Results are read from the cache when it has a valid entry for the query.
+  Otherwise the results that were consumed by the caller are saved into the
+  cache once the caller stops iterating. A cache entry records if the search
+  finished, and the search is sent again when a caller reads past the end of
+  the results of an unfinished one. Results of a failed search are not
+  cached.
+
+  Args:
+    query: A string of the search query.
+    cache: An optional query_cache.QueryCache instance.
+    refresh: If True, the cached results are not read, e.g. because they led
+        to a broken url, but the new results are cached.
+  """
+  cached = None
+  if cache and not refresh:
+    cached = cache.get(query)
+  if isinstance(cached, dict) and cached.get('complete'):
+    REPORT.increment('cache_hits')
+    yield from cached['results']
+    return
+  results = []
+  if isinstance(cached, dict):
+    # The results up to the url an earlier run stopped at.
+    REPORT.increment('cache_hits')
+    results = list(cached['results'])
+    yield from results
+  from googlesearch import search
+  REPORT.increment('searches_sent')
+  # The search starts over, so the results read from the cache are skipped.
+  skipped = len(results)
+  try:
+    for url in search(query=query, num=1, stop=10):
+      REPORT.increment('search_results')
+      if skipped:
+        skipped -= 1
+        continue
+      results.append(url)
+      yield url
+  except GeneratorExit:
+    # The caller found the roster url it was looking for.
+    if cache:
+      cache.put(query, {'results': results, 'complete': False})
+    raise
+  if cache:
+    cache.put(query, {'results': results, 'complete': True})
+
+
+def _search_for_roster_urls(schools, cache=None, refresh=()):
   """Searches Google for the roster URL of each school.
 
   Modifies the input dict by adding a 'Url' field.
 
   Args:
     schools: A dict of school data.
+    cache: An optional query_cache.QueryCache of previous search results.
+    refresh: A collection of schools whose cached search results are not
+        used, e.g. because their url from an earlier run is broken.
   """
   for school in schools.keys():
     q = "{} women's soccer roster".format(school)
-    for url in search(query=q, num=1, stop=10):
+    results = _search_results(q, cache, school in refresh)
+    for url in results:
       if any([s in url for s in ['roster.aspx', 'SportSelect', 'wsoc',
                                  'w-soccer', 'womens-soccer']]):
         schools[school]['Url'] = _standardize_url(url)
         break
+    results.close()
     if 'Url' not in schools[school]:
       LOGGER.warning('No roster url found for {}'.format(school))
+      REPORT.increment('schools_without_url')
+    else:
+      REPORT.increment('schools_with_url')
+
+
+def _merge_existing_urls(schools, existing_schools, broken_schools):
+  """Copies the roster URLs found by a previous run into the school data.
+
+  Args:
+    schools: A dict of school data. Schools with a usable URL from the previous
+        run get a 'Url' field.
+    existing_schools: A dict of school data read from the previous output file.
+    broken_schools: A list of schools whose roster URL failed to download.
+
+  Returns:
+    A list of the schools that are new, or whose URL is missing or broken, and
+    still need to be searched for.
+  """
+  to_search = []
+  for school, data in schools.items():
+    url = existing_schools.get(school, {}).get('Url')
+    if url and school not in broken_schools:
+      data['Url'] = url
+    else:
+      to_search.append(school)
+  return to_search
+
+
+def _write_csv(schools, output_file):
+  """Writes the school data in CSV format.
+
+  Args:
+    schools: A dict of school data.
+    output_file: A string of the file name to write into.
+  """
+  col_names = []
+  for data in schools.values():
+    col_names.extend(c for c in data if c not in col_names)
+  with open(output_file, 'w') as fw:
+    # First write out column headers
+    fw.write(','.join(col_names) + '\n')
+    for data in schools.values():
+      fw.write(','.join(data.get(c, '') for c in col_names) + '\n')
 
 
 def main():
@@ -139,35 +229,99 @@ def main():
     schools_filter = flags.schools.split(',')
     LOGGER.debug('Only saving these schools: {}'.format(str(schools_filter)))
 
-  # Get the list of schools from Wikipedia
-  # https://en.wikipedia.org/wiki/List_of_NCAA_Division_I_women%27s_soccer_programs
-  wikiTables = import_tables("List of NCAA Division I women's soccer programs")
+  try:
+    # Get the list of schools from Wikipedia
+    # https://en.wikipedia.org/wiki/List_of_NCAA_Division_I_women%27s_soccer_programs
+    with REPORT.timer('wikipedia'):
+      programs = lib_wiki.ImportArticleRows(
+          lib_wiki.ARTICLE_TITLE, flags.wiki_snapshot,
+          flags.wiki_snapshot_days * 86400, flags.offline)
 
-  schools = _parse_school_data(wikiTables[0].rows, schools_filter)
-  _search_for_roster_urls(schools)
+    schools = _parse_school_data(programs, schools_filter)
+    REPORT.increment('schools', len(schools))
 
-  # Write data in CSV format
-  with open(flags.output_file, 'w') as fw:
-    # First write out column headers
-    col_names = next(iter(schools.values()))
-    fw.write(','.join(col_names.keys()) + '\n')
-    for data in schools.values():
-      fw.write(','.join(data.values()) + '\n')
+    existing_schools = {}
+    to_search = list(schools.keys())
+    if flags.incremental and os.path.exists(flags.output_file):
+      existing_schools = roster_file_util.read_school_rows(flags.output_file)
+      broken_schools = []
+      if flags.checkpoint_file and os.path.exists(flags.checkpoint_file):
+        broken_schools = crawl_checkpoint.CrawlCheckpoint(
+            flags.checkpoint_file).failed_schools()
+      to_search = _merge_existing_urls(schools, existing_schools,
+                                       broken_schools)
+      LOGGER.debug('Searching for %d new or broken schools', len(to_search))
 
+    cache = None
+    if flags.query_cache:
+      cache = query_cache.QueryCache(flags.query_cache,
+                                     flags.query_cache_days * 86400)
+    # Schools of the previous run are only searched again because their url
+    # is missing or broken, which the cached results would give again.
+    refresh = set(s for s in to_search if s in existing_schools)
+    with REPORT.timer('search'):
+      _search_for_roster_urls({s: schools[s] for s in to_search}, cache,
+                              refresh)
 
-if __name__ == '__main__':
-  parser = argparse.ArgumentParser()
+    # Schools from the previous output file that weren't collected this time
+    # are kept.
+    existing_schools.update(schools)
+    _write_csv(existing_schools, flags.output_file)
+  finally:
+    REPORT.write(flags.report_file)
+
+
+def _set_arguments(argv=None, prog=None):
+  parser = argparse.ArgumentParser(prog=prog)
   parser.add_argument('-o', '--output_file', metavar='FILENAME',
                       default='ncaa_d1_womens_soccer_programs.csv',
                       help='The filename to output the csv data.')
   parser.add_argument('--schools', metavar='SCHOOL 1,SCHOOL 2,SCHOOL 3',
                       help='A comma-separated list of schools to output.')
-  flags = parser.parse_args()
+  parser.add_argument('--incremental', action='store_true',
+                      help='Merge with the existing output file and only '
+                        'search for schools that are new, or whose roster url '
+                        'is missing or failed to download.')
+  parser.add_argument('--checkpoint_file', metavar='FILENAME',
+                      help='The crawl checkpoint manifest written by '
+                        'download_roster_webpages.py. In --incremental mode, '
+                        'schools that failed to download are searched again.')
+  parser.add_argument('--query_cache', metavar='FILENAME',
+                      default=QUERY_CACHE_FILE,
+                      help='The file to cache Google search results in. Use '
+                        'an empty string to disable the cache.')
+  parser.add_argument('--query_cache_days', metavar='DAYS', type=float,
+                      default=30,
+                      help='How many days cached search results stay valid.')
+  parser.add_argument('--wiki_snapshot', metavar='FILENAME',
+                      default=WIKI_SNAPSHOT_FILE,
+                      help='The file to save a snapshot of the Wikipedia '
+                        'program table in. Use an empty string to always '
+                        'fetch the table.')
+  parser.add_argument('--wiki_snapshot_days', metavar='DAYS', type=float,
+                      default=7,
+                      help='How many days the Wikipedia snapshot stays valid.')
+  parser.add_argument('--offline', action='store_true',
+                      help='Read the Wikipedia program table from the '
+                        'snapshot, regardless of its age, instead of '
+                        'fetching it.')
+  parser.add_argument('--report_file', metavar='FILENAME',
+                      default=REPORT_FILE,
+                      help='The file to write the JSON run report into.')
+  return parser.parse_args(argv)
+
+
+def _set_logger():
   fmt = '%(asctime)s,%(msecs)-3d %(levelname)-8s %(filename)s:%(lineno)d -> %(message)s'
-  logging.basicConfig(level=logging.DEBUG,
-                      format=fmt,
-                      datefmt='%m-%d %H:%M:%S',
-                      filename=LOGFILE,
-                      filemode='w')
-  LOGGER = logging.getLogger(__name__)
+  queue_logging.basic_config(level=logging.DEBUG,
+                             format=fmt,
+                             datefmt='%m-%d %H:%M:%S',
+                             filename=LOGFILE,
+                             filemode='w')
+  return logging.getLogger(__name__)
+
+
+if __name__ == '__main__':
+  flags = _set_arguments()
+  LOGGER = _set_logger()
   main()
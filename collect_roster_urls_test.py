@@ -4,15 +4,13 @@
 The parameterized module is required:
 pip install -q parameterized
 """
-from collections import namedtuple
 from parameterized import parameterized
 import unittest
+from unittest.mock import MagicMock
 from unittest.mock import patch
 
 import collect_roster_urls
 
-WikiData = namedtuple('WikiData', ['value'])
-
 class CollectRosterUrlsTest(unittest.TestCase):
 
   @parameterized.expand([
@@ -25,18 +23,18 @@ class CollectRosterUrlsTest(unittest.TestCase):
     self.assertEqual(expected, actual)
 
   # Test data for test_parse_school_data
-  test1_programs = [{'Institution': WikiData('Alabama A&M'),
-                     'Location':    WikiData('Normal'),
-                     'State':       WikiData('Alabama'),
-                     'Type':        WikiData('Public'),
-                     'Nickname':    WikiData('Bulldogs'),
-                     'Conference':  WikiData('SWAC')},
-                    {'Institution': WikiData('Arkansas–Pine Bluff'),
-                     'Location':    WikiData('Pine Bluff'),
-                     'State':       WikiData('Arkansas'),
-                     'Type':        WikiData('Public'),
-                     'Nickname':    WikiData('Golden Lady Lions'),
-                     'Conference':  WikiData('SWAC')}]
+  test1_programs = [{'Institution': 'Alabama A&M',
+                     'Location':    'Normal',
+                     'State':       'Alabama',
+                     'Type':        'Public',
+                     'Nickname':    'Bulldogs',
+                     'Conference':  'SWAC'},
+                    {'Institution': 'Arkansas–Pine Bluff',
+                     'Location':    'Pine Bluff',
+                     'State':       'Arkansas',
+                     'Type':        'Public',
+                     'Nickname':    'Golden Lady Lions',
+                     'Conference':  'SWAC'}]
   test1_filter = []
   test1_expected = {'Alabama A&M':         {'Institution': 'Alabama A&M',
                                             'Location':    'Normal',
@@ -50,20 +48,20 @@ class CollectRosterUrlsTest(unittest.TestCase):
                                             'Type':        'Public',
                                             'Nickname':    'Golden Lady Lions',
                                             'Conference':  'SWAC'}}
-  test2_programs = [{'Institution': WikiData('BYU'),
-                     'Location':    WikiData('Provo'),
-                     'State':       WikiData('Utah')},
-                    {'Institution': WikiData('LIU[c]'),
-                     'Location':    WikiData('Brookville[d]'),
-                     'State':       WikiData('New York')},
-                    {'Institution': WikiData('Louisiana–Monroe'),
-                     'Location':    WikiData('Monroe'),
-                     'State':       WikiData('Louisiana')}]
+  test2_programs = [{'Institution': 'BYU',
+                     'Location':    'Provo',
+                     'State':       'Utah'},
+                    {'Institution': 'LIU[c]',
+                     'Location':    'Brookville[d]',
+                     'State':       'New York'},
+                    {'Institution': 'Louisiana–Monroe',
+                     'Location':    'Monroe',
+                     'State':       'Louisiana'}]
   test2_filter = ['LIU']
   test2_expected = {'LIU': {'Institution': 'LIU',
                             'Location':    'Brookville',
                             'State':       'New York'}}
-  test3_programs = [{'School': WikiData('Hard Knocks')}]
+  test3_programs = [{'School': 'Hard Knocks'}]
   test3_filter = []
   test3_expected = {}
   @parameterized.expand([
@@ -75,6 +73,14 @@ class CollectRosterUrlsTest(unittest.TestCase):
     actual = collect_roster_urls._parse_school_data(programs, filter)
     self.assertEqual(expected, actual)
 
+  def test_parse_school_data_cited_name(self):
+    programs = [{'Institution': 'Merrimack[c] citation text',
+                 'Nickname': 'Merrimack Warriors'}]
+    actual = collect_roster_urls._parse_school_data(programs, ['Merrimack'])
+    self.assertEqual({'Merrimack': {'Institution': 'Merrimack',
+                                    'Nickname': 'Merrimack Warriors'}},
+                     actual)
+
   # Test 1 processing multiple urls
   searchtest1_in = {'Pepperdine': {'Institution': 'Pepperdine',
                                    'Conference':  'West Coast'},
@@ -153,7 +159,7 @@ class CollectRosterUrlsTest(unittest.TestCase):
     (searchtest2_in, searchtest2_ex, searchtest2_ret, searchtest2_esc, searchtest2_elc),
     (searchtest3_in, searchtest3_ex, searchtest3_ret, searchtest3_esc, searchtest3_elc),
   ])
-  @patch('collect_roster_urls.search')
+  @patch('googlesearch.search')
   @patch('collect_roster_urls.LOGGER')
   def test_search_for_roster_urls(self, input, expected, mock_search_result,
                                   expected_search_count, expected_logger_count,
@@ -165,6 +171,108 @@ class CollectRosterUrlsTest(unittest.TestCase):
     self.assertEqual(expected_search_count, mock_search.call_count)
     self.assertEqual(expected_logger_count, mock_logger.warning.call_count)
 
+  @patch('googlesearch.search')
+  @patch('collect_roster_urls.LOGGER')
+  def test_search_for_roster_urls_uses_cache(self, mock_logger, mock_search):
+    mock_search.return_value = iter(['https://tcu.frogs/wbball/team.html',
+                                     'https://tcu.frogs/wsoc/team.html',
+                                     'https://tcu.frogs/wsoc/news.html'])
+    mock_cache = MagicMock()
+    mock_cache.get.return_value = None
+    schools = {'TCU': {'Institution': 'TCU'}}
+    collect_roster_urls._search_for_roster_urls(schools, mock_cache)
+    self.assertEqual('https://tcu.frogs/wsoc/team.html', schools['TCU']['Url'])
+    # The search stopped at the roster url, so the results are not complete.
+    mock_cache.put.assert_called_once_with(
+        "TCU women's soccer roster",
+        {'results': ['https://tcu.frogs/wbball/team.html',
+                     'https://tcu.frogs/wsoc/team.html'],
+         'complete': False})
+
+    mock_cache.get.return_value = {
+        'results': ['https://tcu.frogs/wsoc/team.html'], 'complete': False}
+    schools = {'TCU': {'Institution': 'TCU'}}
+    collect_roster_urls._search_for_roster_urls(schools, mock_cache)
+    self.assertEqual('https://tcu.frogs/wsoc/team.html', schools['TCU']['Url'])
+    self.assertEqual(1, mock_search.call_count)
+
+  @patch('googlesearch.search')
+  @patch('collect_roster_urls.LOGGER')
+  def test_search_for_roster_urls_partial_cache(self, mock_logger,
+                                                mock_search):
+    mock_search.return_value = iter(['https://tcu.frogs/wbball/team.html',
+                                     'https://tcu.frogs/wsoc/team.html'])
+    mock_cache = MagicMock()
+    # An earlier run stopped at a url that isn't a roster url of this run.
+    mock_cache.get.return_value = {
+        'results': ['https://tcu.frogs/wbball/team.html'], 'complete': False}
+    schools = {'TCU': {'Institution': 'TCU'}}
+    collect_roster_urls._search_for_roster_urls(schools, mock_cache)
+    self.assertEqual('https://tcu.frogs/wsoc/team.html', schools['TCU']['Url'])
+    self.assertEqual(1, mock_search.call_count)
+    # The cached results are kept, and not read from the search again.
+    mock_cache.put.assert_called_once_with(
+        "TCU women's soccer roster",
+        {'results': ['https://tcu.frogs/wbball/team.html',
+                     'https://tcu.frogs/wsoc/team.html'],
+         'complete': False})
+
+    mock_search.reset_mock()
+    mock_cache.get.return_value = {
+        'results': ['https://tcu.frogs/wbball/team.html'], 'complete': True}
+    schools = {'TCU': {'Institution': 'TCU'}}
+    collect_roster_urls._search_for_roster_urls(schools, mock_cache)
+    self.assertNotIn('Url', schools['TCU'])
+    mock_search.assert_not_called()
+
+  @patch('googlesearch.search')
+  def test_search_results_partial_cache(self, mock_search):
+    mock_search.return_value = iter(['https://a.edu', 'https://b.edu',
+                                     'https://c.edu'])
+    mock_cache = MagicMock()
+    mock_cache.get.return_value = {'results': ['https://a.edu'],
+                                   'complete': False}
+    actual = list(collect_roster_urls._search_results('query', mock_cache))
+    expected = ['https://a.edu', 'https://b.edu', 'https://c.edu']
+    self.assertEqual(expected, actual)
+    mock_cache.put.assert_called_once_with(
+        'query', {'results': expected, 'complete': True})
+
+  @patch('googlesearch.search')
+  @patch('collect_roster_urls.LOGGER')
+  def test_search_for_roster_urls_refresh(self, mock_logger, mock_search):
+    mock_search.return_value = iter(['https://tcu.frogs/wsoc/roster.html'])
+    mock_cache = MagicMock()
+    mock_cache.get.return_value = {
+        'results': ['https://tcu.frogs/wsoc/team.html'], 'complete': False}
+    schools = {'TCU': {'Institution': 'TCU'}}
+    collect_roster_urls._search_for_roster_urls(schools, mock_cache,
+                                                refresh={'TCU'})
+    self.assertEqual('https://tcu.frogs/wsoc/roster.html',
+                     schools['TCU']['Url'])
+    mock_cache.get.assert_not_called()
+    mock_cache.put.assert_called_once_with(
+        "TCU women's soccer roster",
+        {'results': ['https://tcu.frogs/wsoc/roster.html'], 'complete': False})
+
+  def test_merge_existing_urls(self):
+    schools = {'Akron':   {'Institution': 'Akron'},
+               'Navy':    {'Institution': 'Navy'},
+               'Rutgers': {'Institution': 'Rutgers'},
+               'Toledo':  {'Institution': 'Toledo'}}
+    existing = {'Akron':   {'Institution': 'Akron',
+                            'Url': 'https://gozips.com/roster.aspx'},
+                'Navy':    {'Institution': 'Navy',
+                            'Url': ''},
+                'Rutgers': {'Institution': 'Rutgers',
+                            'Url': 'https://scarletknights.com/broken'}}
+    actual = collect_roster_urls._merge_existing_urls(schools, existing,
+                                                      ['Rutgers'])
+    self.assertEqual(['Navy', 'Rutgers', 'Toledo'], actual)
+    self.assertEqual({'Institution': 'Akron',
+                      'Url': 'https://gozips.com/roster.aspx'},
+                     schools['Akron'])
+    self.assertNotIn('Url', schools['Rutgers'])
 
   @parameterized.expand([
     ('https://school.edu/roster.aspx?roster=432&path=wsoc',
@@ -175,6 +283,8 @@ class CollectRosterUrlsTest(unittest.TestCase):
      'https://college.big/roster.aspx?path=wsoc'),
     ('https://institute.univ/sports/big-time/index.aspx?path=',
      'https://institute.univ/sports/big-time/roster.aspx?path=wsoc'),
+    ('https://goutsa.com/roster.aspx?path=wsoc&print=true',
+     'https://goutsa.com/roster.aspx?path=wsoc'),
   ])
   def test_standardize_url(self, input, expected):
     actual = collect_roster_urls._standardize_url(input)
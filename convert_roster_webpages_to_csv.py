@@ -1,50 +1,115 @@
 import argparse
 import codecs
+import collections
+import concurrent.futures
 import logging
 import os
-import sys
 
-from bs4 import BeautifulSoup as bs
+from util import blob_store
+from util import columnar
+from util import diagnostics
+from util import queue_logging
 from util import roster_file_util
-import ncaa_roster_parser
+from util import roster_markers
+from util import run_report
+# The parser modules, which load BeautifulSoup, are imported by the functions
+# that parse, so the --help of the script doesn't load them.
 
 LOGFILE = '/tmp/convert_roster_webpages_to_csv.log'
+REPORT_FILE = '/tmp/convert_roster_webpages_to_csv_report.json'
 LOGGER = None
+REPORT = run_report.RunReport('convert')
 
 
-def read_webpages(webpage_dir, school_filter=None):
-  """Collects the file content from the files in the specificed directory.
+def iter_webpages(webpage_dir, school_filter=None, use_mmap=False):
+  """Yields the roster web page of each school, one page at a time.
+
+  Only one page is held in memory at a time. Files of schools that are not in
+  the filter are never opened.
 
   Arguments:
     webpage_dir: A string of the directory to read from.
     school_filter: A list of schools to filter by. Only these schools will be
         output.
+    use_mmap: If True, each page is memory-mapped instead of read into a
+        string. The mapped page is only valid until the next page is yielded.
 
-  Returns:
-    A dict mapping the school name to its roster web page content:
-        {<school name>: <roster webpage raw HTML content>}
+  Yields:
+    A tuple of (<school name>, <roster webpage raw HTML content>).
   """
-  webpages = {}
-  webpage_files = os.listdir(webpage_dir)
-  for webpage_file in webpage_files:
+  for webpage_file in sorted(os.listdir(webpage_dir)):
+    if not webpage_file.endswith('webpage'):
+      continue
     # Get the school name from the file name. Convert underscores back into
     # spaces.
     school = webpage_file[:webpage_file.rfind('.')].replace('_', ' ')
     if school_filter and school not in school_filter:
       continue
     file_path = os.path.join(webpage_dir, webpage_file)
-    content = roster_file_util.read_file(file_path)
-    if webpage_file.endswith('webpage'):
-      webpages[school] = content
-  return webpages
+    if use_mmap:
+      with roster_file_util.map_file(file_path) as content:
+        yield school, content
+    else:
+      yield school, roster_file_util.read_file(file_path)
+
+
+def iter_stored_webpages(store, run_id=None, school_filter=None):
+  """Yields the roster web page of each school saved in a run's manifest.
+
+  Arguments:
+    store: A blob_store.BlobStore the pages were saved into.
+    run_id: A string of the run id, or None for the latest run.
+    school_filter: A list of schools to filter by. Only these schools will be
+        output.
+
+  Yields:
+    A tuple of (<school name>, <roster webpage raw HTML content>).
+  """
+  pages = store.read_manifest(run_id)
+  for school in sorted(pages):
+    if school_filter and school not in school_filter:
+      continue
+    yield school, store.get(pages[school]).decode('utf-8')
+
+
+def read_webpages(webpage_dir, school_filter=None):
+  """Collects the file content from the files in the specificed directory.
 
+  Arguments:
+    webpage_dir: A string of the directory to read from.
+    school_filter: A list of schools to filter by. Only these schools will be
+        output.
 
-def parse_webpages(webpages, schools, urls):
+  Returns:
+    A dict mapping the school name to its roster web page content:
+        {<school name>: <roster webpage raw HTML content>}
+  """
+  return dict(iter_webpages(webpage_dir, school_filter))
+
+
+def parse_webpages(webpages, schools, urls, use_stream_parser=True,
+                   slice_sections=True, use_embedded_json=True, rules=None,
+                   workers=0):
   """Selects an HTML processor for each school roster webpage.
 
   Arguments:
-    webpages: A dict of strings of {school:webpage HTML} pairs.
-    urls: A dict of strings of {school:url} pairs.
+    webpages: A dict of strings of {school:webpage HTML} pairs, or an iterable
+        of (school, webpage HTML) tuples, such as iter_webpages().
+    schools: A list of strings of school names.
+    urls: A list of strings of roster urls, one for each school.
+    use_stream_parser: If True, SidearmSports pages are first read with
+        sidearm_stream_parser, which doesn't build a BeautifulSoup tree. Pages
+        it finds no players in are parsed with the processors as before.
+    slice_sections: If True, only the roster section of pages of a known
+        layout (see util/roster_markers.py) is parsed. The full page is parsed
+        when no section is found or no players are found in it.
+    use_embedded_json: If True, a roster embedded in the page as JSON is used
+        instead of the page HTML, which is then not parsed.
+    rules: An optional extraction_rules.RuleSet to read the page HTML with
+        instead of the processors. Pages no rule is for are read with the
+        processors.
+    workers: The number of worker processes to parse the pages in, or 0 to
+        parse them in this process.
 
   Returns:
     A dict with a list of players for each school in the form of:
@@ -58,27 +123,266 @@ def parse_webpages(webpages, schools, urls):
       Example:
         {'North Carolina': [{'name': 'Mia Hamm', 'position': 'F', ...},
                             {'name': ''}]}
+    The teams parsed in worker processes are util/columnar.py ColumnarTable
+    instances instead of lists. They read like lists of player dicts.
   """
+  if isinstance(webpages, dict):
+    webpages = webpages.items()
+  options = (use_stream_parser, slice_sections, use_embedded_json, rules)
+  if workers:
+    teams = _parse_in_workers(webpages, schools, urls, options, workers)
+  else:
+    teams = ((school, _record_result(school, _parse_school_page(
+                 school, webpage, urls[schools.index(school)], *options)))
+             for school, webpage in webpages)
   school_teams = {}
-  for school in webpages:
-    LOGGER.debug('Processing {}...'.format(school))
-    page = bs(webpages[school], 'html.parser')
-    url = urls[schools.index(school)]
-    if page:
-      if 'roster.aspx' in url or 'womens-soccer/roster' in url:
-        sidearm = ncaa_roster_parser.SidearmProcessor(page)
-        school_teams[school] = sidearm.get_team()
-      elif 'SportSelect' in url:
-        sport_select_proc = ncaa_roster_parser.SportSelectProcessor(page)
-        school_teams[school] = sport_select_proc.get_team()
-      else:
-        table_proc = ncaa_roster_parser.HtmlTableProcessor(page)
-        school_teams[school] = table_proc.get_team()
-    else:  # !page
-      LOGGER.error('No webpage data for %s', school)
+  for school, team in teams:
+    if team is not None:
+      school_teams[school] = team
   return school_teams
 
 
+def _parse_school_page(school, webpage, url, use_stream_parser=True,
+                       slice_sections=True, use_embedded_json=True,
+                       rules=None):
+  """Parses the roster webpage of a school. See parse_webpages().
+
+  Returns:
+    A tuple of (processor name, list of player dicts, True if only the roster
+    section was parsed, number of duplicate players merged), or None if the
+    page has no content.
+  """
+  import ncaa_roster_parser
+  import processor_registry
+  LOGGER.debug('Processing %s...', school)
+  with diagnostics.MISSING_FIELDS.school(school):
+    result = None
+    sliced = False
+    if use_embedded_json and webpage:
+      # Only lists of enough objects with roster fields are taken, so a
+      # roster found in the JSON needs no checking against the HTML.
+      team = ncaa_roster_parser.EmbeddedJsonProcessor(webpage).get_team()
+      if team:
+        result = 'EmbeddedJsonProcessor', team
+    entry = section = None
+    if result is None:
+      # The processor is picked once, by the signature of the full page.
+      entry = processor_registry.REGISTRY.select(webpage, url)
+      if slice_sections:
+        section = _slice_roster_section(webpage, entry)
+    if section:
+      result = _parse_page(section, url, entry, use_stream_parser, rules)
+      sliced = bool(result and result[1])
+      if not sliced:
+        # Fall back to the full page.
+        result = None
+    if result is None:
+      result = _parse_page(webpage, url, entry, use_stream_parser, rules)
+  if not result:
+    return None
+  processor_name, team = result
+  merged = _merge_duplicate_players(team)
+  return processor_name, merged, sliced, len(team) - len(merged)
+
+
+def _record_result(school, result):
+  """Adds a _parse_school_page() result to the run report.
+
+  Returns:
+    The list of player dicts of the result, or None if the page has no
+    content.
+  """
+  if not result:
+    LOGGER.error('No webpage data for %s', school)
+    REPORT.increment('empty_pages')
+    return None
+  processor_name, team, sliced, duplicates = result
+  if sliced:
+    REPORT.increment('sliced_pages')
+  if duplicates:
+    LOGGER.info('Merged %d duplicate players of %s', duplicates, school)
+    REPORT.increment('duplicate_players', duplicates)
+  _record_team_metrics(school, processor_name, team)
+  return team
+
+
+# The parse_webpages() options of a worker process.
+_worker_options = None
+
+
+def _init_worker(options, log_queue, log_level):
+  global _worker_options
+  _worker_options = options
+  queue_logging.worker_config(log_queue, log_level)
+
+
+def _parse_in_worker(school, webpage, url):
+  """Parses a page in a worker process.
+
+  The players are returned packed into one columnar buffer (see
+  util/columnar.py) instead of as pickled dicts, along with the fields the
+  parsers missed and the run report metrics of the page.
+
+  Returns:
+    A tuple of (the bytes of the buffer, or None if the page has no content,
+    MISSING_FIELDS snapshot, REPORT snapshot).
+  """
+  import ncaa_roster_parser
+  diagnostics.MISSING_FIELDS.clear()
+  REPORT.clear()
+  team = _record_result(school, _parse_school_page(school, webpage, url,
+                                                   *_worker_options))
+  buf = None
+  if team is not None:
+    buf = columnar.encode(team, ncaa_roster_parser.FIELDS)
+  return (buf, diagnostics.MISSING_FIELDS.snapshot(), REPORT.snapshot())
+
+
+def _parse_in_workers(webpages, schools, urls, options, workers):
+  """Parses pages in worker processes.
+
+  At most two pages per worker are handed out at a time, so pages are still
+  only read as they are parsed.
+
+  Yields:
+    A tuple of (school, columnar.ColumnarTable of the team, or None if the
+    page has no content) for each page, in the order of the pages.
+  """
+  pending = collections.deque()
+  initargs = (options, queue_logging.worker_queue(),
+              logging.getLogger().level)
+  with concurrent.futures.ProcessPoolExecutor(
+      workers, initializer=_init_worker, initargs=initargs) as executor:
+    for school, webpage in webpages:
+      if not isinstance(webpage, (str, bytes)):
+        # A mapped page is only valid until the next page is read.
+        webpage = bytes(webpage)
+      pending.append((school, executor.submit(
+          _parse_in_worker, school, webpage, urls[schools.index(school)])))
+      if len(pending) >= 2 * workers:
+        yield _read_worker_result(*pending.popleft())
+    while pending:
+      yield _read_worker_result(*pending.popleft())
+
+
+def _read_worker_result(school, future):
+  buf, missing_fields, report = future.result()
+  diagnostics.MISSING_FIELDS.merge(missing_fields)
+  REPORT.merge(report)
+  return school, columnar.ColumnarTable(buf) if buf is not None else None
+
+
+def _merge_duplicate_players(team):
+  """Merges the copies of players that a page rendered more than once.
+
+  Players with the same name are copies unless both have a jersey number and
+  the numbers differ. The first copy is kept, and its empty fields are filled
+  in from the later copies, e.g. a card view without hometowns followed by a
+  table view with them. Players without a name are never merged.
+
+  Arguments:
+    team: A list of dicts of each player's data.
+
+  Returns:
+    A list of dicts of each distinct player's data. The fields of merged
+    players are in the order of ncaa_roster_parser.FIELDS, like the fields of
+    the players the processors return.
+  """
+  import ncaa_roster_parser
+  merged = []
+  players_by_name = {}
+  filled_in = set()
+  for player in team:
+    name = player.get('name', '').lower()
+    if not name:
+      merged.append(player)
+      continue
+    copies = players_by_name.setdefault(name, [])
+    for other in copies:
+      if not (player.get('jersey') and other.get('jersey') and
+              player['jersey'] != other['jersey']):
+        for field, value in player.items():
+          if value and not other.get(field):
+            other[field] = value
+            filled_in.add(id(other))
+        break
+    else:
+      copies.append(dict(player))
+      merged.append(copies[-1])
+  for i, player in enumerate(merged):
+    if id(player) in filled_in:
+      # Fields the first copy didn't have were added at the end.
+      fields = [f for f in ncaa_roster_parser.FIELDS if f in player]
+      fields += [f for f in player if f not in fields]
+      merged[i] = {field: player[field] for field in fields}
+  return merged
+
+
+def _slice_roster_section(webpage, entry):
+  """Returns the str of the roster section of a page, or None if the page
+  isn't of a known layout.
+
+  Arguments:
+    webpage: The roster webpage raw HTML content.
+    entry: The processor_registry.ProcessorEntry picked for the page.
+  """
+  if not entry.layouts:
+    # Generic HTML tables have no marker to find them by.
+    return None
+  section = roster_markers.slice_section(webpage, entry.layouts)
+  if section is not None and not isinstance(section, str):
+    # Pages are saved as UTF-8, and the section no longer has the page's
+    # <meta charset> to tell BeautifulSoup so.
+    section = section.decode('utf-8', 'replace')
+  return section
+
+
+def _parse_page(webpage, url, entry, use_stream_parser=True, rules=None):
+  """Parses a roster page with the processor picked for it.
+
+  Arguments:
+    webpage: The roster webpage raw HTML content, or a section of it.
+    url: A string of the roster url.
+    entry: The processor_registry.ProcessorEntry picked for the page.
+    use_stream_parser: If True, SidearmSports pages are first read with
+        sidearm_stream_parser.
+    rules: An optional extraction_rules.RuleSet to read the page with instead
+        of the processors. Only the rules for the layout of the entry are
+        tried.
+
+  Returns:
+    A tuple of (processor name, list of player dicts), or None if the page has
+    no content.
+  """
+  from bs4 import BeautifulSoup as bs
+  import ncaa_roster_parser
+  import sidearm_stream_parser
+  if use_stream_parser and entry.streamable and webpage:
+    team = sidearm_stream_parser.get_team(webpage)
+    if team:
+      return 'SidearmStreamParser', team
+  page = bs(webpage, 'html.parser')
+  if not page:
+    return None
+  if rules is not None:
+    rule_name, team = rules.get_team(page, entry)
+    if rule_name:
+      return 'rule:' + rule_name, team
+  processor = getattr(ncaa_roster_parser, entry.processor)(page)
+  return entry.processor, processor.get_team()
+
+
+def _record_team_metrics(school, processor_name, team):
+  """Adds the parse results for a school to the run report."""
+  REPORT.increment('pages_parsed')
+  REPORT.increment('players_extracted', len(team))
+  REPORT.set_tally('players_per_school', school, len(team))
+  REPORT.add_to_tally('players_per_processor', processor_name, len(team))
+  REPORT.add_to_tally('pages_per_processor', processor_name)
+  if not team:
+    REPORT.increment('schools_without_players')
+
+
 def set_csv_rows(schools, locations, states, types, nicknames, conferences,
                  urls, teams):
   """Take all the collected data and put it in csv rows.
@@ -92,7 +396,7 @@ def set_csv_rows(schools, locations, states, types, nicknames, conferences,
     conferences: A list of strings of school conferences.
     urls: A dict of roster URLs with the school as the key.
     teams: A dict of each school's team. The dict values are lists of dicts of
-        each player's attributes.
+        each player's attributes, or columnar.ColumnarTable instances.
 
   Returns:
     A list of strings of each CSV row.
@@ -100,19 +404,23 @@ def set_csv_rows(schools, locations, states, types, nicknames, conferences,
   csv_rows = []
   for i, school in enumerate(schools):
     if school in teams:
-      for player in teams[school]:
-        csv_row = ','.join([
-          school,
-          locations[i],
-          states[i],
-          types[i],
-          nicknames[i],
-          conferences[i],
-          urls[i],
-        ])
-        for k in player.keys():
-          csv_row += ',' + player[k]
-        csv_rows.append(csv_row)
+      team = teams[school]
+      if isinstance(team, columnar.ColumnarTable):
+        # The values are read straight from the columns.
+        players = team.rows()
+      else:
+        players = (player.values() for player in team)
+      school_info = [
+        school,
+        locations[i],
+        states[i],
+        types[i],
+        nicknames[i],
+        conferences[i],
+        urls[i],
+      ]
+      for values in players:
+        csv_rows.append(','.join(school_info + list(values)))
   return csv_rows
 
 
@@ -121,30 +429,61 @@ def main():
   if flags.schools:
     school_filter = [f.strip() for f in flags.schools.split(',')]
     LOGGER.debug('Only processing these schools: %s', str(school_filter))
+  rules = None
+  if flags.rules_file:
+    import extraction_rules
+    rules = extraction_rules.RuleSet.load(flags.rules_file)
+  elif flags.extraction_rules:
+    import extraction_rules
+    rules = extraction_rules.RuleSet()
 
-  schools, locations, states, types, nicknames, conferences, urls = \
-      roster_file_util.read_school_info_file(flags.school_info_file,
-                                             school_filter)
+  try:
+    schools, locations, states, types, nicknames, conferences, urls = \
+        roster_file_util.read_school_info_file(flags.school_info_file,
+                                               school_filter)
 
-  webpages = read_webpages(flags.webpage_dir, school_filter)
-  teams = parse_webpages(webpages, schools, urls)
-  csv_rows = set_csv_rows(schools, locations, states, types, nicknames,
-                          conferences, urls, teams)
+    # Pages are read lazily while they are parsed, so reading time is part of
+    # the parse duration.
+    if flags.blob_store:
+      webpages = iter_stored_webpages(blob_store.BlobStore(flags.blob_store),
+                                      flags.run_id, school_filter)
+    else:
+      webpages = iter_webpages(flags.webpage_dir, school_filter, flags.mmap)
+    with REPORT.timer('parse'):
+      teams = parse_webpages(webpages, schools, urls,
+                             not flags.no_stream_parser,
+                             not flags.no_slice_sections,
+                             not flags.no_embedded_json, rules,
+                             flags.workers)
+    diagnostics.MISSING_FIELDS.log_summary(LOGGER)
+    diagnostics.MISSING_FIELDS.add_to_report(REPORT)
+    csv_rows = set_csv_rows(schools, locations, states, types, nicknames,
+                            conferences, urls, teams)
+    REPORT.increment('csv_rows', len(csv_rows))
 
-  csv_header_row = ('School,City,State,Type,Nickname,Conference,Roster,Player,'
-                    'Jersey,Position,Height,Hometown,Home State,High School,'
-                    'Year,Club\n')
-  with codecs.open(flags.output_file, 'w', 'utf-8-sig') as fw:
-    fw.write(csv_header_row)
-    for csv_row in csv_rows:
-      fw.write(csv_row + '\n')
+    csv_header_row = ('School,City,State,Type,Nickname,Conference,Roster,'
+                      'Player,Jersey,Position,Height,Hometown,Home State,'
+                      'High School,Year,Club\n')
+    with REPORT.timer('write'):
+      with codecs.open(flags.output_file, 'w', 'utf-8-sig') as fw:
+        fw.write(csv_header_row)
+        for csv_row in csv_rows:
+          fw.write(csv_row + '\n')
+  finally:
+    REPORT.write(flags.report_file)
 
 
-def _set_arguments():
-  parser = argparse.ArgumentParser()
+def _set_arguments(argv=None, prog=None):
+  parser = argparse.ArgumentParser(prog=prog)
   parser.add_argument('--webpage_dir', metavar='DIRNAME',
                       default='roster_webpages',
                       help='Directory with webpage files to read in.')
+  parser.add_argument('--blob_store', metavar='DIRNAME',
+                      help='Read the pages from this content-addressed store '
+                        'instead of --webpage_dir.')
+  parser.add_argument('--run_id',
+                      help='With --blob_store, the download run to read. '
+                        'Defaults to the latest run.')
   parser.add_argument('--school_info_file', metavar='FILENAME',
                       default='ncaa_d1_womens_soccer_programs.csv',
                       help='CSV file containing school data.')
@@ -153,16 +492,41 @@ def _set_arguments():
                       help='The file to output CSV data into.')
   parser.add_argument('--schools', metavar='"SCHOOL 1,SCHOOL 2,SCHOOL 3"',
                       help='A comma-separated list of schools to output.')
-  return parser.parse_args()
+  parser.add_argument('--mmap', action='store_true',
+                      help='Memory-map each webpage file instead of reading it '
+                        'into memory.')
+  parser.add_argument('--no_stream_parser', action='store_true',
+                      help='Parse every page with the BeautifulSoup processors '
+                        'instead of reading SidearmSports pages with '
+                        'sidearm_stream_parser.py first.')
+  parser.add_argument('--no_slice_sections', action='store_true',
+                      help='Parse the full page instead of only the roster '
+                        'section of pages of a known layout.')
+  parser.add_argument('--no_embedded_json', action='store_true',
+                      help='Ignore rosters embedded in pages as JSON and '
+                        'parse the page HTML of every page.')
+  parser.add_argument('--extraction_rules', action='store_true',
+                      help='Read the page HTML with the built-in rules of '
+                        'extraction_rules.py instead of the processors.')
+  parser.add_argument('--rules_file', metavar='FILENAME',
+                      help='A JSON file of more extraction rules, e.g. for '
+                        'single sites. Implies --extraction_rules.')
+  parser.add_argument('--workers', metavar='N', type=int, default=0,
+                      help='The number of worker processes to parse pages '
+                        'in. Parses in this process by default.')
+  parser.add_argument('--report_file', metavar='FILENAME',
+                      default=REPORT_FILE,
+                      help='The file to write the JSON run report into.')
+  return parser.parse_args(argv)
 
 
 def _set_logger():
   fmt = '%(asctime)s,%(msecs)-3d %(levelname)-8s %(filename)s:%(lineno)d -> %(message)s'
-  logging.basicConfig(level=logging.DEBUG,
-                      format=fmt,
-                      datefmt='%m-%d %H:%M:%S',
-                      filename=LOGFILE,
-                      filemode='w')
+  queue_logging.basic_config(level=logging.DEBUG,
+                             format=fmt,
+                             datefmt='%m-%d %H:%M:%S',
+                             filename=LOGFILE,
+                             filemode='w')
   return logging.getLogger(__name__)
 
 
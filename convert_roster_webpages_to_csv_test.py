@@ -1,48 +1,93 @@
 """Unit tests for convert_roster_webpages_to_csv.py"""
+import os
+import tempfile
 import unittest
 from unittest import mock
 
 import convert_roster_webpages_to_csv
+import extraction_rules
+from util import blob_store
+from util import columnar
+from util import run_report
 
 
 class ConvertRosterWebpagesToCsvTest(unittest.TestCase):
 
-  @mock.patch('convert_roster_webpages_to_csv.os')
-  @mock.patch('convert_roster_webpages_to_csv.roster_file_util')
-  def test_read_webpages(self, mock_fu, mock_os):
-    fake_files = ['school_1.url', 'school_1.webpage',
-                  'school_2.url', 'school_2.webpage']
-    mock_os.listdir.return_value = fake_files
-    mock_os.path.join.side_effect = ['fake_path_1', 'fake_path_2',
-                                     'fake_path_3', 'fake_path_4']
-    fake_content = ['http://page1', '<html page 1>',
-                    'http://page2', '<html page 2>']
-    mock_fu.read_file.side_effect = fake_content
-    actual_webpages, actual_urls = \
-        convert_roster_webpages_to_csv.read_webpages('fake_dir')
-    expected_webpages = {
-      'school 1': fake_content[1],
-      'school 2': fake_content[3],
+  def _write_fake_webpages(self, dir_path):
+    fake_files = {
+      'school_1.url': 'http://page1',
+      'school_1.webpage': '<html page 1>',
+      'school_2.url': 'http://page2',
+      'school_2.webpage': '<html page 2>',
     }
-    expected_urls = {
-      'school 1': fake_content[0],
-      'school 2': fake_content[2],
+    for file_name, content in fake_files.items():
+      with open(os.path.join(dir_path, file_name), 'w') as fw:
+        fw.write(content)
+
+  def test_read_webpages(self):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      self._write_fake_webpages(tmp_dir)
+      actual_webpages = convert_roster_webpages_to_csv.read_webpages(tmp_dir)
+    expected_webpages = {
+      'school 1': '<html page 1>',
+      'school 2': '<html page 2>',
     }
     self.assertEqual(expected_webpages, actual_webpages)
-    self.assertEqual(expected_urls, actual_urls)
 
-  @mock.patch('convert_roster_webpages_to_csv.bs')
-  @mock.patch('convert_roster_webpages_to_csv.ncaa_roster_parser')
-  def test_parse_webpages(self, mock_nrp, mock_bs):
+  @mock.patch('convert_roster_webpages_to_csv.roster_file_util')
+  def test_iter_webpages_filters_before_reading(self, mock_fu):
+    mock_fu.read_file.return_value = '<html page 2>'
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      self._write_fake_webpages(tmp_dir)
+      webpages = convert_roster_webpages_to_csv.iter_webpages(tmp_dir,
+                                                              ['school 2'])
+      self.assertEqual(0, mock_fu.read_file.call_count)
+      actual = list(webpages)
+      expected_path = os.path.join(tmp_dir, 'school_2.webpage')
+    self.assertEqual([('school 2', '<html page 2>')], actual)
+    mock_fu.read_file.assert_called_once_with(expected_path)
+
+  def test_iter_webpages_mmap(self):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      self._write_fake_webpages(tmp_dir)
+      actual = [(school, bytes(content)) for school, content in
+                convert_roster_webpages_to_csv.iter_webpages(tmp_dir,
+                                                             use_mmap=True)]
+    self.assertEqual([('school 1', b'<html page 1>'),
+                      ('school 2', b'<html page 2>')], actual)
+
+  def test_iter_stored_webpages(self):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      store = blob_store.BlobStore(tmp_dir)
+      store.write_manifest({'school 1': store.put('<html page 1>'),
+                            'school 2': store.put('<html page 2>')}, 'run1')
+      store.write_manifest({'school 1': store.put('<html page 1>')}, 'run2')
+      actual = list(convert_roster_webpages_to_csv.iter_stored_webpages(
+          store, 'run1', ['school 2']))
+      actual_latest = list(
+          convert_roster_webpages_to_csv.iter_stored_webpages(store))
+    self.assertEqual([('school 2', '<html page 2>')], actual)
+    self.assertEqual([('school 1', '<html page 1>')], actual_latest)
+
+  @mock.patch('convert_roster_webpages_to_csv.LOGGER')
+  @mock.patch('bs4.BeautifulSoup')
+  @mock.patch.multiple('ncaa_roster_parser',
+                       SidearmSportsSidearmClassNameProcessor=mock.DEFAULT,
+                       HtmlTableProcessor=mock.DEFAULT,
+                       SportSelectProcessor=mock.DEFAULT,
+                       EmbeddedJsonProcessor=mock.DEFAULT)
+  def test_parse_webpages(self, mock_bs, mock_logger, **mock_nrp):
     team_a = [{'name': 'player a'}, {'name': 'player b'}, {'name': 'player c'}]
     team_b = [{'name': 'player m'}, {'name': 'player n'}, {'name': 'player o'}]
     team_c = [{'name': 'player x'}, {'name': 'player y'}, {'name': 'player z'}]
     mock_sidearm = mock.MagicMock()
     mock_table = mock.MagicMock()
     mock_sport_select = mock.MagicMock()
-    mock_nrp.SidearmProcessor.return_value = mock_sidearm
-    mock_nrp.HtmlTableProcessor.return_value = mock_table
-    mock_nrp.SportSelectProcessor.return_value = mock_sport_select
+    mock_nrp['SidearmSportsSidearmClassNameProcessor'].return_value = \
+        mock_sidearm
+    mock_nrp['HtmlTableProcessor'].return_value = mock_table
+    mock_nrp['SportSelectProcessor'].return_value = mock_sport_select
+    mock_nrp['EmbeddedJsonProcessor'].return_value.get_team.return_value = []
     mock_sidearm.get_team.return_value = team_a
     mock_table.get_team.return_value = team_b
     mock_sport_select.get_team.return_value = team_c
@@ -51,13 +96,16 @@ class ConvertRosterWebpagesToCsvTest(unittest.TestCase):
       'school 2': '<html page 2>',
       'school 3': '<html page 3>',
     }
-    fake_urls = {
-      'school 1': 'http://page1/roster.aspx',
-      'school 2': 'http://page2/2018-19/roster',
-      'school 3': 'http://page3/SportSelect.aspx',
-    }
-    actual = convert_roster_webpages_to_csv.parse_webpages(fake_webpages,
-                                                           fake_urls)
+    fake_schools = ['school 1', 'school 2', 'school 3']
+    fake_urls = [
+      'http://page1/roster.aspx',
+      'http://page2/2018-19/roster',
+      'http://page3/SportSelect.aspx',
+    ]
+    # The stream parser is left out, as it reads pages with the processors
+    # too (see test_parse_webpages_stream_parser).
+    actual = convert_roster_webpages_to_csv.parse_webpages(
+        fake_webpages, fake_schools, fake_urls, use_stream_parser=False)
     expected = {
       'school 1': team_a,
       'school 2': team_b,
@@ -69,6 +117,191 @@ class ConvertRosterWebpagesToCsvTest(unittest.TestCase):
     # the mock object.
     self.assertEqual(6, len(mock_bs.mock_calls))
 
+  @mock.patch('convert_roster_webpages_to_csv.LOGGER')
+  @mock.patch('bs4.BeautifulSoup')
+  @mock.patch('sidearm_stream_parser.get_team')
+  def test_parse_webpages_stream_parser(self, mock_get_team, mock_bs,
+                                        mock_logger):
+    team = [{'name': 'player a'}]
+    mock_get_team.side_effect = [team, []]
+    fake_webpages = {'school 1': '<html page 1>', 'school 2': '<html page 2>'}
+    fake_schools = ['school 1', 'school 2']
+    fake_urls = ['http://page1/roster.aspx', 'http://page2/roster.aspx']
+    mock_bs.return_value = None
+    actual = convert_roster_webpages_to_csv.parse_webpages(fake_webpages,
+                                                           fake_schools,
+                                                           fake_urls)
+    self.assertEqual({'school 1': team}, actual)
+    # Only the page the stream parser found no players in is parsed with bs.
+    mock_bs.assert_called_once_with('<html page 2>', 'html.parser')
+
+    mock_get_team.reset_mock()
+    convert_roster_webpages_to_csv.parse_webpages(fake_webpages, fake_schools,
+                                                  fake_urls,
+                                                  use_stream_parser=False)
+    mock_get_team.assert_not_called()
+
+  @mock.patch('convert_roster_webpages_to_csv.REPORT')
+  @mock.patch('convert_roster_webpages_to_csv.LOGGER')
+  def test_parse_webpages_slice_sections(self, mock_logger, mock_report):
+    webpages = {}
+    for school in ('Nebraska', 'UTSA'):
+      with open('testdata/{}.webpage'.format(school), 'rb') as fo:
+        webpages[school] = fo.read()
+    schools = ['Nebraska', 'UTSA', 'Other']
+    urls = ['http://huskers.com/SportSelect.aspx?SPID=11',
+            'http://goutsa.com/roster.aspx?path=wsoc', 'http://other/roster']
+    full = convert_roster_webpages_to_csv.parse_webpages(
+        webpages, schools, urls, use_stream_parser=False, slice_sections=False)
+    mock_report.increment.assert_has_calls([mock.call('pages_parsed')])
+    self.assertNotIn(mock.call('sliced_pages'),
+                     mock_report.increment.mock_calls)
+    sliced = convert_roster_webpages_to_csv.parse_webpages(
+        webpages, schools, urls, use_stream_parser=False)
+    self.assertEqual(full, sliced)
+    self.assertEqual([26, 31], [len(sliced[s]) for s in ('Nebraska', 'UTSA')])
+    self.assertEqual(2, mock_report.increment.mock_calls.count(
+        mock.call('sliced_pages')))
+
+  @mock.patch('convert_roster_webpages_to_csv.REPORT')
+  @mock.patch('convert_roster_webpages_to_csv.LOGGER')
+  def test_parse_webpages_extraction_rules(self, mock_logger, mock_report):
+    with open('testdata/Nebraska.webpage', 'r') as fo:
+      webpages = {'Nebraska': fo.read()}
+    args = (webpages, ['Nebraska'],
+            ['http://huskers.com/SportSelect.aspx?SPID=11'])
+    expected = convert_roster_webpages_to_csv.parse_webpages(*args)
+    actual = convert_roster_webpages_to_csv.parse_webpages(
+        *args, rules=extraction_rules.RuleSet())
+    self.assertEqual(expected, actual)
+    mock_report.add_to_tally.assert_called_with('pages_per_processor',
+                                                'rule:sportselect')
+
+  @mock.patch('convert_roster_webpages_to_csv.LOGGER')
+  def test_parse_webpages_workers(self, mock_logger):
+    schools = ['Cal Poly', 'Nebraska', 'Southeastern Louisiana', 'UTSA']
+    urls = ['https://www.gopoly.com/sports/wsoc/2018-19/roster',
+            'http://huskers.com/SportSelect.aspx?SPID=11',
+            'https://lionsports.net/roster.aspx?path=wsoc',
+            'http://goutsa.com/roster.aspx?path=wsoc']
+    webpages = convert_roster_webpages_to_csv.iter_webpages('testdata')
+    expected_report = run_report.RunReport('convert')
+    with mock.patch('convert_roster_webpages_to_csv.REPORT', expected_report):
+      expected = convert_roster_webpages_to_csv.parse_webpages(
+          webpages, schools, urls)
+    webpages = convert_roster_webpages_to_csv.iter_webpages('testdata',
+                                                            use_mmap=True)
+    actual_report = run_report.RunReport('convert')
+    with mock.patch('convert_roster_webpages_to_csv.REPORT', actual_report):
+      actual = convert_roster_webpages_to_csv.parse_webpages(
+          webpages, schools, urls, workers=2)
+    self.assertEqual(sorted(expected), sorted(actual))
+    for school in schools:
+      self.assertEqual(expected[school], list(actual[school]))
+    # The metrics recorded in the workers are merged into the report.
+    self.assertEqual(expected_report.snapshot(), actual_report.snapshot())
+    self.assertEqual(4, actual_report.counters['pages_parsed'])
+
+  @mock.patch('convert_roster_webpages_to_csv.LOGGER')
+  @mock.patch.multiple('ncaa_roster_parser',
+                       SportSelectProcessor=mock.DEFAULT,
+                       EmbeddedJsonProcessor=mock.DEFAULT)
+  def test_parse_webpages_section_fallback(self, mock_logger, **mock_nrp):
+    mock_nrp['EmbeddedJsonProcessor'].return_value.get_team.return_value = []
+    # No players in the section, so the full page is parsed too.
+    mock_nrp['SportSelectProcessor'].return_value.get_team.side_effect = [
+        [], [{'name': 'player a'}]]
+    webpages = {'school 1': '<div id="roster-grid-layout"></div>'}
+    actual = convert_roster_webpages_to_csv.parse_webpages(
+        webpages, ['school 1'], ['http://page1/SportSelect.aspx'])
+    self.assertEqual({'school 1': [{'name': 'player a'}]}, actual)
+    self.assertEqual(2, mock_nrp['SportSelectProcessor'].call_count)
+
+  @mock.patch('convert_roster_webpages_to_csv.LOGGER')
+  def test_parse_webpages_embedded_json(self, mock_logger):
+    names = ['Mia Hamm', 'Kristine Lilly', 'Julie Foudy', 'Joy Fawcett',
+             'Brandi Chastain']
+    athletes = ', '.join('{{"@type": "Person", "name": "{}", '
+                         '"position": "F"}}'.format(name) for name in names)
+    webpages = {'school 1': '<script type="application/ld+json">'
+                            '{"@type": "SportsTeam", "athlete": [' + athletes +
+                            ']}</script><ul class="sidearm-roster-players">'
+                            '<li class="sidearm-roster-player">'
+                            '<div class="sidearm-roster-player-name">'
+                            'Mia Hamm</div></li></ul>'}
+    with mock.patch('convert_roster_webpages_to_csv._parse_page') as mock_parse:
+      actual = convert_roster_webpages_to_csv.parse_webpages(
+          webpages, ['school 1'], ['http://page1/roster.aspx'])
+    self.assertEqual(names, [p['name'] for p in actual['school 1']])
+    mock_parse.assert_not_called()
+    actual = convert_roster_webpages_to_csv.parse_webpages(
+        webpages, ['school 1'], ['http://page1/roster.aspx'],
+        use_embedded_json=False)
+    self.assertEqual(['Mia Hamm'], [p['name'] for p in actual['school 1']])
+
+  @mock.patch('convert_roster_webpages_to_csv.REPORT')
+  @mock.patch('convert_roster_webpages_to_csv.LOGGER')
+  def test_parse_webpages_embedded_json_author(self, mock_logger,
+                                               mock_report):
+    with open('testdata/UTSA.webpage', 'r') as fo:
+      webpage = fo.read()
+    article = ('<script type="application/ld+json">{"@type":"NewsArticle",'
+               '"author":[{"@type":"Person","name":"Sports Info Staff"}]}'
+               '</script>')
+    webpage = webpage.replace('</head>', article + '</head>', 1)
+    self.assertIn(article, webpage)
+    actual = convert_roster_webpages_to_csv.parse_webpages(
+        {'UTSA': webpage}, ['UTSA'], ['http://goutsa.com/roster.aspx'])
+    self.assertEqual(31, len(actual['UTSA']))
+    self.assertNotIn('Sports Info Staff',
+                     [p['name'] for p in actual['UTSA']])
+
+  def test_merge_duplicate_players(self):
+    team = [
+      {'name': 'Mia Hamm', 'jersey': '9', 'hometown': ''},
+      {'name': 'Kristine Lilly', 'jersey': '13', 'hometown': ''},
+      {'name': 'Mia Hamm', 'jersey': '', 'hometown': 'Selma'},
+      {'name': 'Mia Hamm', 'jersey': '19', 'hometown': 'Wichita Falls'},
+    ]
+    self.assertEqual([
+      {'name': 'Mia Hamm', 'jersey': '9', 'hometown': 'Selma'},
+      {'name': 'Kristine Lilly', 'jersey': '13', 'hometown': ''},
+      {'name': 'Mia Hamm', 'jersey': '19', 'hometown': 'Wichita Falls'},
+    ], convert_roster_webpages_to_csv._merge_duplicate_players(team))
+    self.assertEqual('', team[0]['hometown'])
+
+  def test_merge_duplicate_players_without_names(self):
+    team = [
+      {'name': '', 'jersey': '1'},
+      {'name': '', 'jersey': '', 'hometown': 'Selma'},
+    ]
+    self.assertEqual(
+        team, convert_roster_webpages_to_csv._merge_duplicate_players(team))
+
+  def test_merge_duplicate_players_field_order(self):
+    team = [
+      {'name': 'Mia Hamm', 'jersey': '9'},
+      {'hometown': 'Selma', 'name': 'Mia Hamm', 'position': 'F'},
+    ]
+    merged = convert_roster_webpages_to_csv._merge_duplicate_players(team)
+    self.assertEqual(['name', 'jersey', 'position', 'hometown'],
+                     list(merged[0]))
+
+  def test_set_csv_rows_columnar(self):
+    team = columnar.ColumnarTable(columnar.encode(
+        [{'name': 'Mia Hamm', 'jersey': '9'}, {'name': 'Kristine Lilly'}],
+        ('name', 'jersey')))
+    actual = convert_roster_webpages_to_csv.set_csv_rows(
+        ['School 1'], ['Location 1'], ['State 1'], ['Type 1'],
+        ['Nickname 1'], ['Conference 1'], ['http://roster.aspx'],
+        {'School 1': team})
+    self.assertEqual([
+      'School 1,Location 1,State 1,Type 1,Nickname 1,Conference 1,'
+      'http://roster.aspx,Mia Hamm,9',
+      'School 1,Location 1,State 1,Type 1,Nickname 1,Conference 1,'
+      'http://roster.aspx,Kristine Lilly,',
+    ], actual)
+
   def test_set_csv_rows(self):
     fake_schools = ['School 1', 'School 2', 'School 3']
     fake_locations = ['Location 1', 'Location 2', 'Location 3']
@@ -20,6 +20,7 @@ import re
 import requests
 import time
 import ncaa_roster_parser
+import processor_registry
 import brotli
 from bs4 import BeautifulSoup as bs
 from googlesearch import search
@@ -143,17 +144,12 @@ def main():
     # i = index_start + offset
     logger.debug('=' * 20)
     logger.debug(urls[i])
-    if 'roster.aspx' in urls[i] and soup:
-      sidearm = ncaa_roster_parser.SidearmProcessor(soup)
-      teams.append(sidearm.GetTeam())
-    elif '2018-19/roster' in urls[i] and soup:
-      table_proc = ncaa_roster_parser.TableProcessor(soup)
-      teams.append(table_proc.GetTeam())
-    elif 'SportSelect' in urls[i] and soup:
-      table_proc = ncaa_roster_parser.SportSelectProcessor(soup)
-      teams.append(table_proc.GetTeam())
+    if soup:
+      entry = processor_registry.REGISTRY.select(soup, urls[i])
+      processor = getattr(ncaa_roster_parser, entry.processor)(soup)
+      teams.append(processor.get_team())
     else:
-      logger.warn('Site processor not found: %s', urls[i])
+      logger.warn('No webpage for: %s', urls[i])
       teams.append({})
 
   csv_rows = []
@@ -6,111 +6,663 @@ These modules are required:
 pip install --user beautifulsoup4
 pip install --user requests
 pip install --user user_agent
+
+These modules are optional. When installed, brotli and zstd compressed pages
+are requested, which makes most responses smaller:
+pip install --user brotli
+pip install --user zstandard
+
+With --http2, pages are downloaded over HTTP/2 where the server supports it,
+which needs:
+pip install --user httpx[http2]
+
+These modules, and the util modules that use them, are imported by the
+functions that need them, so that e.g. the --help of the script loads none.
 """
 import argparse
-from bs4 import BeautifulSoup as bs
-import csv
+import concurrent.futures
+import itertools
 import logging
-import requests
-import sys
-from urllib.parse import urlparse
-from urllib.parse import urlunparse
-import user_agent
+import os
+import threading
+import time
 
+from util import blob_store
+from util import concurrency
+from util import crawl_checkpoint
+from util import host_stats
+from util import politeness
+from util import queue_logging
 from util import roster_file_util
+from util import roster_markers
+from util import roster_views
+from util import run_report
 
 LOGFILE = '/tmp/download_roster_webpages.log'
+REPORT_FILE = '/tmp/download_roster_webpages_report.json'
+CHECKPOINT_FILE_NAME = 'crawl_checkpoint.json'
+HOST_STATS_FILE_NAME = 'host_stats.json'
 LOGGER = None
+REPORT = run_report.RunReport('download')
+SCHEDULER = politeness.DomainScheduler()
+# Sends the requests in place of requests.get(), e.g. an
+# http2_transport.HttpxTransport. None uses the requests module.
+TRANSPORT = None
+# Adjusts how many downloads are in flight from the responses of the servers.
+LIMITER = concurrency.AimdLimiter()
+# Download times of past runs, used to start the slowest downloads first.
+HOST_STATS = host_stats.HostStats()
+
+
+class FetchOptions(object):
+  """Settings that bound the download of a single roster page.
+
+  Attributes:
+    max_body_bytes: An int of the most bytes read from a response body. Longer
+        bodies are truncated.
+    early_abort: If True, stop reading a page as soon as the roster section of
+        a known layout (see util/roster_markers.py) has been received, and no
+        section of a layout the converter prefers follows it closely.
+    chunk_size: An int of the bytes read from the connection at a time.
+    connect_timeout: A number of seconds to wait for a connection.
+    read_timeout: A number of seconds to wait for each read from the
+        connection.
+    school_deadline: A number of seconds allowed for all attempts to download
+        one page, including retries, or None for no limit.
+    light_views: If True, the lighter print view of SidearmSports roster
+        pages (see util/roster_views.py) is downloaded instead of the full
+        page, unless it had no roster before.
+  """
+
+  def __init__(self, max_body_bytes=5 * 1024 * 1024, early_abort=True,
+               chunk_size=16 * 1024, connect_timeout=10, read_timeout=30,
+               school_deadline=180, light_views=True):
+    self.max_body_bytes = max_body_bytes
+    self.early_abort = early_abort
+    self.chunk_size = chunk_size
+    self.connect_timeout = connect_timeout
+    self.read_timeout = read_timeout
+    self.school_deadline = school_deadline
+    self.light_views = light_views
+
+
+class DeadlineExceeded(Exception):
+  """Raised when a download runs out of time or the run was cancelled."""
+
+
+class Deadline(object):
+  """The time left to download one page.
+
+  Attributes:
+    seconds: A number of seconds the download may take, or None.
+    expires: A timestamp after which the download is abandoned, or None if
+        there is no time limit or it hasn't started.
+    cancelled: A threading.Event set when the whole run is out of time, or
+        None.
+  """
+
+  def __init__(self, seconds=None, cancelled=None, start=True):
+    self.seconds = seconds
+    self.expires = None
+    self.cancelled = cancelled
+    if start:
+      self.start()
+
+  def start(self):
+    """Starts the time limit, unless it has started already."""
+    if self.seconds and self.expires is None:
+      self.expires = time.time() + self.seconds
+
+  def remaining(self):
+    """Returns the seconds left, or None if there is no time limit."""
+    if self.expires is None:
+      return None
+    return max(0.0, self.expires - time.time())
+
+  def check(self, url):
+    """Raises DeadlineExceeded if the download of the url is out of time."""
+    if self.cancelled is not None and self.cancelled.is_set():
+      raise DeadlineExceeded('Run deadline reached before {} finished'.format(
+          url))
+    if self.expires is not None and time.time() >= self.expires:
+      raise DeadlineExceeded('School deadline reached before {} finished'.format(
+          url))
+
+
+class _Slot(object):
+  """A LIMITER slot of one download, which may be given back and taken again.
+
+  Attributes:
+    held: True while the slot is taken.
+  """
+
+  def __init__(self):
+    self.held = False
+
+  def acquire(self, url, deadline):
+    """Waits until LIMITER allows another request in flight, unless the slot
+    is already taken.
+
+    Raises:
+      DeadlineExceeded: If the deadline passed first.
+    """
+    while not self.held:
+      self.held = LIMITER.acquire(timeout=1)
+      if not self.held:
+        deadline.check(url)
+
+  def release(self):
+    """Gives the slot back, if it is taken."""
+    if self.held:
+      self.held = False
+      LIMITER.release()
+
+
+OPTIONS = FetchOptions()
 # Some roster web servers only return a response if the request headers simulate
 # a real web browser.
 HTTP_HEADERS = {
   'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-  'Accept-Encoding': 'gzip, deflate',
   'Accept-Language': 'en-US,en;q=0.9'
 }
-DL_ERR_MSG = bs('An error occurred trying to download this web page. Please '
+# The page saved in place of a page that could not be downloaded.
+DL_ERR_MSG = ('An error occurred trying to download this web page. Please '
     'check the log file and re-run the download_roster_webpages.py script '
-    'for this school using the --schools= flag.', 'html.parser')
+    'for this school using the --schools= flag.')
 
 def _build_request_args(url):
   """Creates a request args dict to pass to requests.get().
 
   The request headers simulate a real browser.
   """
+  import user_agent
+  from util import decompression
   http_headers = {'User-Agent': user_agent.generate_user_agent()}
   http_headers.update(HTTP_HEADERS)
+  http_headers['Accept-Encoding'] = decompression.accept_encoding()
   request_args = {
     'url': url,
     'headers': http_headers,
+    # The body is read with _read_body() so it can be cut short.
+    'stream': True,
+    'timeout': (OPTIONS.connect_timeout, OPTIONS.read_timeout),
   }
   return request_args
 
 
-def get_webpage_content(urls):
-  """Calls each roster URL and returns the content as a BeautifulSoup instance.
+def _fetch(req_args, deadline=None, slot=None):
+  """Sends the request, retrying transient failures with backoff.
 
-  Note: Any request failures will be logged as an ERROR to the log file.
+  Requests to the same domain are rate limited by SCHEDULER. Connection errors,
+  timeouts and the status codes in politeness.RETRY_STATUS_CODES are retried
+  after an exponential backoff delay, or after the delay the server asks for
+  with the Retry-After header. No retry is started that would end after the
+  deadline.
 
   Arguments:
-    urls: A list of urls to pass to requests.get().
+    req_args: A dict of args to pass to requests.get().
+    deadline: An optional Deadline of the download.
+    slot: An optional _Slot of the download. It is given back while a retry
+        waits, and taken again before the retry is sent.
 
   Returns:
-    A list of BeautifulSoup instances which correspond to the list of urls.
+    The requests.Response of the last attempt.
+
+  Raises:
+    requests.exceptions.ConnectionError: If the last attempt could not connect.
+    requests.exceptions.Timeout: If the last attempt timed out.
+    DeadlineExceeded: If the deadline passed before a response was received.
   """
-  soups = []
-  for url in urls:
+  import requests
+  url = req_args['url']
+  deadline = deadline or Deadline()
+  get = TRANSPORT.get if TRANSPORT else requests.get
+  attempt = 0
+  while True:
+    SCHEDULER.wait_for_turn(url)
+    if slot is not None:
+      slot.acquire(url, deadline)
+    deadline.check(url)
+    REPORT.increment('requests_sent')
+    start = time.time()
     try:
-      req_args = _build_request_args(url)
-      resp = requests.get(**req_args)
-      if resp.status_code == 200:
-        soups.append(bs(resp.content, 'html.parser'))
+      resp = get(**req_args)
+    except (requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout) as e:
+      LIMITER.on_overload(start)
+      delay = SCHEDULER.backoff_delay(attempt)
+      if delay is None or _past_deadline(deadline, delay):
+        raise
+      LOGGER.warning('%s for %s, retrying in %.1fs', type(e).__name__, url,
+                     delay)
+    else:
+      latency = time.time() - start
+      REPORT.record_latency(url, latency)
+      REPORT.add_to_histogram('status_codes', resp.status_code)
+      if resp.status_code in concurrency.OVERLOAD_STATUS_CODES:
+        LIMITER.on_overload(start)
+      else:
+        LIMITER.on_success(latency, start)
+      if resp.status_code not in politeness.RETRY_STATUS_CODES:
+        return resp
+      retry_after = politeness.parse_retry_after(
+          resp.headers.get('Retry-After'))
+      delay = SCHEDULER.backoff_delay(attempt, retry_after)
+      if delay is None or _past_deadline(deadline, delay):
+        return resp
+      resp.close()
+      LOGGER.warning('Status code %d for %s, retrying in %.1fs',
+                     resp.status_code, url, delay)
+    REPORT.increment('retries')
+    SCHEDULER.pause_domain(url, delay)
+    if slot is not None:
+      # Other downloads may use the slot while this one backs off.
+      slot.release()
+    attempt += 1
+
+
+def _past_deadline(deadline, delay):
+  """Returns True if waiting the delay would use up the deadline."""
+  remaining = deadline.remaining()
+  return remaining is not None and delay >= remaining
+
+
+def _read_body(resp, url, deadline=None):
+  """Reads a streamed response body in chunks.
+
+  Compressed chunks are decoded one at a time as they arrive (see
+  util/decompression.py). Reading stops once OPTIONS.max_body_bytes have been
+  decoded or, with OPTIONS.early_abort, once the roster section that the
+  converter reads has been received (see roster_markers.RosterEndDetector).
+  The connection is closed either way.
+
+  Arguments:
+    resp: A requests.Response sent with stream=True.
+    url: A string of the requested url, for logging.
+    deadline: An optional Deadline, checked after each chunk.
+
+  Returns:
+    The bytes of the decoded body that were read.
+
+  Raises:
+    DeadlineExceeded: If the deadline passed before the body was read.
+    ValueError: If the Content-Encoding isn't supported.
+  """
+  from util import decompression
+  deadline = deadline or Deadline()
+  body = bytearray()
+  detector = roster_markers.RosterEndDetector() if OPTIONS.early_abort else None
+  content_encoding = resp.headers.get('Content-Encoding')
+  wire_bytes = 0
+  try:
+    decoder = decompression.get_decoder(content_encoding)
+    chunks = resp.raw.stream(OPTIONS.chunk_size, decode_content=False)
+    for chunk in itertools.chain(chunks, [None]):
+      if chunk is None:
+        body.extend(decoder.flush())
       else:
-        LOGGER.error('Status code %d for %s', resp.status_code, req_args['url'])
-        LOGGER.error('HTTP reason: %s', resp.reason)
-        LOGGER.error('HTTP response headers:')
-        LOGGER.error(resp.raw.getheaders())
-        # Keep the length of the content list equal to the URL list
-        soups.append(DL_ERR_MSG)
-    except requests.exceptions.ConnectionError:
-      LOGGER.error('Connection error for: %s', req_args['url'])
-      # Keep the length of the content list equal to the URL list
-      soups.append(DL_ERR_MSG)
-  return soups
-
-
-def save_files(soups, schools, output_dir):
-  """Save the roster web page locally.
+        wire_bytes += len(chunk)
+        body.extend(decoder.decompress(chunk))
+        deadline.check(url)
+      if len(body) > OPTIONS.max_body_bytes:
+        LOGGER.warning('Body of %s is over %d bytes, truncating it', url,
+                       OPTIONS.max_body_bytes)
+        REPORT.increment('truncated_bodies')
+        del body[OPTIONS.max_body_bytes:]
+        break
+      if detector and detector.feed(body) is not None:
+        LOGGER.debug('Received the %s roster section of %s after %d bytes',
+                      detector.layout.name, url, len(body))
+        REPORT.increment('early_aborts')
+        break
+  finally:
+    resp.close()
+  REPORT.increment('bytes_received', wire_bytes)
+  REPORT.increment('bytes_decoded', len(body))
+  REPORT.add_to_histogram('content_encodings', content_encoding or 'identity')
+  return bytes(body)
+
+
+def _download(url, cancelled=None, optional=False, deadline=None):
+  """Downloads one roster URL.
+
+  The download waits until LIMITER allows another request in flight, and is
+  given up once the cancelled event is set. Once it has a slot, it is also
+  given up when OPTIONS.school_deadline has passed.
+
+  Note: Any request failures will be logged as an ERROR to the log file.
+
+  Arguments:
+    url: A string of the url to pass to requests.get().
+    cancelled: An optional threading.Event that is set to cancel the download.
+    optional: If True, a failed download isn't counted as failed, e.g. for a
+        light view that is replaced by the full page.
+    deadline: An optional Deadline shared with the other downloads of the
+        school, which is started once this download has a slot unless it has
+        started already. By default, the download has a deadline of its own.
+
+  Returns:
+    The bytes of the response content, or None if the download failed.
+  """
+  import requests
+  import urllib3
+  from util import decompression
+  if deadline is None:
+    deadline = Deadline(OPTIONS.school_deadline, cancelled, start=False)
+  slot = _Slot()
+  try:
+    slot.acquire(url, deadline)
+    # The time spent waiting for a slot doesn't count against the school.
+    deadline.start()
+    start = time.time()
+    req_args = _build_request_args(url)
+    resp = _fetch(req_args, deadline, slot)
+    if resp.status_code == 200:
+      content = _read_body(resp, url, deadline)
+      HOST_STATS.record(url, time.time() - start, len(content))
+      return content
+    resp.close()
+    LOGGER.error('Status code %d for %s', resp.status_code, req_args['url'])
+    LOGGER.error('HTTP reason: %s', resp.reason)
+    LOGGER.error('HTTP response headers:')
+    LOGGER.error(resp.raw.getheaders())
+  except decompression.DECODE_ERRORS as e:
+    LOGGER.error('Could not decode the content of %s: %s', url, e)
+    REPORT.increment('decode_errors')
+  except DeadlineExceeded as e:
+    LOGGER.error(e)
+    REPORT.increment('deadline_exceeded')
+  except urllib3.exceptions.HTTPError as e:
+    # Raised while the streamed body is read, e.g. on a read timeout.
+    LOGGER.error('Could not read the body of %s: %s', url, e)
+    REPORT.increment('read_errors')
+  except requests.exceptions.Timeout:
+    LOGGER.error('Timed out waiting for: %s', req_args['url'])
+    REPORT.increment('timeouts')
+  except requests.exceptions.ConnectionError:
+    LOGGER.error('Connection error for: %s', req_args['url'])
+    REPORT.increment('connection_errors')
+  finally:
+    slot.release()
+  if not optional:
+    REPORT.increment('failed_downloads')
+  return None
+
+
+def _download_roster(url, cancelled=None):
+  """Downloads the lightest view of a roster page that has the roster.
+
+  The light view is used if it has the roster section of a known layout.
+  Otherwise the full page is downloaded. If the light view was received but
+  had no roster, it isn't tried for the host again (see HOST_STATS). Both
+  downloads share one OPTIONS.school_deadline.
 
   Arguments:
-    soups: A list of BeaufitfulSoup instances, one for each corresponding
-        school in the list of schools.
-    schools: A list of strings of each school name. The school name is used as
-        the file name for the saved web page.
+    url: A string of the roster page url.
+    cancelled: An optional threading.Event that is set to cancel the download.
+
+  Returns:
+    The bytes of the page content, or None if the download failed.
+  """
+  deadline = Deadline(OPTIONS.school_deadline, cancelled, start=False)
+  light_url = roster_views.light_view_url(url) if OPTIONS.light_views else None
+  if light_url and HOST_STATS.light_view(url) is not False:
+    content = _download(light_url, cancelled, optional=True, deadline=deadline)
+    if content is not None:
+      # Only a received page says whether the light view has the roster.
+      has_roster = roster_markers.find_section_start(content)[0] is not None
+      HOST_STATS.record_light_view(url, has_roster)
+      if has_roster:
+        REPORT.increment('light_views')
+        return content
+      LOGGER.info('No roster in the light view %s, downloading %s', light_url,
+                  url)
+    REPORT.increment('light_view_fallbacks')
+  return _download(url, cancelled, deadline=deadline)
+
+
+def iter_webpage_content(schools, urls, workers=1, run_deadline=None):
+  """Downloads the roster URLs and yields each page as soon as it finishes.
+
+  Pages are yielded in the order their downloads complete, not in the order of
+  the URL list. Only the pages that the caller has not consumed yet are held in
+  memory.
+
+  Once the run deadline passes, downloads that haven't started are cancelled,
+  downloads in flight are told to stop, and all of them are yielded as failed
+  without waiting for them.
+
+  Arguments:
+    schools: A list of strings of each school name.
+    urls: A list of roster urls, one for each school.
+    workers: An int of the most downloads that run at the same time. LIMITER
+        decides how many of them are in flight.
+    run_deadline: An optional timestamp by which every download must finish.
+
+  Yields:
+    A tuple of (school, url, content), where content is the bytes of the page,
+    or None if the download failed.
+  """
+  cancelled = threading.Event()
+  executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+  try:
+    pending = {executor.submit(_download_roster, url, cancelled):
+               (school, url)
+               for school, url in zip(schools, urls)}
+    timeout = None
+    if run_deadline is not None:
+      timeout = max(0.0, run_deadline - time.time())
+    try:
+      for future in concurrent.futures.as_completed(pending, timeout):
+        school, url = pending.pop(future)
+        yield school, url, future.result()
+    except concurrent.futures.TimeoutError:
+      LOGGER.error('Run deadline reached, cancelling %d downloads',
+                   len(pending))
+      cancelled.set()
+      for future, (school, url) in list(pending.items()):
+        future.cancel()
+        REPORT.increment('cancelled_downloads')
+        REPORT.increment('failed_downloads')
+        yield school, url, None
+  finally:
+    cancelled.set()
+    # Downloads still in flight stop at their next deadline check, so don't
+    # wait for them.
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _save_webpage(school, html, output_dir):
+  """Saves the HTML of one school's roster web page."""
+  file_name = school.replace(' ', '_')
+  roster_file_util.write_file(file_name + '.webpage',
+                              html,
+                              dir_path=output_dir)
+
+
+def save_webpage(school, content, output_dir):
+  """Formats and saves one downloaded roster web page.
+
+  Arguments:
+    school: A string of the school name. The school name is used as the file
+        name for the saved web page.
+    content: The bytes of the page, or None if the download failed.
+    output_dir: The local directory to save all web pages.
+
+  Returns:
+    A string of the saved HTML.
+  """
+  from bs4 import BeautifulSoup as bs
+  soup = bs(content if content is not None else DL_ERR_MSG, 'html.parser')
+  html = soup.prettify()
+  _save_webpage(school, html, output_dir)
+  return html
+
+
+def download_schools(schools, urls, output_dir, checkpoint,
+                     freshness_seconds=0, workers=1, run_deadline=None,
+                     store=None):
+  """Downloads and saves each school's roster page.
+
+  Each page is saved and recorded in the checkpoint manifest as soon as its
+  download finishes, then released, so memory use doesn't grow with the
+  number of schools and a restarted run can skip the schools that were
+  already done.
+
+  Arguments:
+    schools: A list of strings of each school name.
+    urls: A list of roster urls, one for each school.
     output_dir: The local directory to save all web pages.
+    checkpoint: A crawl_checkpoint.CrawlCheckpoint instance.
+    freshness_seconds: Schools fetched successfully within this many seconds
+        are not fetched again.
+    workers: An int of the most downloads that run at the same time. LIMITER
+        decides how many of them are in flight.
+    run_deadline: An optional timestamp by which every download must finish.
+        Schools that aren't done by then are recorded as failed.
+    store: An optional blob_store.BlobStore to also keep each page in. A
+        manifest of the run maps every school to its page; schools that
+        weren't downloaded keep their page from the previous run.
   """
-  # Now save each webpage to a local file.
-  for i, soup in enumerate(soups):
-    file_name = schools[i].replace(' ', '_')
-    roster_file_util.write_file(file_name + '.webpage',
-                                soup.prettify(),
-                                dir_path=output_dir)
+  to_download = []
+  for school, url in zip(schools, urls):
+    if freshness_seconds and checkpoint.is_fresh(school, freshness_seconds,
+                                                 url):
+      LOGGER.debug('Skipping %s, fetched within the freshness window', school)
+      REPORT.increment('cache_hits')
+      continue
+    to_download.append((school, url))
+  if not to_download:
+    return
+  # Start the downloads expected to take longest first, so the slow hosts
+  # don't all finish at the end of the run.
+  to_download = HOST_STATS.longest_first(to_download,
+                                         url_key=lambda item: item[1])
+  previous_pages = store.read_manifest() if store else {}
+  stored_pages = dict(previous_pages)
+  start = time.time()
+  pages = page_bytes = 0
+  try:
+    for school, url, content in iter_webpage_content(
+        *zip(*to_download), workers=workers, run_deadline=run_deadline):
+      REPORT.add_to_histogram('concurrency_limit', int(LIMITER.limit))
+      html = save_webpage(school, content, output_dir)
+      if content is None:
+        checkpoint.record(school, url, crawl_checkpoint.STATUS_ERROR)
+        continue
+      checkpoint.record(school, url, crawl_checkpoint.STATUS_OK, html)
+      pages += 1
+      page_bytes += len(content)
+      if store:
+        digest = store.put(html)
+        if previous_pages.get(school) == digest:
+          REPORT.increment('unchanged_pages')
+        stored_pages[school] = digest
+  finally:
+    if store:
+      run_id = store.write_manifest(stored_pages)
+      LOGGER.info('Saved the manifest of run %s in %s', run_id,
+                  store.root_dir)
+  _report_throughput(pages, page_bytes, time.time() - start)
+
+
+def _report_throughput(pages, page_bytes, seconds):
+  """Adds the download throughput and final concurrency to REPORT."""
+  for key, value in LIMITER.stats().items():
+    REPORT.set_tally('concurrency', key, value)
+  if seconds > 0:
+    REPORT.set_tally('throughput', 'pages_per_second',
+                     round(pages / seconds, 3))
+    REPORT.set_tally('throughput', 'bytes_per_second',
+                     round(page_bytes / seconds))
+
+
+def _set_transport(http2=False, record_file=None, replay_file=None,
+                   replay_latency=False):
+  """Sets TRANSPORT from the command line flags.
+
+  Arguments:
+    http2: If True, send HTTP/2 when httpx[http2] is installed.
+    record_file: An optional string of a WARC archive to record every request
+        and response into.
+    replay_file: An optional string of a WARC archive to serve the responses
+        from instead of the network.
+    replay_latency: If True, replayed responses take their recorded time.
+  """
+  global TRANSPORT
+  from util import cassette
+  from util import http2_transport
+  if replay_file:
+    LOGGER.info('Replaying the responses recorded in %s', replay_file)
+    TRANSPORT = cassette.ReplayTransport(replay_file, replay_latency)
+    return
+  if http2:
+    if http2_transport.available():
+      TRANSPORT = http2_transport.HttpxTransport(
+          max_connections=LIMITER.maximum)
+    else:
+      LOGGER.warning('httpx and h2 are not installed, using HTTP/1.1')
+  if record_file:
+    LOGGER.info('Recording the responses into %s', record_file)
+    TRANSPORT = cassette.RecordingTransport(record_file, TRANSPORT)
 
 
 def main():
+  global HOST_STATS, LIMITER
   school_filter = []
   if flags.schools:
     school_filter = [f.strip() for f in flags.schools.split(',')]
 
-  schools, _, _, _, _, _, urls = \
-      roster_file_util.read_school_info_file(flags.input_file, school_filter)
+  SCHEDULER.rate = flags.requests_per_second
+  SCHEDULER.max_retries = flags.max_retries
+  OPTIONS.max_body_bytes = flags.max_body_bytes
+  OPTIONS.early_abort = not flags.full_pages
+  OPTIONS.connect_timeout = flags.connect_timeout
+  OPTIONS.read_timeout = flags.read_timeout
+  OPTIONS.school_deadline = flags.school_deadline or None
+  OPTIONS.light_views = not flags.no_light_views
+  LIMITER = concurrency.AimdLimiter(
+      initial=flags.initial_workers, maximum=flags.workers,
+      slow_seconds=flags.slow_response_seconds or None)
+  _set_transport(flags.http2, flags.record_file, flags.replay_file,
+                 flags.replay_latency)
+  run_deadline = None
+  if flags.run_deadline_minutes:
+    run_deadline = time.time() + flags.run_deadline_minutes * 60
+  try:
+    schools, _, _, _, _, _, urls = \
+        roster_file_util.read_school_info_file(flags.input_file, school_filter)
+    REPORT.increment('schools', len(schools))
+
+    checkpoint_file = flags.checkpoint_file or os.path.join(
+        flags.output_dir, CHECKPOINT_FILE_NAME)
+    checkpoint = crawl_checkpoint.CrawlCheckpoint(checkpoint_file)
+    HOST_STATS = host_stats.HostStats(flags.host_stats_file or os.path.join(
+        flags.output_dir, HOST_STATS_FILE_NAME))
+    store = blob_store.BlobStore(flags.blob_store) if flags.blob_store else None
+    with REPORT.timer('download'):
+      download_schools(schools, urls, flags.output_dir, checkpoint,
+                       flags.freshness_hours * 3600, flags.workers,
+                       run_deadline, store)
+    HOST_STATS.save()
+  finally:
+    if TRANSPORT:
+      for version, count in TRANSPORT.versions.items():
+        REPORT.add_to_tally('http_versions', version, count)
+      TRANSPORT.close()
+    REPORT.write(flags.report_file)
 
-  soups = get_webpage_content(urls)
 
-  save_files(soups, schools, flags.output_dir)
+def _positive_float(value):
+  """An argparse type of a float greater than 0."""
+  number = float(value)
+  if not number > 0:
+    raise argparse.ArgumentTypeError('{} is not greater than 0'.format(value))
+  return number
 
 
-def _set_arguments():
-  parser = argparse.ArgumentParser()
+def _set_arguments(argv=None, prog=None):
+  parser = argparse.ArgumentParser(prog=prog)
   parser.add_argument('-i', '--input_file', metavar='FILENAME',
                       default='ncaa_d1_womens_soccer_programs.csv',
                       help='CSV file to read school information in from.')
@@ -121,16 +673,94 @@ def _set_arguments():
                         'directory.')
   parser.add_argument('--schools', metavar='"SCHOOL 1, SCHOOL 2, SCHOOL 3"',
                       help='A comma-separated list of schools to output.')
-  return parser.parse_args()
+  parser.add_argument('--workers', metavar='N', type=int, default=16,
+                      help='The most roster pages downloaded at the same '
+                        'time. The number in flight starts at '
+                        '--initial_workers and adapts to how the servers '
+                        'respond. Requests to the same domain are still rate '
+                        'limited by --requests_per_second.')
+  parser.add_argument('--initial_workers', metavar='N', type=int, default=4,
+                      help='How many roster pages are downloaded at the same '
+                        'time when the run starts.')
+  parser.add_argument('--slow_response_seconds', metavar='SECONDS',
+                      type=float, default=LIMITER.slow_seconds,
+                      help='Responses slower than this reduce the number of '
+                        'downloads in flight. Use 0 to ignore latency.')
+  parser.add_argument('--requests_per_second', metavar='RATE',
+                      type=_positive_float, default=1.0,
+                      help='The maximum request rate to each domain.')
+  parser.add_argument('--max_retries', metavar='N', type=int, default=3,
+                      help='How many times to retry a request that failed '
+                        'with a connection error or a transient status code.')
+  parser.add_argument('--max_body_bytes', metavar='BYTES', type=int,
+                      default=OPTIONS.max_body_bytes,
+                      help='The most bytes to read from a roster page.')
+  parser.add_argument('--http2', action='store_true',
+                      help='Multiplex the requests to each server over one '
+                        'HTTP/2 connection when the server supports it. '
+                        'Needs httpx[http2], otherwise HTTP/1.1 is used.')
+  parser.add_argument('--record_file', metavar='FILENAME',
+                      help='Record every request and response into this '
+                        'WARC archive (.warc.gz).')
+  parser.add_argument('--replay_file', metavar='FILENAME',
+                      help='Serve the responses recorded with --record_file '
+                        'instead of downloading the pages.')
+  parser.add_argument('--replay_latency', action='store_true',
+                      help='With --replay_file, wait the recorded time for '
+                        'each response.')
+  parser.add_argument('--full_pages', action='store_true',
+                      help='Download whole pages instead of stopping once the '
+                        'roster section of a known layout has been received.')
+  parser.add_argument('--no_light_views', action='store_true',
+                      help='Always download the full roster page instead of '
+                        'the lighter print view of SidearmSports pages.')
+  parser.add_argument('--connect_timeout', metavar='SECONDS', type=float,
+                      default=OPTIONS.connect_timeout,
+                      help='How long to wait to connect to a roster server.')
+  parser.add_argument('--read_timeout', metavar='SECONDS', type=float,
+                      default=OPTIONS.read_timeout,
+                      help='How long to wait for each read from a roster '
+                        'server.')
+  parser.add_argument('--school_deadline', metavar='SECONDS', type=float,
+                      default=OPTIONS.school_deadline,
+                      help='The most time spent on one school, including '
+                        'retries. Use 0 for no limit.')
+  parser.add_argument('--run_deadline_minutes', metavar='MINUTES', type=float,
+                      default=0,
+                      help='Downloads not finished this many minutes after '
+                        'the run starts are cancelled and recorded as '
+                        'failed. Use 0 for no limit.')
+  parser.add_argument('--checkpoint_file', metavar='FILENAME',
+                      help='The crawl checkpoint manifest. Defaults to {} in '
+                        'the output directory.'.format(CHECKPOINT_FILE_NAME))
+  parser.add_argument('--blob_store', metavar='DIRNAME',
+                      help='Also keep every page in this content-addressed '
+                        'store, with a manifest of each run. Identical pages '
+                        'are only stored once.')
+  parser.add_argument('--host_stats_file', metavar='FILENAME',
+                      help='The download times of each host from past runs, '
+                        'used to start the slowest downloads first. Defaults '
+                        'to {} in the output directory.'.format(
+                          HOST_STATS_FILE_NAME))
+  parser.add_argument('--freshness_hours', metavar='HOURS', type=float,
+                      default=0,
+                      help='Skip schools fetched successfully within this '
+                        'many hours, e.g. 12 to resume an interrupted run '
+                        'where it stopped. By default, every school is '
+                        'fetched.')
+  parser.add_argument('--report_file', metavar='FILENAME',
+                      default=REPORT_FILE,
+                      help='The file to write the JSON run report into.')
+  return parser.parse_args(argv)
 
 
 def _set_logger():
   fmt = '%(asctime)s,%(msecs)-3d %(levelname)-8s %(filename)s:%(lineno)d -> %(message)s'
-  logging.basicConfig(level=logging.DEBUG,
-                      format=fmt,
-                      datefmt='%m-%d %H:%M:%S',
-                      filename=LOGFILE,
-                      filemode='w')
+  queue_logging.basic_config(level=logging.DEBUG,
+                             format=fmt,
+                             datefmt='%m-%d %H:%M:%S',
+                             filename=LOGFILE,
+                             filemode='w')
   return logging.getLogger(__name__)
 
 
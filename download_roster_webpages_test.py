@@ -1,14 +1,25 @@
 """Unit tests for download_roster_webpages.py"""
+from bs4 import BeautifulSoup as bs
+import gzip
+import tempfile
+import threading
+import time
 import unittest
 from unittest import mock
+import zlib
 
 import download_roster_webpages
+from util import blob_store
+from util import concurrency
+from util import decompression
+from util import host_stats
+from util import politeness
 
 class DownloadRosterWebPagesTest(unittest.TestCase):
 
-  @mock.patch('download_roster_webpages.user_agent')
+  @mock.patch('user_agent.generate_user_agent')
   def test_build_request_args(self, mock_ua):
-    mock_ua.generate_user_agent.return_value = 'Mozilla'
+    mock_ua.return_value = 'Mozilla'
     test_url = 'https://wossamotta.u/roster.aspx'
     actual = download_roster_webpages._build_request_args(test_url)
     expected = {
@@ -16,76 +27,464 @@ class DownloadRosterWebPagesTest(unittest.TestCase):
       'headers' : {
         'User-Agent': 'Mozilla',
         'Accept': download_roster_webpages.HTTP_HEADERS['Accept'],
-        'Accept-Encoding': download_roster_webpages.HTTP_HEADERS['Accept-Encoding'],
+        'Accept-Encoding': decompression.accept_encoding(),
         'Accept-Language': download_roster_webpages.HTTP_HEADERS['Accept-Language']
-      }
+      },
+      'stream': True,
+      'timeout': (download_roster_webpages.OPTIONS.connect_timeout,
+                  download_roster_webpages.OPTIONS.read_timeout),
     }
     self.assertEqual(expected, actual)
 
   @mock.patch('download_roster_webpages._build_request_args')
-  @mock.patch('download_roster_webpages.requests')
-  @mock.patch('download_roster_webpages.bs')
-  def test_get_webpage_content(self, mock_bs, mock_requests, mock_bra):
-    mock_bs.return_value = 'fake_content'
+  @mock.patch('requests.get')
+  def test_download(self, mock_get, mock_bra):
     mock_response = mock.MagicMock()
     mock_response.status_code = 200
     mock_response.headers = {'Content-Encoding': 'gzip'}
-    mock_response.content = '<html>Roster</html>'
-    mock_requests.get.return_value = mock_response
+    compressed = gzip.compress(b'<html>Roster</html>')
+    mock_response.raw.stream.return_value = [compressed[:10], compressed[10:]]
+    mock_get.return_value = mock_response
     test_url = 'http://www.quahog.univ/SportSelect.dbml'
     fake_request_arg = {
       'url': test_url,
       'headers': {'User-Agent': 'Mozilla'}
     }
     mock_bra.return_value = fake_request_arg
-    actual = download_roster_webpages.get_webpage_content([test_url])
-    expected = ['fake_content']
-    # This setting prints out the full difference if assertEqual() fails.
-    self.maxDiff = None
-    self.assertEqual(expected, actual)
-    mock_requests.get.assert_called_once_with(**fake_request_arg)
-    mock_bs.assert_called_once_with('<html>Roster</html>', 'html.parser')
+    actual = download_roster_webpages._download(test_url)
+    self.assertEqual(b'<html>Roster</html>', actual)
+    mock_get.assert_called_once_with(**fake_request_arg)
+    mock_response.close.assert_called_once_with()
 
   @mock.patch('download_roster_webpages.LOGGER')
   @mock.patch('download_roster_webpages._build_request_args')
-  @mock.patch('download_roster_webpages.requests')
-  def test_get_webpage_content_server_error(self, mock_requests, mock_bra,
-                                            mock_logger):
+  @mock.patch('requests.get')
+  def test_download_server_error(self, mock_get, mock_bra, mock_logger):
     mock_response = mock.MagicMock()
     mock_response.status_code = 500
     mock_response.headers = {'Content-Encoding': 'gzip'}
     mock_response.content = '<html>Roster</html>'
-    mock_requests.get.return_value = mock_response
+    mock_get.return_value = mock_response
     test_url = 'http://www.greendalecc.edu/roster.aspx'
     fake_request_arg = {
       'url': test_url,
       'headers': {'User-Agent': 'Mozilla'}
     }
     mock_bra.return_value = fake_request_arg
-    actual = download_roster_webpages.get_webpage_content([test_url])
-    expected = [download_roster_webpages.DL_ERR_MSG]
-    # This setting prints out the full difference if assertEqual() fails.
-    self.maxDiff = None
-    self.assertEqual(expected, actual)
-    mock_requests.get.assert_called_once_with(**fake_request_arg)
+    self.assertIsNone(download_roster_webpages._download(test_url))
+    mock_get.assert_called_once_with(**fake_request_arg)
     self.assertEqual(4, mock_logger.error.call_count)
 
-  @mock.patch('download_roster_webpages.roster_file_util')
-  def test_save_files(self, mock_fu):
-    mock_soup = mock.MagicMock()
-    fake_html = '<html>Roster</html>'
-    mock_soup.prettify.return_value = fake_html
-    fake_soups = [mock_soup]
-    fake_school_name = 'School 1'
-    fake_schools = [fake_school_name]
-    fake_dir = '/foo/bar/biz'
-    download_roster_webpages.save_files(fake_soups, fake_schools, fake_dir)
-    expected_calls = [
-      mock.call('School_1.webpage', fake_html, dir_path=fake_dir),
+  @mock.patch('download_roster_webpages.LOGGER')
+  @mock.patch('download_roster_webpages._build_request_args')
+  @mock.patch('requests.get')
+  def test_download_retries_transient_errors(self, mock_get, mock_bra,
+                                             mock_logger):
+    mock_unavailable = mock.MagicMock()
+    mock_unavailable.status_code = 503
+    mock_unavailable.headers = {'Retry-After': '7'}
+    mock_ok = mock.MagicMock()
+    mock_ok.status_code = 200
+    mock_ok.headers = {}
+    mock_ok.raw.stream.return_value = [b'<html>Roster</html>']
+    mock_get.side_effect = [mock_unavailable, mock_ok]
+    test_url = 'http://www.shermerhigh.edu/roster.aspx'
+    mock_bra.return_value = {'url': test_url}
+    fake_clock = [100.0]
+    def fake_sleep(seconds):
+      fake_clock[0] += seconds
+    scheduler = politeness.DomainScheduler(clock=lambda: fake_clock[0],
+                                           sleep=fake_sleep)
+    with mock.patch('download_roster_webpages.SCHEDULER', scheduler):
+      actual = download_roster_webpages._download(test_url)
+    self.assertEqual(b'<html>Roster</html>', actual)
+    self.assertEqual(2, mock_get.call_count)
+    # The second request waited for the Retry-After delay.
+    self.assertEqual(107.0, fake_clock[0])
+    self.assertEqual(1, mock_logger.warning.call_count)
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  def test_read_body_stops_after_roster_section(self, mock_logger):
+    mock_response = mock.MagicMock()
+    mock_response.headers = {}
+    mock_response.raw.stream.return_value = [
+        b'<html><body><table class="default_dgrd roster_dgrd">',
+        b'<tr class="default_dgrd_item"><td>x</td></tr></tab',
+        b'le><footer>Sponsors</footer>',
+        b'<script>never read</script></body></html>',
     ]
-    # This setting prints out the full difference if assertEqual() fails.
-    self.maxDiff = None
-    self.assertEqual(expected_calls, mock_fu.write_file.mock_calls)
+    actual = download_roster_webpages._read_body(mock_response, 'fake_url')
+    self.assertTrue(actual.endswith(b'</table><footer>Sponsors</footer>'))
+    mock_response.close.assert_called_once_with()
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  def test_read_body_reads_past_sidearm_for_dgrd(self, mock_logger):
+    # A dgrd table is read instead of a sidearm list, so the page is read
+    # until the table, which can follow the list, has been received.
+    mock_response = mock.MagicMock()
+    mock_response.headers = {}
+    mock_response.raw.stream.return_value = [
+        b'<html><body><ul class="sidearm-roster-players">',
+        b'<li class="sidearm-roster-player"><ul><li>x</li></ul></li></ul>',
+        b'<table class="default_dgrd roster_dgrd">',
+        b'<tr class="default_dgrd_item"><td>x</td></tr></table>',
+        b'<script>never read</script></body></html>',
+    ]
+    actual = download_roster_webpages._read_body(mock_response, 'fake_url')
+    self.assertTrue(actual.endswith(b'<td>x</td></tr></table>'))
+
+    # A short page without a dgrd table is read to the end.
+    mock_response.raw.stream.return_value = [
+        b'<html><body><ul class="sidearm-roster-players">',
+        b'<li class="sidearm-roster-player"><ul><li>x</li></ul></li></ul>',
+        b'<footer>Sponsors</footer></body></html>',
+    ]
+    actual = download_roster_webpages._read_body(mock_response, 'fake_url')
+    self.assertTrue(actual.endswith(b'</body></html>'))
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  def test_read_body_stops_after_sidearm_only_page(self, mock_logger):
+    with open('testdata/Southeastern_Louisiana.webpage', 'rb') as fo:
+      page = fo.read()
+    mock_response = mock.MagicMock()
+    mock_response.headers = {}
+    chunk_size = download_roster_webpages.OPTIONS.chunk_size
+    mock_response.raw.stream.return_value = [
+        page[i:i + chunk_size] for i in range(0, len(page), chunk_size)]
+    actual = download_roster_webpages._read_body(mock_response, 'fake_url')
+    self.assertTrue(page.startswith(actual))
+    self.assertLess(len(actual), len(page))
+    self.assertIn(b'sidearm-roster-players', actual)
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  def test_read_body_max_body_bytes(self, mock_logger):
+    mock_response = mock.MagicMock()
+    mock_response.headers = {}
+    mock_response.raw.stream.return_value = [b'a' * 6, b'b' * 6, b'c' * 6]
+    with mock.patch.object(download_roster_webpages.OPTIONS,
+                           'max_body_bytes', 10):
+      actual = download_roster_webpages._read_body(mock_response, 'fake_url')
+    self.assertEqual(b'aaaaaabbbb', actual)
+    self.assertEqual(1, mock_logger.warning.call_count)
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  def test_read_body_decodes_each_chunk(self, mock_logger):
+    html = b'<html>' + b'<p>Roster</p>' * 1000 + b'</html>'
+    compressed = zlib.compress(html)
+    mock_response = mock.MagicMock()
+    mock_response.headers = {'Content-Encoding': 'deflate'}
+    mock_response.raw.stream.return_value = [
+        compressed[i:i + 100] for i in range(0, len(compressed), 100)]
+    actual = download_roster_webpages._read_body(mock_response, 'fake_url')
+    self.assertEqual(html, actual)
+    mock_response.raw.stream.assert_called_once_with(
+        download_roster_webpages.OPTIONS.chunk_size, decode_content=False)
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  def test_read_body_unknown_encoding(self, mock_logger):
+    mock_response = mock.MagicMock()
+    mock_response.headers = {'Content-Encoding': 'compress'}
+    with self.assertRaises(ValueError):
+      download_roster_webpages._read_body(mock_response, 'fake_url')
+    mock_response.close.assert_called_once_with()
+    mock_response.raw.stream.assert_not_called()
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  @mock.patch('download_roster_webpages._build_request_args')
+  @mock.patch('requests.get')
+  def test_download_decode_error(self, mock_get, mock_bra, mock_logger):
+    mock_response = mock.MagicMock()
+    mock_response.status_code = 200
+    mock_response.headers = {'Content-Encoding': 'gzip'}
+    mock_response.raw.stream.return_value = [b'not gzip data']
+    mock_get.return_value = mock_response
+    mock_bra.return_value = {'url': 'http://www.bayside.edu/roster.aspx'}
+    self.assertIsNone(download_roster_webpages._download(
+        'http://www.bayside.edu/roster.aspx'))
+    self.assertEqual(1, mock_logger.error.call_count)
+
+  @mock.patch('download_roster_webpages._download')
+  def test_iter_webpage_content(self, mock_download):
+    mock_download.side_effect = (
+        lambda url, cancelled, deadline: None if 'two' in url else b'page')
+    fake_schools = ['School 1', 'School 2', 'School 3']
+    fake_urls = ['http://one.edu', 'http://two.edu', 'http://three.edu']
+    actual = list(download_roster_webpages.iter_webpage_content(
+        fake_schools, fake_urls, workers=2))
+    expected = [('School 1', 'http://one.edu', b'page'),
+                ('School 2', 'http://two.edu', None),
+                ('School 3', 'http://three.edu', b'page')]
+    self.assertCountEqual(expected, actual)
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  @mock.patch('download_roster_webpages._download')
+  def test_iter_webpage_content_run_deadline(self, mock_download,
+                                             mock_logger):
+    def fake_download(url, cancelled, deadline):
+      if 'slow' in url:
+        cancelled.wait(5)
+        return None
+      return b'page'
+    mock_download.side_effect = fake_download
+    fake_schools = ['School 1', 'School 2', 'School 3']
+    fake_urls = ['http://one.edu', 'http://slow.edu', 'http://slower.edu']
+    start = time.time()
+    actual = list(download_roster_webpages.iter_webpage_content(
+        fake_schools, fake_urls, workers=2, run_deadline=time.time() + 0.2))
+    self.assertLess(time.time() - start, 2)
+    expected = [('School 1', 'http://one.edu', b'page'),
+                ('School 2', 'http://slow.edu', None),
+                ('School 3', 'http://slower.edu', None)]
+    self.assertCountEqual(expected, actual)
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  @mock.patch('download_roster_webpages._download')
+  def test_download_roster_light_view(self, mock_download, mock_logger):
+    pages = {
+      'http://one.edu/roster.aspx?print=true':
+          b'<table class="default_dgrd roster_dgrd"></table>',
+      'http://two.edu/roster.aspx?print=true': b'<html>Print</html>',
+      'http://two.edu/roster.aspx': b'<html>Full</html>',
+      'http://three.edu/roster': b'<html>Presto</html>',
+    }
+    mock_download.side_effect = (
+        lambda url, cancelled=None, optional=False, deadline=None:
+        pages.get(url))
+    stats = host_stats.HostStats()
+    with mock.patch('download_roster_webpages.HOST_STATS', stats):
+      self.assertEqual(pages['http://one.edu/roster.aspx?print=true'],
+                       download_roster_webpages._download_roster(
+                           'http://one.edu/roster.aspx'))
+      self.assertEqual(b'<html>Full</html>',
+                       download_roster_webpages._download_roster(
+                           'http://two.edu/roster.aspx'))
+      self.assertEqual(b'<html>Presto</html>',
+                       download_roster_webpages._download_roster(
+                           'http://three.edu/roster'))
+      self.assertTrue(stats.light_view('http://one.edu'))
+      self.assertFalse(stats.light_view('http://two.edu'))
+      # The light view of two.edu had no roster, so it isn't tried again.
+      mock_download.reset_mock()
+      download_roster_webpages._download_roster('http://two.edu/roster.aspx')
+      mock_download.assert_called_once_with('http://two.edu/roster.aspx', None,
+                                            deadline=mock.ANY)
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  @mock.patch('download_roster_webpages._download')
+  def test_download_roster_light_view_failed(self, mock_download,
+                                             mock_logger):
+    mock_download.side_effect = [None, b'<html>Full</html>']
+    stats = host_stats.HostStats()
+    with mock.patch('download_roster_webpages.HOST_STATS', stats):
+      self.assertEqual(b'<html>Full</html>',
+                       download_roster_webpages._download_roster(
+                           'http://one.edu/roster.aspx'))
+    # A failed download says nothing about the light view.
+    self.assertIsNone(stats.light_view('http://one.edu'))
+    # Both downloads count against the same school deadline.
+    light_call, full_call = mock_download.call_args_list
+    self.assertIs(light_call[1]['deadline'], full_call[1]['deadline'])
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  def test_read_body_deadline(self, mock_logger):
+    mock_response = mock.MagicMock()
+    mock_response.headers = {}
+    mock_response.raw.stream.return_value = [b'a', b'b']
+    cancelled = threading.Event()
+    cancelled.set()
+    deadline = download_roster_webpages.Deadline(None, cancelled)
+    with self.assertRaises(download_roster_webpages.DeadlineExceeded):
+      download_roster_webpages._read_body(mock_response, 'fake_url', deadline)
+    mock_response.close.assert_called_once_with()
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  @mock.patch('download_roster_webpages.SCHEDULER')
+  @mock.patch('download_roster_webpages._build_request_args')
+  @mock.patch('requests.get')
+  def test_download_no_retry_past_deadline(self, mock_get, mock_bra,
+                                          mock_scheduler, mock_logger):
+    mock_unavailable = mock.MagicMock()
+    mock_unavailable.status_code = 503
+    mock_unavailable.headers = {'Retry-After': '3600'}
+    mock_get.return_value = mock_unavailable
+    mock_scheduler.backoff_delay.return_value = 3600
+    mock_bra.return_value = {'url': 'http://www.bayside.edu/roster.aspx'}
+    self.assertIsNone(download_roster_webpages._download(
+        'http://www.bayside.edu/roster.aspx'))
+    self.assertEqual(1, mock_get.call_count)
+    mock_scheduler.pause_domain.assert_not_called()
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  @mock.patch('download_roster_webpages.save_webpage')
+  @mock.patch('download_roster_webpages.iter_webpage_content')
+  def test_download_schools_slowest_first(self, mock_iwc, mock_sw,
+                                          mock_logger):
+    mock_iwc.return_value = iter([])
+    stats = host_stats.HostStats()
+    stats.record('http://slow.edu/roster.aspx', 30, 1000)
+    stats.record('http://fast.edu/roster.aspx', 1, 1000)
+    fake_schools = ['Fast', 'Slow']
+    fake_urls = ['http://fast.edu/roster.aspx', 'http://slow.edu/roster.aspx']
+    with mock.patch.object(download_roster_webpages, 'HOST_STATS', stats):
+      download_roster_webpages.download_schools(fake_schools, fake_urls,
+                                                'fake_dir', mock.MagicMock())
+    mock_iwc.assert_called_once_with(
+        ('Slow', 'Fast'),
+        ('http://slow.edu/roster.aspx', 'http://fast.edu/roster.aspx'),
+        workers=1, run_deadline=None)
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  @mock.patch('download_roster_webpages.SCHEDULER')
+  @mock.patch('download_roster_webpages._build_request_args')
+  @mock.patch('requests.get')
+  def test_download_throttling_lowers_concurrency(
+      self, mock_get, mock_bra, mock_scheduler, mock_logger):
+    mock_throttled = mock.MagicMock()
+    mock_throttled.status_code = 429
+    mock_throttled.headers = {}
+    mock_ok = mock.MagicMock()
+    mock_ok.status_code = 200
+    mock_ok.headers = {}
+    mock_ok.raw.stream.return_value = [b'<html>Roster</html>']
+    mock_get.side_effect = [mock_throttled, mock_ok]
+    mock_scheduler.backoff_delay.return_value = 0
+    mock_bra.return_value = {'url': 'http://www.bayside.edu/roster.aspx'}
+    limiter = concurrency.AimdLimiter(initial=8, maximum=8, slow_seconds=None)
+    with mock.patch.object(download_roster_webpages, 'LIMITER', limiter):
+      download_roster_webpages._download('http://www.bayside.edu/roster.aspx')
+    # Halved by the 429, then raised a little by the 200.
+    self.assertAlmostEqual(4.25, limiter.limit)
+    self.assertEqual(0, limiter.in_flight)
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  @mock.patch('download_roster_webpages._build_request_args')
+  @mock.patch('requests.get')
+  def test_download_releases_slot_during_backoff(self, mock_get, mock_bra,
+                                                 mock_logger):
+    mock_unavailable = mock.MagicMock()
+    mock_unavailable.status_code = 503
+    mock_unavailable.headers = {'Retry-After': '7'}
+    mock_ok = mock.MagicMock()
+    mock_ok.status_code = 200
+    mock_ok.headers = {}
+    mock_ok.raw.stream.return_value = [b'<html>Roster</html>']
+    mock_get.side_effect = [mock_unavailable, mock_ok]
+    mock_bra.return_value = {'url': 'http://www.bayside.edu/roster.aspx'}
+    limiter = concurrency.AimdLimiter(initial=1, maximum=1, slow_seconds=None)
+    in_flight_while_waiting = []
+    fake_clock = [100.0]
+    def fake_sleep(seconds):
+      in_flight_while_waiting.append(limiter.in_flight)
+      fake_clock[0] += seconds
+    scheduler = politeness.DomainScheduler(clock=lambda: fake_clock[0],
+                                           sleep=fake_sleep)
+    with mock.patch.object(download_roster_webpages, 'LIMITER', limiter), \
+         mock.patch.object(download_roster_webpages, 'SCHEDULER', scheduler):
+      actual = download_roster_webpages._download(
+          'http://www.bayside.edu/roster.aspx')
+    self.assertEqual(b'<html>Roster</html>', actual)
+    self.assertEqual([0], in_flight_while_waiting)
+    self.assertEqual(0, limiter.in_flight)
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  @mock.patch('download_roster_webpages._build_request_args')
+  @mock.patch('requests.get')
+  def test_download_deadline_starts_with_slot(self, mock_get, mock_bra,
+                                              mock_logger):
+    mock_ok = mock.MagicMock()
+    mock_ok.status_code = 200
+    mock_ok.headers = {}
+    mock_ok.raw.stream.return_value = [b'<html>Roster</html>']
+    mock_get.return_value = mock_ok
+    mock_bra.return_value = {'url': 'http://www.bayside.edu/roster.aspx'}
+    limiter = concurrency.AimdLimiter(initial=1, maximum=1, slow_seconds=None)
+    limiter.acquire()
+    # Another download holds the only slot past the school deadline.
+    timer = threading.Timer(0.3, limiter.release)
+    timer.start()
+    with mock.patch.object(download_roster_webpages, 'LIMITER', limiter), \
+         mock.patch.object(download_roster_webpages.OPTIONS, 'school_deadline',
+                           0.1):
+      actual = download_roster_webpages._download(
+          'http://www.bayside.edu/roster.aspx')
+    timer.join()
+    self.assertEqual(b'<html>Roster</html>', actual)
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  @mock.patch('download_roster_webpages.save_webpage')
+  @mock.patch('download_roster_webpages.iter_webpage_content')
+  def test_download_schools_blob_store(self, mock_iwc, mock_sw, mock_logger):
+    fake_schools = ['School 1', 'School 2']
+    fake_urls = ['http://one.edu/roster.aspx', 'http://two.edu/roster.aspx']
+    mock_sw.side_effect = lambda school, content, output_dir: (
+        content.decode('utf-8') if content else 'error')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      store = blob_store.BlobStore(tmp_dir)
+      store.write_manifest({'School 1': store.put('<html>One</html>'),
+                            'School 2': store.put('<html>Old</html>')},
+                           '20191121T000000Z')
+      mock_iwc.return_value = iter([
+          ('School 1', fake_urls[0], b'<html>One</html>'),
+          ('School 2', fake_urls[1], None)])
+      download_roster_webpages.download_schools(
+          fake_schools, fake_urls, 'fake_dir', mock.MagicMock(), store=store)
+      run_ids = store.run_ids()
+      self.assertEqual(2, len(run_ids))
+      self.assertEqual(store.read_manifest(run_ids[0]),
+                       store.read_manifest(run_ids[1]))
+
+  @mock.patch('download_roster_webpages.roster_file_util')
+  def test_save_webpage(self, mock_fu):
+    actual = download_roster_webpages.save_webpage(
+        'School 1', b'<html><p>Roster</p></html>', 'fake_dir')
+    self.assertIn('Roster', actual)
+    mock_fu.write_file.assert_called_once_with('School_1.webpage', actual,
+                                               dir_path='fake_dir')
+    actual_error = download_roster_webpages.save_webpage('School 2', None,
+                                                         'fake_dir')
+    expected_error = bs(download_roster_webpages.DL_ERR_MSG, 'html.parser')
+    self.assertEqual(expected_error.prettify(), actual_error)
+
+  @mock.patch('download_roster_webpages.LOGGER')
+  @mock.patch('download_roster_webpages.save_webpage')
+  @mock.patch('download_roster_webpages.iter_webpage_content')
+  def test_download_schools_skips_fresh_schools(self, mock_iwc, mock_sw,
+                                                mock_logger):
+    mock_iwc.return_value = iter([
+        ('School 2', 'http://two.edu/roster.aspx', b'<html>Roster</html>'),
+        ('School 3', 'http://three.edu/roster.aspx', None)])
+    mock_sw.return_value = '<html>Roster</html>'
+    mock_checkpoint = mock.MagicMock()
+    mock_checkpoint.is_fresh.side_effect = [True, False, False]
+    fake_schools = ['School 1', 'School 2', 'School 3']
+    fake_urls = ['http://one.edu/roster.aspx', 'http://two.edu/roster.aspx',
+                 'http://three.edu/roster.aspx']
+    download_roster_webpages.download_schools(fake_schools, fake_urls,
+                                              'fake_dir', mock_checkpoint,
+                                              3600, 2)
+    mock_iwc.assert_called_once_with(
+        ('School 2', 'School 3'),
+        ('http://two.edu/roster.aspx', 'http://three.edu/roster.aspx'),
+        workers=2, run_deadline=None)
+    self.assertEqual(2, mock_sw.call_count)
+    self.assertEqual([
+        mock.call('School 2', 'http://two.edu/roster.aspx', 'ok',
+                  '<html>Roster</html>'),
+        mock.call('School 3', 'http://three.edu/roster.aspx', 'error'),
+    ], mock_checkpoint.record.mock_calls)
+
+  def test_set_arguments_requests_per_second(self):
+    flags = download_roster_webpages._set_arguments(
+        ['--requests_per_second', '0.5'])
+    self.assertEqual(0.5, flags.requests_per_second)
+    for rate in ('0', '-1', 'nan'):
+      with mock.patch('sys.stderr'), self.assertRaises(SystemExit):
+        download_roster_webpages._set_arguments(['--requests_per_second',
+                                                 rate])
+
+  def test_set_arguments_freshness_off_by_default(self):
+    self.assertEqual(0, download_roster_webpages._set_arguments(
+        []).freshness_hours)
 
 
 if __name__ == '__main__':
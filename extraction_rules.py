@@ -0,0 +1,504 @@
+"""Declarative roster extraction rules, compiled into extractors.
+
+A rule describes where the players of one roster page layout are and how
+each of their fields is read and cleaned up. New layouts can be supported by
+adding a rule, e.g. in a JSON rules file, instead of writing another
+ncaa_roster_parser.ProcessorBase subclass. The layouts of the processors in
+ncaa_roster_parser are the built-in rules (see BUILTIN_RULES).
+
+A rule is a dict with these keys:
+  name: A string naming the rule.
+  layout: The name of the processor_registry entry, e.g. "sidearm", of the
+      pages the rule reads. The registry picks the entry of a page by its
+      signature, and only the rules of that entry are tried.
+  detect: An optional CSS selector that must match the page for the rule to
+      be used, e.g. to read the pages of one site differently from the other
+      pages of its layout.
+  rows: A CSS selector of the element of each player, or a dict of
+      {"tag": name, "class": regex} for class names that CSS can't match.
+  duplicate_views: An optional tag name, e.g. "table". Rows are grouped by
+      their closest element of the tag, and a group whose player names were
+      all in earlier groups is a second rendering of the roster, so it's
+      skipped.
+  fields: A list of field specs, each read from the player element:
+      field: The player field, e.g. "name" (see ncaa_roster_parser.FIELDS).
+      select: A CSS selector of the node that holds the field, or a list of
+          selectors, each applied to the first match of the previous one.
+      clean: A list of cleanup steps, applied in order to the node text. Each
+          step is a name, or a list of a name and its argument (see
+          CLEANUP_STEPS). Defaults to ["spaces"].
+      split: The name of a splitter (see SPLITTERS) that reads several
+          fields out of the cleaned text, instead of setting the field.
+      warn_missing: If true, a player without the node, or the node of any
+          fallback, is counted in util/diagnostics.py.
+      fallback: Another field spec, used when the node isn't found.
+  cells: An optional dict that reads fields out of the cells of each row:
+      select: A CSS selector of the cells.
+      key: "class" to match the class names of each cell, or "label" to match
+          the label of each cell (see HtmlTableProcessor.get_labels_and_data).
+      require_data: If true, rows without any cell data are skipped.
+      fields: A list of cell specs. Each cell is read by the first spec with
+          a "match" substring in its key, whose "unless" field, if any, isn't
+          set yet. Specs take field, clean and split like the field specs.
+
+Rules are compiled once into CompiledRule instances: the selectors with
+soupsieve, the class patterns as regular expressions and the cleanup steps as
+functions, so pages are read without parsing any rule again.
+"""
+import json
+import logging
+import re
+
+import soupsieve
+from util import diagnostics
+
+import ncaa_roster_parser
+import processor_registry
+
+BUILTIN_RULES = [
+  {
+    # ncaa_roster_parser.SidearmSportsDgrdProcessor
+    'name': 'sidearm_dgrd',
+    'layout': 'sidearm_dgrd',
+    'rows': {'tag': 'tr', 'class': '^default_dgrd'},
+    'cells': {
+      'select': 'td[class]',
+      'key': 'class',
+      'fields': [
+        {'match': ['full_name'], 'field': 'name'},
+        {'match': ['_no'], 'field': 'jersey',
+         'clean': ['spaces', ['remove_prefix', '#']]},
+        {'match': ['position'], 'field': 'position'},
+        {'match': ['height'], 'field': 'height'},
+        {'match': ['academic_year'], 'field': 'year'},
+        {'match': ['hometown'], 'split': 'slash_separated', 'clean': []},
+        # The custom cell sometimes holds the hometown, and sometimes other
+        # things like the academic major.
+        {'match': ['custom'], 'unless': 'hometown', 'split': 'slash_separated',
+         'clean': []},
+        {'match': ['highschool'], 'field': 'high_school'},
+        {'match': ['previous'], 'field': 'club'},
+      ],
+    },
+  },
+  {
+    # ncaa_roster_parser.SidearmSportsSidearmClassNameProcessor
+    'name': 'sidearm',
+    'layout': 'sidearm',
+    'rows': 'li.sidearm-roster-player',
+    'fields': [
+      {'field': 'name', 'select': '[class="sidearm-roster-player-name"]',
+       'clean': ['from_first_letter', 'spaces'], 'warn_missing': True},
+      {'field': 'jersey',
+       'select': '[class="sidearm-roster-player-jersey-number"]',
+       'warn_missing': True},
+      # The short position, e.g. "F", not the long one, e.g. "Forward".
+      {'field': 'position',
+       'select': 'span.sidearm-roster-player-position-long-short'
+                 '.hide-on-medium',
+       'fallback': {'select': ['div.sidearm-roster-player-position',
+                               'span']}},
+      {'field': 'height', 'select': '[class="sidearm-roster-player-height"]',
+       'warn_missing': True},
+      {'field': 'hometown',
+       'select': '[class="sidearm-roster-player-hometown"]',
+       'split': 'hometown_state', 'clean': [], 'warn_missing': True},
+      {'field': 'high_school',
+       'select': '[class="sidearm-roster-player-highschool"]',
+       'warn_missing': True,
+       'fallback': {'select': '[class="sidearm-roster-player-previous-school"]',
+                    'warn_missing': True}},
+      {'field': 'year',
+       'select': '[class="sidearm-roster-player-academic-year"]',
+       'warn_missing': True},
+      # The custom field sometimes just has 2- or 3-letter codes in it.
+      {'field': 'club', 'select': '[class="sidearm-roster-player-custom1"]',
+       'clean': ['spaces', ['min_length', 4]]},
+    ],
+  },
+  {
+    # ncaa_roster_parser.SportSelectProcessor
+    'name': 'sportselect',
+    'layout': 'sportselect',
+    'rows': {'tag': 'div', 'class': 'player.+left'},
+    'fields': [
+      {'field': 'name', 'select': '[class*="player-name"]'},
+      {'field': 'jersey', 'select': '[class*="number"]',
+       'clean': ['strip', ['remove_prefix', '#']]},
+      {'field': 'position', 'select': ['[class*="position"]', '[class="data"]'],
+       'clean': ['strip']},
+      {'field': 'height', 'select': '[class*="height"]', 'clean': ['strip']},
+      {'field': 'year', 'select': ['[class*="year"]', '[class="data"]'],
+       'clean': ['strip']},
+      {'field': 'hometown', 'select': ['[class*="hometown"]', '[class="data"]'],
+       'clean': ['strip'], 'split': 'parenthesized_schools'},
+    ],
+  },
+  {
+    # ncaa_roster_parser.HtmlTableProcessor
+    'name': 'html_table',
+    'layout': 'html_table',
+    'rows': 'tr',
+    'duplicate_views': 'table',
+    'fields': [
+      {'field': 'name', 'select': 'th'},
+    ],
+    'cells': {
+      'key': 'label',
+      'require_data': True,
+      'fields': [
+        {'match': ['no'], 'field': 'jersey'},
+        {'match': ['pos'], 'field': 'position'},
+        {'match': ['yr', 'year', 'cl.', 'class'], 'field': 'year'},
+        {'match': ['ht', 'height'], 'field': 'height'},
+        {'match': ['hometown'], 'field': 'hometown'},
+        {'match': ['state'], 'field': 'home_state'},
+        {'match': ['high', 'prev', 'last'], 'field': 'high_school'},
+        {'match': ['club'], 'field': 'club'},
+      ],
+    },
+  },
+]
+
+_LETTER_RE = re.compile('[a-zA-Z]')
+# Processors with the formatting methods that the splitters share. None of
+# them keep any state between calls.
+_SIDEARM = ncaa_roster_parser.SidearmSportsSidearmClassNameProcessor(None)
+_DGRD = ncaa_roster_parser.SidearmSportsDgrdProcessor(None)
+_SPORTSELECT = ncaa_roster_parser.SportSelectProcessor(None)
+_HTML_TABLE = ncaa_roster_parser.HtmlTableProcessor(None)
+
+
+def _from_first_letter(text):
+  m = _LETTER_RE.search(text)
+  return text[m.start():] if m else ''
+
+
+def _min_length(length):
+  return lambda text: text if len(text) >= length else ''
+
+
+def _remove_prefix(prefix):
+  return lambda text: text[len(prefix):] if text.startswith(prefix) else text
+
+
+# Cleanup step names, and functions that return the step's function of text.
+CLEANUP_STEPS = {
+  'spaces': lambda: _SIDEARM.remove_extra_spaces,
+  'strip': lambda: str.strip,
+  'from_first_letter': lambda: _from_first_letter,
+  'min_length': _min_length,
+  'remove_prefix': _remove_prefix,
+}
+
+
+def _split_hometown_state(text, player):
+  """"Hammond, La." -> hometown and home_state."""
+  del player
+  hometown, home_state = _SIDEARM.format_hometown_and_home_state(text)
+  return {'hometown': hometown, 'home_state': home_state}
+
+
+def _split_slash_separated(text, player):
+  """"Hometown, State / High School / Club" -> four fields."""
+  hometown, home_state, high_school, club = \
+      _DGRD.format_slash_separated_data(text, player['high_school'])
+  return {'hometown': hometown, 'home_state': home_state,
+          'high_school': high_school, 'club': club}
+
+
+def _split_parenthesized_schools(text, player):
+  """"McKinney, Texas (Boyd HS)" -> four fields."""
+  del player
+  hometown, home_state, high_school, club = \
+      _SPORTSELECT.format_hometown_homestate_highschool_club(text)
+  return {'hometown': hometown, 'home_state': home_state,
+          'high_school': high_school, 'club': club}
+
+
+# Splitter names, and functions of (text, player fields so far) that return a
+# dict of the fields in the text.
+SPLITTERS = {
+  'hometown_state': _split_hometown_state,
+  'slash_separated': _split_slash_separated,
+  'parenthesized_schools': _split_parenthesized_schools,
+}
+
+
+class RuleError(ValueError):
+  """Raised for a rule that can't be compiled."""
+
+
+def _compile_selector(selector, rule_name):
+  try:
+    return soupsieve.compile(selector)
+  except soupsieve.SelectorSyntaxError as e:
+    raise RuleError('Bad selector in rule {}: {}'.format(rule_name, e))
+
+
+class _CompiledField(object):
+  """A field spec with its selectors, cleanup steps and splitter compiled."""
+
+  def __init__(self, spec, rule_name):
+    self.field = spec.get('field')
+    selectors = spec.get('select', [])
+    if isinstance(selectors, str):
+      selectors = [selectors]
+    self.selector_text = ' -> '.join(selectors)
+    self.selectors = [_compile_selector(s, rule_name) for s in selectors]
+    self.clean = []
+    for step in spec.get('clean', ['spaces']):
+      name, args = (step, []) if isinstance(step, str) else (step[0], step[1:])
+      if name not in CLEANUP_STEPS:
+        raise RuleError('Unknown cleanup step in rule {}: {}'.format(
+            rule_name, name))
+      self.clean.append(CLEANUP_STEPS[name](*args))
+    self.split = None
+    if 'split' in spec:
+      if spec['split'] not in SPLITTERS:
+        raise RuleError('Unknown splitter in rule {}: {}'.format(
+            rule_name, spec['split']))
+      self.split = SPLITTERS[spec['split']]
+    elif self.field not in ncaa_roster_parser.FIELDS:
+      raise RuleError('Unknown field in rule {}: {}'.format(rule_name,
+                                                            self.field))
+    self.warn_missing = spec.get('warn_missing', False)
+    self.fallback = None
+    if 'fallback' in spec:
+      fallback = dict(spec['fallback'])
+      for key in ('field', 'clean', 'split'):
+        if key in spec:
+          fallback.setdefault(key, spec[key])
+      self.fallback = _CompiledField(fallback, rule_name)
+    self.match = spec.get('match', [])
+    self.unless = spec.get('unless')
+
+  def find(self, node):
+    """Returns the node of the field in the player element, or None."""
+    for selector in self.selectors:
+      node = selector.select_one(node)
+      if node is None:
+        return None
+    return node
+
+  def apply(self, text, player):
+    """Cleans up the text and sets its fields of the player."""
+    for step in self.clean:
+      text = step(text)
+    if self.split:
+      player.update(self.split(text, player))
+    else:
+      player[self.field] = text
+
+
+class CompiledRule(object):
+  """Extracts the players of a page with a compiled rule.
+
+  Attributes:
+    name: A string of the rule name.
+    layout: A string of the name of the processor_registry entry the rule is
+        for.
+  """
+
+  def __init__(self, rule):
+    self.name = rule.get('name')
+    if not self.name or 'rows' not in rule or 'layout' not in rule:
+      raise RuleError('Rules need a name, layout and rows: {}'.format(rule))
+    self.layout = rule['layout']
+    layouts = [e.name for e in processor_registry.REGISTRY.entries()]
+    if self.layout not in layouts:
+      raise RuleError('Unknown layout in rule {}: {}'.format(self.name,
+                                                             self.layout))
+    self._detect = None
+    if rule.get('detect'):
+      self._detect = _compile_selector(rule['detect'], self.name)
+    rows = rule['rows']
+    if isinstance(rows, str):
+      self._rows = _compile_selector(rows, self.name)
+      self._row_tag = self._row_class = None
+    else:
+      self._rows = None
+      self._row_tag = rows.get('tag')
+      self._row_class = re.compile(rows['class']) if 'class' in rows else None
+    self._duplicate_views = rule.get('duplicate_views')
+    self._fields = [_CompiledField(spec, self.name)
+                    for spec in rule.get('fields', [])]
+    self._name_field = next((f for f in self._fields if f.field == 'name'),
+                            None)
+    cells = rule.get('cells')
+    self._cells = self._cell_key = None
+    self._cell_fields = []
+    self._require_data = False
+    if cells:
+      self._cell_key = cells.get('key', 'class')
+      if self._cell_key not in ('class', 'label'):
+        raise RuleError('Unknown cell key in rule {}: {}'.format(
+            self.name, self._cell_key))
+      self._cells = _compile_selector(cells.get('select', 'td'), self.name)
+      self._cell_fields = [_CompiledField(spec, self.name)
+                           for spec in cells.get('fields', [])]
+      self._require_data = cells.get('require_data', False)
+    self._cell_matches = {}
+    self.logger = logging.getLogger('rule:' + self.name)
+
+  def detects(self, page):
+    """Returns True if the page has the layout of the rule."""
+    return self._detect is None or self._detect.select_one(page) is not None
+
+  def get_rows(self, page):
+    if self._rows is not None:
+      rows = self._rows.select(page)
+    else:
+      attrs = {'class': self._row_class} if self._row_class else {}
+      rows = page.find_all(self._row_tag, attrs=attrs)
+    if self._duplicate_views and self._name_field:
+      rows = self._skip_duplicate_views(rows)
+    return rows
+
+  def _skip_duplicate_views(self, rows):
+    groups = []
+    rows_by_group = {}
+    for row in rows:
+      group = row.find_parent(self._duplicate_views)
+      if id(group) not in rows_by_group:
+        groups.append(group)
+        rows_by_group[id(group)] = []
+      rows_by_group[id(group)].append(row)
+    kept = []
+    seen_names = set()
+    for group in groups:
+      group_rows = rows_by_group[id(group)]
+      names = set()
+      for row in group_rows:
+        player = {}
+        self._read_field(self._name_field, row, player)
+        if player.get('name'):
+          names.add(player['name'])
+      if names and names <= seen_names:
+        self.logger.info('Skipping a duplicate view of %d players', len(names))
+        continue
+      seen_names |= names
+      kept.extend(group_rows)
+    return kept
+
+  def _read_field(self, field, row, player):
+    while field:
+      node = field.find(row)
+      if node is not None:
+        field.apply(node.get_text(), player)
+        return
+      if field.warn_missing and not field.fallback:
+        diagnostics.MISSING_FIELDS.record(field.field, row)
+      field = field.fallback
+
+  def _read_cells(self, row, player):
+    """Reads the cells of a row. Returns False if it has no cell data."""
+    if self._cell_key == 'label':
+      cells = list(_HTML_TABLE.get_labels_and_data(row).items())
+      if self._require_data and not any(data for _, data in cells):
+        return False
+      keys_and_text = [([label], data) for label, data in cells]
+    else:
+      keys_and_text = [(cell.attrs['class'], cell.get_text())
+                       for cell in self._cells.select(row)]
+      if self._require_data and not any(text for _, text in keys_and_text):
+        return False
+    for keys, text in keys_and_text:
+      for field in self._match_cell_fields(keys):
+        if not (field.unless and player[field.unless]):
+          field.apply(text, player)
+          break
+      else:
+        self.logger.debug('Could not find a field for cell: %s', keys)
+    return True
+
+  def _match_cell_fields(self, keys):
+    """Returns the cell specs that match the keys of a cell, in order.
+
+    Most cells of a page share a few class names or labels, so the matches of
+    each are only searched for once.
+    """
+    keys = tuple(keys)
+    fields = self._cell_matches.get(keys)
+    if fields is None:
+      fields = [field for field in self._cell_fields
+                if any(m in key for key in keys for m in field.match)]
+      self._cell_matches[keys] = fields
+    return fields
+
+  def get_team(self, page):
+    """Returns a list of dicts of each player's data.
+
+    Arguments:
+      page: The BeautifulSoup document, or a part of it, to read.
+    """
+    team = []
+    for row in self.get_rows(page):
+      player = dict.fromkeys(ncaa_roster_parser.FIELDS, '')
+      if self._cells is not None and not self._read_cells(row, player):
+        continue
+      for field in self._fields:
+        self._read_field(field, row, player)
+      # Players without a name are skipped, like ProcessorBase does.
+      if player['name']:
+        team.append(player)
+    return team
+
+
+class RuleSet(object):
+  """The compiled rules to extract pages with, in the order they are tried.
+
+  The processor_registry entry of a page is picked first, and only the rules
+  for its layout are tried, so a rule never reads a page of another layout.
+  """
+
+  def __init__(self, rules=BUILTIN_RULES):
+    """
+    Arguments:
+      rules: A list of rule dicts.
+
+    Raises:
+      RuleError: If a rule can't be compiled.
+    """
+    self._rule_dicts = list(rules)
+    self.rules = [CompiledRule(rule) for rule in rules]
+
+  def __reduce__(self):
+    # Compiled rules can't be pickled, e.g. to send them to worker processes,
+    # so they are compiled again from the rule dicts.
+    return type(self), (self._rule_dicts,)
+
+  @classmethod
+  def load(cls, file_path):
+    """Returns the rules of a JSON file followed by the built-in rules.
+
+    The file holds a list of rule dicts, or a dict with a "rules" list.
+    """
+    with open(file_path, 'r', encoding='utf-8') as fo:
+      rules = json.load(fo)
+    if isinstance(rules, dict):
+      rules = rules['rules']
+    return cls(list(rules) + BUILTIN_RULES)
+
+  def get_rule(self, page, entry):
+    """Returns the first CompiledRule for the page, or None."""
+    for rule in self.rules:
+      if rule.layout == entry.name and rule.detects(page):
+        return rule
+    return None
+
+  def get_team(self, page, entry):
+    """Extracts the players of a page with the first rule for it.
+
+    Arguments:
+      page: The BeautifulSoup document of the page.
+      entry: The processor_registry.ProcessorEntry picked for the page.
+
+    Returns:
+      A tuple of (rule name, list of player dicts), or (None, []) if no rule
+      is for the page.
+    """
+    rule = self.get_rule(page, entry)
+    if rule is None:
+      return None, []
+    return rule.name, rule.get_team(page)
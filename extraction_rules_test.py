@@ -0,0 +1,137 @@
+"""Unit tests for extraction_rules.py
+
+The built-in rules must return the same teams as the processors in
+ncaa_roster_parser.py that they describe, so the tests compare the two.
+"""
+from bs4 import BeautifulSoup as bs
+import json
+import logging
+import os
+import pickle
+import tempfile
+import unittest
+
+from parameterized import parameterized
+
+import extraction_rules
+import ncaa_roster_parser
+from processor_registry import REGISTRY
+
+TESTDATA_URLS = {
+  'Cal_Poly': 'https://www.gopoly.com/sports/wsoc/2018-19/roster',
+  'Nebraska': 'http://www.huskers.com/SportSelect.dbml?SPID=11',
+  'Southeastern_Louisiana': 'https://lionsports.net/roster.aspx?path=wsoc',
+  'UTSA': 'https://goutsa.com/roster.aspx?path=wsoc',
+}
+TESTDATA_PROCESSORS = {
+  'Cal_Poly': (ncaa_roster_parser.HtmlTableProcessor, 'html_table'),
+  'Nebraska': (ncaa_roster_parser.SportSelectProcessor, 'sportselect'),
+  'Southeastern_Louisiana': (ncaa_roster_parser.SidearmProcessor, 'sidearm'),
+  'UTSA': (ncaa_roster_parser.SidearmProcessor, 'sidearm_dgrd'),
+}
+
+
+class ExtractionRulesTest(unittest.TestCase):
+
+  def setUp(self):
+    # The processors log warnings for the players they can't read.
+    logging.disable(logging.WARNING)
+
+  def tearDown(self):
+    logging.disable(logging.NOTSET)
+
+  @parameterized.expand(sorted(TESTDATA_URLS))
+  def test_same_team_as_processors(self, school):
+    with open('testdata/{}.webpage'.format(school), 'r') as fo:
+      page = bs(fo.read(), 'html.parser')
+    processor, rule_name = TESTDATA_PROCESSORS[school]
+    expected = processor(page).get_team()
+    entry = REGISTRY.select(page, TESTDATA_URLS[school])
+    actual_rule_name, actual = extraction_rules.RuleSet().get_team(page,
+                                                                   entry)
+    self.maxDiff = None
+    self.assertEqual(rule_name, actual_rule_name)
+    self.assertEqual(expected, actual)
+
+  def test_site_rule_from_file(self):
+    site_rule = {
+      'name': 'gostanford',
+      # The page has no signature of a layout, so the registry picks the
+      # catch-all table layout.
+      'layout': 'html_table',
+      'detect': 'div.athlete',
+      'rows': 'div.athlete',
+      'fields': [
+        {'field': 'name', 'select': 'h3'},
+        {'field': 'jersey', 'select': '.number',
+         'clean': ['spaces', ['remove_prefix', '#']]},
+        {'field': 'hometown', 'select': '.hometown',
+         'split': 'hometown_state', 'clean': []},
+      ],
+    }
+    page = bs('<div class="athlete"><h3> Sophia  Smith </h3>'
+              '<span class="number">#11</span>'
+              '<span class="hometown">Windsor, Colo.</span></div>'
+              '<div class="athlete"><span class="number">#0</span></div>',
+              'html.parser')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      file_path = os.path.join(tmp_dir, 'rules.json')
+      with open(file_path, 'w') as fw:
+        json.dump({'rules': [site_rule]}, fw)
+      rules = extraction_rules.RuleSet.load(file_path)
+    rule_name, team = rules.get_team(
+        page, REGISTRY.select(page, 'https://gostanford.com/wsoc/roster'))
+    self.assertEqual('gostanford', rule_name)
+    self.assertEqual([{
+      'name': 'Sophia Smith',
+      'jersey': '11',
+      'position': '',
+      'height': '',
+      'hometown': 'Windsor',
+      'home_state': 'Colo.',
+      'high_school': '',
+      'year': '',
+      'club': '',
+    }], team)
+    # Other pages keep the rule of their layout, whatever their url.
+    with open('testdata/UTSA.webpage', 'r') as fo:
+      page = bs(fo.read(), 'html.parser')
+    rule_name, _ = rules.get_team(
+        page, REGISTRY.select(page, 'https://gostanford.com/wsoc/roster'))
+    self.assertEqual('sidearm_dgrd', rule_name)
+    page = bs('<table><tr><th>Sophia Smith</th><td>11</td></tr></table>',
+              'html.parser')
+    rule_name, _ = rules.get_team(
+        page, REGISTRY.select(page, 'https://gostanford.com/wsoc/roster'))
+    self.assertEqual('html_table', rule_name)
+
+  @parameterized.expand([
+    ({'name': 'no_rows', 'layout': 'html_table'},),
+    ({'name': 'no_layout', 'rows': 'tr', 'fields': []},),
+    ({'name': 'bad_layout', 'layout': 'gostanford', 'rows': 'tr',
+      'fields': []},),
+    ({'name': 'bad_selector', 'layout': 'html_table', 'rows': 'div[',
+      'fields': []},),
+    ({'name': 'bad_field', 'layout': 'html_table', 'rows': 'tr',
+      'fields': [{'field': 'major', 'select': 'td'}]},),
+    ({'name': 'bad_cleanup', 'layout': 'html_table', 'rows': 'tr',
+      'fields': [{'field': 'name', 'select': 'td', 'clean': ['upper']}]},),
+    ({'name': 'bad_splitter', 'layout': 'html_table', 'rows': 'tr',
+      'fields': [{'field': 'name', 'select': 'td', 'split': 'commas'}]},),
+  ])
+  def test_bad_rules(self, rule):
+    with self.assertRaises(extraction_rules.RuleError):
+      extraction_rules.RuleSet([rule])
+
+  def test_pickle(self):
+    with open('testdata/UTSA.webpage', 'r') as fo:
+      page = bs(fo.read(), 'html.parser')
+    entry = REGISTRY.select(page, TESTDATA_URLS['UTSA'])
+    rules = extraction_rules.RuleSet()
+    unpickled = pickle.loads(pickle.dumps(rules))
+    self.assertEqual(rules.get_team(page, entry),
+                     unpickled.get_team(page, entry))
+
+
+if __name__ == '__main__':
+  unittest.main()
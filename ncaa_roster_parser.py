@@ -8,10 +8,17 @@ Classes:
   SportSelectProcessor: For processing roster webpages with the SportSelect.aspx
       path name.
   HtmlTableProcessor: Roster webpages with generic HTML tables.
+  EmbeddedJsonProcessor: For roster webpages that embed the roster as JSON,
+      e.g. JSON-LD or the page state of a JavaScript app.
 """
+import json
 import logging
 import re
-from bs4 import BeautifulSoup as bs
+from util import diagnostics
+
+# The fields of each player, in the order of the player dicts.
+FIELDS = ('name', 'jersey', 'position', 'height', 'hometown', 'home_state',
+          'high_school', 'year', 'club')
 
 
 class ProcessorBase(object):
@@ -142,6 +149,46 @@ class SidearmSportsDgrdProcessor(ProcessorBase):
       hometown, home_state = self.format_hometown_and_state(text)
     return hometown, home_state, high_school, club
 
+  def process_cell(self, class_attrs, text):
+    """Sets the player attribute that a table data cell holds.
+
+    Arguments:
+      class_attrs: A list of the class names of the <td> node.
+      text: A string of the text of the <td> node.
+    """
+    # class_attrs is a list of string values, so for each class name
+    # substring (e.g., the "full_name" substring is used to find the
+    # class name "roster_dgrd_full_name"), we need to test if it is in
+    # any of the class attribute values list.
+    if any('full_name' in a for a in class_attrs):
+      self.name = self.remove_extra_spaces(text)
+    elif any('_no' in a for a in class_attrs):
+      jersey = self.remove_extra_spaces(text)
+      if jersey.startswith('#'):
+        self.jersey = jersey[1:]
+      else:
+        self.jersey = jersey
+    elif any('position' in a for a in class_attrs):
+      self.position = self.remove_extra_spaces(text)
+    elif any('height' in a for a in class_attrs):
+      self.height = self.remove_extra_spaces(text)
+    elif any('academic_year' in a for a in class_attrs):
+      self.year = self.remove_extra_spaces(text)
+    elif any('hometown' in a for a in class_attrs):
+      self.hometown, self.home_state, self.high_school, self.club = \
+          self.format_slash_separated_data(text, self.high_school)
+    # Sometimes the "custom" class contains hometown/high school data
+    # but other times it contains things like acedemic major. If the
+    # hometown has not been found yet and the class contains the
+    # "custom" substring, then parse it for hometown data.
+    elif not self.hometown and any('custom' in a for a in class_attrs):
+      self.hometown, self.home_state, self.high_school, self.club = \
+          self.format_slash_separated_data(text, self.high_school)
+    elif any('highschool' in a for a in class_attrs):
+      self.high_school = self.remove_extra_spaces(text)
+    elif any('previous' in a for a in class_attrs):
+      self.club = self.remove_extra_spaces(text)
+
   def get_team(self):
     players = self.content.findAll('tr', attrs={'class':
                                                 re.compile('^default_dgrd')})
@@ -151,41 +198,7 @@ class SidearmSportsDgrdProcessor(ProcessorBase):
         if tds:
           for td in tds:
             if 'class' in td.attrs:
-              class_attrs = td.attrs['class']
-              # class_attrs is a list of string values, so for each class name
-              # substring (e.g., the "full_name" substring is used to find the
-              # class name "roster_dgrd_full_name"), we need to test if it is in
-              # any of the class attribute values list.
-              if any('full_name' in a for a in class_attrs):
-                self.name = self.remove_extra_spaces(td.get_text())
-              elif any('_no' in a for a in class_attrs):
-                jersey = self.remove_extra_spaces(td.get_text())
-                if jersey.startswith('#'):
-                  self.jersey = jersey[1:]
-                else:
-                  self.jersey = jersey
-              elif any('position' in a for a in class_attrs):
-                self.position = self.remove_extra_spaces(td.get_text())
-              elif any('height' in a for a in class_attrs):
-                self.height = self.remove_extra_spaces(td.get_text())
-              elif any('academic_year' in a for a in class_attrs):
-                self.year = self.remove_extra_spaces(td.get_text())
-              elif any('hometown' in a for a in class_attrs):
-                self.hometown, self.home_state, self.high_school, self.club = \
-                    self.format_slash_separated_data(td.get_text(),
-                                                     self.high_school)
-              # Sometimes the "custom" class contains hometown/high school data
-              # but other times it contains things like acedemic major. If the
-              # hometown has not been found yet and the class contains the
-              # "custom" substring, then parse it for hometown data.
-              elif not self.hometown and any('custom' in a for a in class_attrs):
-                self.hometown, self.home_state, self.high_school, self.club = \
-                    self.format_slash_separated_data(td.get_text(),
-                                                     self.high_school)
-              elif any('highschool' in a for a in class_attrs):
-                self.high_school = self.remove_extra_spaces(td.get_text())
-              elif any('previous' in a for a in class_attrs):
-                self.club = self.remove_extra_spaces(td.get_text())
+              self.process_cell(td.attrs['class'], td.get_text())
       self.add_player_to_team()
     return self.team
 
@@ -200,29 +213,28 @@ class SidearmSportsSidearmClassNameProcessor(ProcessorBase):
     class_selector = '[class="sidearm-roster-player-name"]'
     nodes = player.select(class_selector)
     if nodes:
-      node_text = nodes[0].get_text()
-      m = re.search('[a-zA-Z]', node_text)
-      if m:
-        name = node_text[m.start():]
-        return self.remove_extra_spaces(name)
-      else:
-        self.logger.warning('Could not find player name in this node text: %s',
-                            node_text)
+      return self.format_player_name(nodes[0].get_text())
     else:
-      self.logger.warning('Node not found for class selector: %s',
-                          class_selector)
-      self.logger.warning('Player HTML: %s', str(player))
+      diagnostics.MISSING_FIELDS.record('name', player)
     return ''  # After any logging scenario return empty string.
 
+  def format_player_name(self, node_text):
+    """Returns the name in the text of a player name node."""
+    # The name node also holds the jersey number, so skip to the first letter.
+    m = re.search('[a-zA-Z]', node_text)
+    if m:
+      return self.remove_extra_spaces(node_text[m.start():])
+    self.logger.warning('Could not find player name in this node text: %s',
+                        node_text)
+    return ''
+
   def get_player_jersey(self, player):
     class_selector = '[class="sidearm-roster-player-jersey-number"]'
     nodes = player.select(class_selector)
     if nodes:
       return self.remove_extra_spaces(nodes[0].get_text())
     else:
-      self.logger.warning('Node not found for class selector: %s',
-                          class_selector)
-      self.logger.warning('Player HTML: %s', str(player))
+      diagnostics.MISSING_FIELDS.record('jersey', player)
     return ''  # After any logging scenario return empty string.
 
   def get_player_position(self, player):
@@ -248,39 +260,35 @@ class SidearmSportsSidearmClassNameProcessor(ProcessorBase):
     if nodes:
       return self.remove_extra_spaces(nodes[0].get_text())
     else:
-      self.logger.warning('Node not found for class selector: %s',
-                          class_selector)
-      self.logger.warning('Player HTML: %s', str(player))
+      diagnostics.MISSING_FIELDS.record('height', player)
     return ''  # After any logging scenario return empty string.
 
   def get_player_hometown_and_home_state(self, player):
     class_selector = '[class="sidearm-roster-player-hometown"]'
     nodes = player.select(class_selector)
     if nodes:
-      node_text = nodes[0].get_text()
-      if ',' in node_text:
-        hometown, home_state = node_text.split(',', 1)
-        hometown = self.remove_extra_spaces(hometown)
-        home_state = self.remove_extra_spaces(home_state)
-      else:
-        hometown = self.remove_extra_spaces(node_text)
-        home_state = ''
-      return hometown, home_state
+      return self.format_hometown_and_home_state(nodes[0].get_text())
     else:
-      self.logger.warning('Node not found for class selector: %s',
-                          class_selector)
-      self.logger.warning('Player HTML: %s', str(player))
+      diagnostics.MISSING_FIELDS.record('hometown', player)
     return ('', '')  # After any logging scenario return empty string.
 
+  def format_hometown_and_home_state(self, node_text):
+    """Splits the text of a hometown node, e.g. "Hammond, La."."""
+    if ',' in node_text:
+      hometown, home_state = node_text.split(',', 1)
+      hometown = self.remove_extra_spaces(hometown)
+      home_state = self.remove_extra_spaces(home_state)
+    else:
+      hometown = self.remove_extra_spaces(node_text)
+      home_state = ''
+    return hometown, home_state
+
   def get_player_high_school(self, player):
     class_selector = '[class="sidearm-roster-player-highschool"]'
     nodes = player.select(class_selector)
     if nodes:
       return self.remove_extra_spaces(nodes[0].get_text())
     else:
-      self.logger.warning('Node not found for class selector: %s',
-                          class_selector)
-      self.logger.warning('Player HTML: %s', str(player))
       # Sometimes the high school name is listed in a node with the class name,
       # "previous-school". So if we didn't find a high school, try this
       # alternative.
@@ -289,9 +297,7 @@ class SidearmSportsSidearmClassNameProcessor(ProcessorBase):
       if nodes:
         return self.remove_extra_spaces(nodes[0].get_text())
       else:
-        self.logger.warning('Node not found for class selector: %s',
-                            class_selector)
-        self.logger.warning('Player HTML: %s', str(player))
+        diagnostics.MISSING_FIELDS.record('high_school', player)
     return ''  # After any logging scenario return empty string.
 
   def get_player_year(self, player):
@@ -300,25 +306,27 @@ class SidearmSportsSidearmClassNameProcessor(ProcessorBase):
     if nodes:
       return self.remove_extra_spaces(nodes[0].get_text())
     else:
-      self.logger.warning('Node not found for class selector: %s',
-                          class_selector)
-      self.logger.warning('Player HTML: %s', str(player))
+      diagnostics.MISSING_FIELDS.record('year', player)
     return ''  # After any logging scenario return empty string.
 
   def get_player_club(self, player):
     class_selector = '[class="sidearm-roster-player-custom1"]'
     nodes = player.select(class_selector)
     if nodes:
-      maybe_club = self.remove_extra_spaces(nodes[0].get_text())
-      # Sometimes the custom field just has some 2- or 3-letter codes in it,
-      # so those can be skipped
-      if len(maybe_club) < 4:
-        return ''
-      else:
-        return maybe_club
+      return self.format_club(nodes[0].get_text())
     else:
       return ''  # After any logging scenario return empty string.
 
+  def format_club(self, node_text):
+    """Returns the club in the text of a custom field node, or ''."""
+    maybe_club = self.remove_extra_spaces(node_text)
+    # Sometimes the custom field just has some 2- or 3-letter codes in it,
+    # so those can be skipped
+    if len(maybe_club) < 4:
+      return ''
+    else:
+      return maybe_club
+
   def get_team(self):
     players = self.content.findAll('li',
                                    attrs={'class': 'sidearm-roster-player'})
@@ -371,9 +379,13 @@ class SportSelectProcessor(ProcessorBase):
     return self.get_data_node_text(player.select('[class*="year"]')[0])
 
   def get_hometown_homestate_highschool_club(self, player):
-    hometown = home_state = high_school = club = ''
     hometown_text = self.get_data_node_text(
         player.select('[class*="hometown"]')[0])
+    return self.format_hometown_homestate_highschool_club(hometown_text)
+
+  def format_hometown_homestate_highschool_club(self, hometown_text):
+    """Splits the text of a hometown node, e.g. "McKinney, Texas (Boyd HS)"."""
+    hometown = home_state = high_school = club = ''
     # SportSelect sites put the high school name in parenthesis after the
     # hometown name and state. Example: McKinney, Texas (Boyd HS).
     # This regex looks for text plus special characters between parenthesis, as
@@ -434,6 +446,34 @@ class HtmlTableProcessor(ProcessorBase):
     # Each table row is a different roster player.
     return self.content.findAll('tr')
 
+  def get_players_without_duplicate_views(self):
+    """Returns the player rows, skipping tables that repeat earlier players.
+
+    Some pages render the roster twice, e.g. a table for large screens and a
+    hidden copy for mobile. A table whose player names were all in earlier
+    tables is such a copy, so its rows aren't read again. Only the names are
+    compared, which is cheap next to reading every cell of the rows.
+    """
+    tables = []
+    rows_by_table = {}
+    for row in self.get_players():
+      table = row.find_parent('table')
+      if id(table) not in rows_by_table:
+        tables.append(table)
+        rows_by_table[id(table)] = []
+      rows_by_table[id(table)].append(row)
+    players = []
+    seen_names = set()
+    for table in tables:
+      rows = rows_by_table[id(table)]
+      names = set(filter(None, (self.get_player_name(row) for row in rows)))
+      if names and names <= seen_names:
+        self.logger.info('Skipping a duplicate view of %d players', len(names))
+        continue
+      seen_names |= names
+      players.extend(rows)
+    return players
+
   def get_player_name(self, player):
     th = player.select('th')
     if th:
@@ -498,7 +538,7 @@ class HtmlTableProcessor(ProcessorBase):
     return labels_and_data
 
   def get_team(self):
-    players = self.get_players()
+    players = self.get_players_without_duplicate_views()
     for player in players:
       labels_and_data = self.get_labels_and_data(player)
       # If all of the values we got back are empty, then we can ignore. Only
@@ -526,3 +566,192 @@ class HtmlTableProcessor(ProcessorBase):
             self.logger.debug('Could not find specifier for label: %s', label)
         self.add_player_to_team()
     return self.team
+
+
+class EmbeddedJsonProcessor(ProcessorBase):
+  """Reads the roster from JSON embedded in the raw page HTML.
+
+  Newer athletics sites send the roster as data next to the rendered HTML,
+  either as schema.org JSON-LD (a SportsTeam with an "athlete" list), in a
+  <script type="application/json"> element, or assigned to a global in a
+  script, e.g. "window.__INITIAL_STATE__ = {...};". The JSON is found with
+  regular expressions on the raw HTML, so no document tree is built.
+
+  The longest list of objects that look like players is taken as the roster,
+  if it has at least MIN_PLAYERS of them. Their fields are matched by key
+  name, see FIELD_KEYS.
+  """
+
+  SCRIPT_RE = re.compile(r'<script\b([^>]*)>(.*?)</script\s*>', re.I | re.S)
+  JSON_TYPE_RE = re.compile(r'\btype\s*=\s*["\']?application/(?:ld\+)?json',
+                            re.I)
+  STATE_RE = re.compile(r'\b__[A-Za-z_]+__\s*=\s*(?=[{\[])')
+  # Normalized (lowercase alphanumeric) keys of each player field, in order of
+  # preference.
+  FIELD_KEYS = {
+    'name': ('name', 'fullname', 'displayname', 'playername'),
+    'first_name': ('firstname', 'givenname'),
+    'last_name': ('lastname', 'familyname'),
+    'jersey': ('jersey', 'jerseynumber', 'uniform', 'uniformnumber', 'number'),
+    'position': ('positionshort', 'positionabbreviation', 'position',
+                 'positionlong', 'rolename'),
+    'height': ('height', 'heightdisplay'),
+    'height_feet': ('heightfeet',),
+    'height_inches': ('heightinches',),
+    'year': ('academicyearshort', 'academicyear', 'classyear', 'year',
+             'class', 'eligibility'),
+    'hometown': ('hometown', 'homelocation', 'birthplace'),
+    'home_state': ('homestate', 'state'),
+    'high_school': ('highschool', 'previousschool', 'lastschool', 'alumniof'),
+    'club': ('club', 'clubteam'),
+  }
+  # Fields only players have. Player objects have at least one of them.
+  PLAYER_FIELDS = ('jersey', 'position', 'year', 'height', 'height_feet',
+                   'hometown', 'high_school')
+  # The fewest players of a roster list. Shorter lists are e.g. the authors or
+  # the featured players of a story.
+  MIN_PLAYERS = 5
+  # Keys whose object values are the field itself rather than nested fields.
+  VALUE_OBJECT_KEYS = frozenset(('height', 'hometown', 'homelocation',
+                                 'birthplace', 'alumniof'))
+
+  def __init__(self, content):
+    """
+    Arguments:
+      content: The str, bytes or mmap of the raw page HTML, not a
+          BeautifulSoup document.
+    """
+    super().__init__(content, 'EmbeddedJsonProcessor')
+
+  def get_scripts(self):
+    """Yields a tuple of (attributes, text) of each <script> of the page."""
+    content = self.content
+    if not isinstance(content, str):
+      # Only the scripts are decoded. Pages are saved as UTF-8.
+      for m in re.finditer(self.SCRIPT_RE.pattern.encode('ascii'), content,
+                           re.I | re.S):
+        yield (m.group(1).decode('utf-8', 'replace'),
+               m.group(2).decode('utf-8', 'replace'))
+    else:
+      for m in self.SCRIPT_RE.finditer(content):
+        yield m.group(1), m.group(2)
+
+  def get_json_documents(self):
+    """Yields each JSON value embedded in the page's scripts."""
+    decoder = json.JSONDecoder()
+    for attrs, text in self.get_scripts():
+      if self.JSON_TYPE_RE.search(attrs):
+        try:
+          yield json.loads(text)
+        except ValueError:
+          self.logger.debug('Could not decode JSON script: %.80s', text)
+        continue
+      for m in self.STATE_RE.finditer(text):
+        try:
+          yield decoder.raw_decode(text, m.end())[0]
+        except ValueError:
+          # Plain JavaScript objects aren't always valid JSON.
+          self.logger.debug('Could not decode page state: %.80s',
+                            text[m.start():])
+
+  def normalize_keys(self, obj):
+    """Returns a dict of the object's fields by lowercase alphanumeric key.
+
+    Keys of nested objects, e.g. {"player": {"firstName": ...}}, are included
+    unless the object has a field with the same key.
+    """
+    fields = {}
+    nested = []
+    for key, value in obj.items():
+      key = re.sub('[^a-z0-9]', '', key.lower())
+      if isinstance(value, dict) and key not in self.VALUE_OBJECT_KEYS:
+        nested.append(value)
+      else:
+        fields[key] = value
+    for value in nested:
+      for key, nested_value in self.normalize_keys(value).items():
+        fields.setdefault(key, nested_value)
+    return fields
+
+  def looks_like_player(self, obj):
+    """Returns True if the object has a name and a roster field.
+
+    A schema.org Person isn't enough on its own, e.g. the author of a news
+    story is one too.
+    """
+    if not isinstance(obj, dict):
+      return False
+    fields = self.normalize_keys(obj)
+    has_name = any(k in fields for k in self.FIELD_KEYS['name'] +
+                   self.FIELD_KEYS['last_name'])
+    has_player_field = any(k in fields for field in self.PLAYER_FIELDS
+                           for k in self.FIELD_KEYS[field])
+    return has_name and has_player_field
+
+  def find_players(self, value):
+    """Returns the longest list of player objects in a JSON value."""
+    best = []
+    stack = [value]
+    while stack:
+      value = stack.pop()
+      if isinstance(value, dict):
+        stack.extend(value.values())
+      elif isinstance(value, list):
+        players = [v for v in value if self.looks_like_player(v)]
+        # Most of the items of a roster list are players, which tells it
+        # apart from e.g. a list of staff or news stories.
+        if (len(players) > len(best) and len(players) >= self.MIN_PLAYERS and
+            2 * len(players) >= len(value)):
+          best = players
+        stack.extend(value)
+    return best
+
+  def get_field(self, fields, field):
+    """Returns the text of the first present key of a player field."""
+    for key in self.FIELD_KEYS[field]:
+      value = fields.get(key)
+      if isinstance(value, dict):
+        # schema.org values, e.g. {"@type": "Place", "name": "Dublin"}.
+        value = value.get('name', value.get('value'))
+      if isinstance(value, list):
+        value = value[0] if value else None
+      if value is not None and not isinstance(value, (dict, list)):
+        text = self.remove_extra_spaces(str(value))
+        if text:
+          return text
+    return ''
+
+  def set_player_fields(self, player):
+    fields = self.normalize_keys(player)
+    self.name = self.get_field(fields, 'name')
+    if not self.name:
+      self.name = self.remove_extra_spaces(' '.join([
+          self.get_field(fields, 'first_name'),
+          self.get_field(fields, 'last_name')]))
+    self.jersey = self.get_field(fields, 'jersey')
+    self.position = self.get_field(fields, 'position')
+    self.height = self.get_field(fields, 'height')
+    feet = self.get_field(fields, 'height_feet')
+    if not self.height and feet:
+      self.height = '{}\'{}"'.format(feet,
+                                     self.get_field(fields, 'height_inches') or 0)
+    self.year = self.get_field(fields, 'year')
+    self.hometown = self.get_field(fields, 'hometown')
+    self.home_state = self.get_field(fields, 'home_state')
+    if ',' in self.hometown and not self.home_state:
+      hometown, home_state = self.hometown.split(',', 1)
+      self.hometown = self.remove_extra_spaces(hometown)
+      self.home_state = self.remove_extra_spaces(home_state)
+    self.high_school = self.get_field(fields, 'high_school')
+    self.club = self.get_field(fields, 'club')
+
+  def get_team(self):
+    players = []
+    for document in self.get_json_documents():
+      found = self.find_players(document)
+      if len(found) > len(players):
+        players = found
+    for player in players:
+      self.set_player_fields(player)
+      self.add_player_to_team()
+    return self.team
@@ -226,11 +226,22 @@ class NcaaRosterParserTest(unittest.TestCase):
     test_player = bs(test_html, 'html.parser')
     ssscnp = ncaa_roster_parser.SidearmSportsSidearmClassNameProcessor('')
     ssscnp.logger = mock.MagicMock()
-    actual_high_school = ssscnp.get_player_high_school(test_player)
-    self.assertTrue(ssscnp.logger.warning.called)
-    self.assertEqual(2, ssscnp.logger.warning.call_count)
+    with mock.patch('ncaa_roster_parser.diagnostics') as mock_diagnostics:
+      actual_high_school = ssscnp.get_player_high_school(test_player)
+    self.assertFalse(ssscnp.logger.warning.called)
+    self.assertFalse(mock_diagnostics.MISSING_FIELDS.record.called)
     self.assertEqual('Thunder Ridge HS', actual_high_school)
 
+  def test_sidearmsportssidearmclassnameprocessor_get_player_high_school_missing(self):
+    test_player = bs('<div class="sidearm-roster-player-other"></div>',
+                     'html.parser')
+    ssscnp = ncaa_roster_parser.SidearmSportsSidearmClassNameProcessor('')
+    with mock.patch('ncaa_roster_parser.diagnostics') as mock_diagnostics:
+      actual_high_school = ssscnp.get_player_high_school(test_player)
+    mock_diagnostics.MISSING_FIELDS.record.assert_called_once_with(
+        'high_school', test_player)
+    self.assertEqual('', actual_high_school)
+
   def test_sidearmsportssidearmclassnameprocessor_get_player_year(self):
     test_html = """
         <div class="sidearm-roster-player-other flex-item-1 columns hide-on-medium-down">
@@ -547,6 +558,20 @@ class NcaaRosterParserTest(unittest.TestCase):
     }
     self.assertDictEqual(expected, actual)
 
+  def test_htmltableprocessor_skips_duplicate_view(self):
+    row = ('<tr><th>{}</th><td><span class="label">No.:</span>{}</td>'
+           '<td><span class="label">Pos.:</span>GK</td></tr>')
+    test_html = ('<table>{}{}</table>'
+                 '<div class="mobile"><table>{}</table></div>'
+                 '<table>{}</table>').format(
+                     row.format('Mia Hamm', 9), row.format('Kristine Lilly', 13),
+                     row.format('Kristine Lilly', 13),
+                     row.format('Brandi Chastain', 6))
+    htp = ncaa_roster_parser.HtmlTableProcessor(bs(test_html, 'html.parser'))
+    actual_team = htp.get_team()
+    self.assertEqual(['Mia Hamm', 'Kristine Lilly', 'Brandi Chastain'],
+                     [p['name'] for p in actual_team])
+
   def test_htmltableprocessor_integration_test(self):
     test_content = None
     with open('testdata/Cal_Poly.webpage', 'r') as fo:
@@ -560,5 +585,101 @@ class NcaaRosterParserTest(unittest.TestCase):
     self.assertEqual(expected_columns, list(actual_team[0].keys()))
 
 
+  ##############################################################################
+  # EmbeddedJsonProcessor tests.
+  ##############################################################################
+  def test_embeddedjsonprocessor_json_ld(self):
+    test_html = """
+      <html><head><script type="application/ld+json">
+      {"@context": "https://schema.org", "@type": "SportsTeam",
+       "name": "Women's Soccer",
+       "coach": [{"@type": "Person", "name": "Coach A"}],
+       "athlete": [
+         {"@type": "Person", "name": "Nadine  Maher", "height": "5'7\\"",
+          "homeLocation": {"@type": "Place", "name": "Dublin, Ireland"},
+          "alumniOf": {"@type": "EducationalOrganization",
+                       "name": "Oakland University"}},
+         {"@type": "Person", "name": "Jada Ellis", "height": "5'5\\""},
+         {"@type": "Person", "name": "Kat Zaber", "height": "5'9\\""},
+         {"@type": "Person", "name": "Mia Hamm", "height": "5'5\\""},
+         {"@type": "Person", "name": "Kristine Lilly", "height": "5'4\\""}]}
+      </script></head><body></body></html>"""
+    ejp = ncaa_roster_parser.EmbeddedJsonProcessor(test_html)
+    actual_team = ejp.get_team()
+    self.assertEqual(5, len(actual_team))
+    self.assertEqual({
+      'name': 'Nadine Maher',
+      'jersey': '',
+      'position': '',
+      'height': '5\'7"',
+      'hometown': 'Dublin',
+      'home_state': 'Ireland',
+      'high_school': 'Oakland University',
+      'year': '',
+      'club': '',
+    }, actual_team[0])
+
+  def test_embeddedjsonprocessor_page_state(self):
+    test_html = b"""
+      <script>var x = 1;</script>
+      <script>
+        window.__INITIAL_STATE__ = {"roster": {"players": [
+          {"jerseyNumber": 1, "positionShort": "GK", "positionLong": "Goalie",
+           "heightFeet": 5, "heightInches": 7, "academicYearShort": "So.",
+           "hometown": "Hammond", "state": "La.",
+           "player": {"firstName": "Nadine", "lastName": "Maher"}},
+          {"jerseyNumber": 6, "positionShort": "D",
+           "player": {"firstName": "Jada", "lastName": "Ellis"}},
+          {"jerseyNumber": 7, "player": {"firstName": "Kat", "lastName": "Zaber"}},
+          {"jerseyNumber": 9, "player": {"firstName": "Mia", "lastName": "Hamm"}},
+          {"jerseyNumber": 13,
+           "player": {"firstName": "Kristine", "lastName": "Lilly"}}],
+          "stories": [{"title": "Season preview", "name": "Preview"}]}};
+      </script>"""
+    ejp = ncaa_roster_parser.EmbeddedJsonProcessor(test_html)
+    actual_team = ejp.get_team()
+    self.assertEqual(['Nadine Maher', 'Jada Ellis', 'Kat Zaber', 'Mia Hamm',
+                      'Kristine Lilly'], [p['name'] for p in actual_team])
+    self.assertEqual({
+      'name': 'Nadine Maher',
+      'jersey': '1',
+      'position': 'GK',
+      'height': '5\'7"',
+      'hometown': 'Hammond',
+      'home_state': 'La.',
+      'high_school': '',
+      'year': 'So.',
+      'club': '',
+    }, actual_team[0])
+
+  def test_embeddedjsonprocessor_no_roster(self):
+    test_html = """
+      <script type="application/json">{"menu": [{"name": "Tickets"}]}</script>
+      <script type="application/json">{not json</script>
+      <script>window.__DATA__ = {unquoted: 1};</script>"""
+    ejp = ncaa_roster_parser.EmbeddedJsonProcessor(test_html)
+    self.assertEqual([], ejp.get_team())
+
+  def test_embeddedjsonprocessor_people_without_roster_fields(self):
+    # Authors, and lists too short to be a roster, aren't players.
+    test_html = """
+      <script type="application/ld+json">
+      {"@type": "NewsArticle",
+       "author": [{"@type": "Person", "name": "Sports Info Staff"}]}
+      </script>
+      <script type="application/json">
+      {"featured": [{"name": "Mia Hamm", "jersey": "9"},
+                    {"name": "Kristine Lilly", "jersey": "13"}]}
+      </script>"""
+    ejp = ncaa_roster_parser.EmbeddedJsonProcessor(test_html)
+    self.assertEqual([], ejp.get_team())
+
+  def test_embeddedjsonprocessor_testdata_has_no_embedded_roster(self):
+    for school in ('Cal_Poly', 'Nebraska', 'Southeastern_Louisiana', 'UTSA'):
+      with open('testdata/{}.webpage'.format(school), 'r') as fo:
+        test_webpage = fo.read()
+      ejp = ncaa_roster_parser.EmbeddedJsonProcessor(test_webpage)
+      self.assertEqual([], ejp.get_team())
+
 if __name__ == '__main__':
   unittest.main()
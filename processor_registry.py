@@ -0,0 +1,162 @@
+"""Picks the ncaa_roster_parser processor of a roster page by its content.
+
+Each processor is registered with a signature of the page layout it reads: a
+regular expression that is searched for in the raw page, and a CSS selector
+that is matched against a parsed page. Both are cheap compared to running a
+processor, so the processor is picked before the page is parsed, instead of
+guessing from the url and parsing the page again when the guess was wrong.
+
+When the signatures of several processors match, the one with the highest
+priority is used, so the catch-all HtmlTableProcessor, whose signature is any
+<table>, is only used for pages of no other layout. Pages that match no
+signature at all are read with the processor whose url hints match the url.
+
+The processor picked for a host is cached, so the next page of the host only
+has its signature checked, and those of the processors of a higher priority.
+"""
+import re
+import threading
+from urllib.parse import urlparse
+
+import soupsieve
+
+from util import roster_markers
+
+
+class ProcessorEntry(object):
+  """A registered processor and the signature of the pages it reads.
+
+  Attributes:
+    name: A string naming the page layout.
+    processor: A string of the ncaa_roster_parser class name of the processor.
+    priority: An int. The matching entry with the highest priority is picked.
+    pattern: A regex string searched for in the raw page.
+    selector: A CSS selector string matched against a parsed page.
+    url_hints: A list of url substrings of pages of the layout. Only used for
+        pages that match no signature.
+    layouts: A sequence of roster_markers.RosterLayout instances of the roster
+        section of the layout.
+    streamable: True if sidearm_stream_parser can read pages of the layout.
+  """
+
+  def __init__(self, name, processor, priority, pattern, selector,
+               url_hints=(), layouts=(), streamable=False):
+    self.name = name
+    self.processor = processor
+    self.priority = priority
+    self.pattern = pattern
+    self.selector = selector
+    self.url_hints = list(url_hints)
+    self.layouts = tuple(layouts)
+    self.streamable = streamable
+    self._patterns = {str: re.compile(pattern, re.I),
+                      bytes: re.compile(pattern.encode('ascii'), re.I)}
+    self._selector = soupsieve.compile(selector)
+
+  def matches(self, content):
+    """Checks the signature of the entry against a page.
+
+    Arguments:
+      content: The str, bytes or mmap of the raw page, or a BeautifulSoup
+          instance of the parsed page.
+
+    Returns:
+      True if the page has the signature.
+    """
+    if hasattr(content, 'select_one'):
+      return self._selector.select_one(content) is not None
+    regex = self._patterns[str if isinstance(content, str) else bytes]
+    return regex.search(content) is not None
+
+  def matches_url(self, url):
+    return any(hint in url for hint in self.url_hints)
+
+
+class ProcessorRegistry(object):
+  """The registered processors, and the processor picked for each host.
+
+  Attributes:
+    default: The catch-all ProcessorEntry, used when no entry matches a page.
+  """
+
+  def __init__(self, default):
+    self.default = default
+    self._entries = []
+    self._host_entries = {}
+    self._lock = threading.Lock()
+
+  def register(self, entry):
+    """Adds a ProcessorEntry. Entries of the same priority are tried in the
+    order they were registered.
+    """
+    with self._lock:
+      self._entries.append(entry)
+      self._entries.sort(key=lambda e: -e.priority)
+      self._host_entries.clear()
+
+  def entries(self):
+    """Returns a list of the entries, highest priority first."""
+    return list(self._entries)
+
+  def select(self, content, url=''):
+    """Picks the entry of a page.
+
+    Arguments:
+      content: The str, bytes or mmap of the raw page, or a BeautifulSoup
+          instance of the parsed page.
+      url: An optional string of the page url.
+
+    Returns:
+      The ProcessorEntry of the processor to read the page with.
+    """
+    host = urlparse(url).netloc.lower() if url else ''
+    cached = self._host_entries.get(host) if host else None
+    if content:
+      entries = self._entries
+      if cached is not None:
+        # A page of the host can have the signature of an entry of a higher
+        # priority too, e.g. a dgrd table after a sidearm list, so those
+        # entries are still checked first.
+        entries = ([e for e in entries if e.priority > cached.priority] +
+                   [cached] + [e for e in entries
+                               if e.priority <= cached.priority and
+                               e is not cached])
+      for entry in entries:
+        if entry.matches(content):
+          # The catch-all signature matches pages of other layouts too, so
+          # it isn't cached.
+          if host and entry is not self.default:
+            self._host_entries[host] = entry
+          return entry
+    # No signature was found, e.g. the roster is loaded by a script.
+    for entry in self._entries:
+      if entry.matches_url(url):
+        return entry
+    return self.default
+
+  def clear_cache(self):
+    self._host_entries.clear()
+
+
+HTML_TABLE = ProcessorEntry('html_table', 'HtmlTableProcessor', 0,
+                            r'<table\b', 'table')
+
+BUILTIN_ENTRIES = (
+  ProcessorEntry('sidearm_dgrd', 'SidearmSportsDgrdProcessor', 30,
+                 r'<table\b[^>]*\bclass=["\']?[^"\'>]*default_dgrd',
+                 'table[class*="default_dgrd"]',
+                 layouts=[roster_markers.LAYOUTS[1]], streamable=True),
+  ProcessorEntry('sidearm', 'SidearmSportsSidearmClassNameProcessor', 20,
+                 r'<li\b[^>]*\bsidearm-roster-player(?![\w-])',
+                 'li.sidearm-roster-player',
+                 url_hints=['roster.aspx', 'womens-soccer/roster'],
+                 layouts=[roster_markers.LAYOUTS[0]], streamable=True),
+  ProcessorEntry('sportselect', 'SportSelectProcessor', 20,
+                 roster_markers.SPORTSELECT_LAYOUT.start_pattern,
+                 '#roster-grid-layout', url_hints=['SportSelect'],
+                 layouts=[roster_markers.SPORTSELECT_LAYOUT]),
+)
+
+REGISTRY = ProcessorRegistry(HTML_TABLE)
+for _entry in BUILTIN_ENTRIES + (HTML_TABLE,):
+  REGISTRY.register(_entry)
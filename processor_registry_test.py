@@ -0,0 +1,85 @@
+"""Unit tests for processor_registry.py"""
+import unittest
+
+from bs4 import BeautifulSoup as bs
+from parameterized import parameterized
+
+import processor_registry
+
+
+def _read_testdata(school):
+  with open('testdata/{}.webpage'.format(school), 'rb') as fo:
+    return fo.read()
+
+
+class ProcessorRegistryTest(unittest.TestCase):
+
+  def setUp(self):
+    self.registry = processor_registry.ProcessorRegistry(
+        processor_registry.HTML_TABLE)
+    for entry in processor_registry.BUILTIN_ENTRIES:
+      self.registry.register(entry)
+    self.registry.register(processor_registry.HTML_TABLE)
+
+  @parameterized.expand([
+    ('Cal_Poly', 'HtmlTableProcessor'),
+    ('Nebraska', 'SportSelectProcessor'),
+    ('Southeastern_Louisiana', 'SidearmSportsSidearmClassNameProcessor'),
+    ('UTSA', 'SidearmSportsDgrdProcessor'),
+  ])
+  def test_select_by_signature(self, school, expected):
+    content = _read_testdata(school)
+    # The url doesn't decide the processor when the page has a signature.
+    url = 'http://example.com/sports/womens-soccer/roster'
+    self.assertEqual(expected, self.registry.select(content, url).processor)
+    self.assertEqual(expected, self.registry.select(
+        content.decode('utf-8', 'replace')).processor)
+    self.assertEqual(expected, self.registry.select(
+        bs(content, 'html.parser')).processor)
+
+  def test_select_by_url_hint(self):
+    self.assertEqual('sidearm', self.registry.select(
+        '<div id="app"></div>', 'http://page1/roster.aspx').name)
+    self.assertEqual('sportselect', self.registry.select(
+        '', 'http://page3/SportSelect.aspx').name)
+    self.assertEqual('html_table', self.registry.select(
+        '<div id="app"></div>', 'http://page2/2018-19/roster').name)
+
+  def test_select_priority(self):
+    page = ('<ul><li class="sidearm-roster-player"></li></ul>'
+            '<table class="default_dgrd"></table>')
+    self.assertEqual('sidearm_dgrd', self.registry.select(page).name)
+
+  def test_select_caches_host(self):
+    dgrd_page = '<table class="default_dgrd roster_dgrd"></table>'
+    sidearm_page = '<li class="sidearm-roster-player">'
+    url = 'http://gocards.com/roster.aspx?path=wsoc'
+    self.assertEqual('sidearm_dgrd', self.registry.select(dgrd_page, url).name)
+    entries = self.registry.entries()
+    entries[0].matches = lambda content: True
+    entries[1].matches = lambda content: self.fail('Host cache not used')
+    try:
+      self.assertEqual('sidearm_dgrd',
+                       self.registry.select(sidearm_page, url).name)
+    finally:
+      del entries[0].matches
+      del entries[1].matches
+    # A page that doesn't have the signature of the cached entry is checked
+    # against every entry.
+    self.assertEqual('sidearm', self.registry.select(sidearm_page, url).name)
+    self.assertEqual('sidearm', self.registry.select(
+        sidearm_page, 'http://GoCards.com/other').name)
+
+
+  def test_select_cached_host_higher_priority(self):
+    sidearm_page = '<li class="sidearm-roster-player">'
+    both_page = ('<ul><li class="sidearm-roster-player"></li></ul>'
+                 '<table class="default_dgrd"></table>')
+    url = 'http://gocards.com/roster.aspx?path=wsoc'
+    self.assertEqual('sidearm', self.registry.select(sidearm_page, url).name)
+    # The host is cached as sidearm, but the dgrd table still wins.
+    self.assertEqual('sidearm_dgrd', self.registry.select(both_page, url).name)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,88 @@
+"""Runs the stages that build the D1 women's soccer roster CSV.
+
+Subcommands:
+  collect: Collects the roster url of each school (collect_roster_urls.py).
+  download: Downloads the roster webpages (download_roster_webpages.py).
+  convert: Converts the roster webpages into a CSV file
+      (convert_roster_webpages_to_csv.py).
+  run: Runs the stages in order, in this process.
+
+The arguments after a stage subcommand are the arguments of its script, e.g.
+  python rosters.py convert --schools "Stanford,UCLA" --help
+Each stage's module, and the libraries it uses, are only imported when the
+stage runs, so e.g. convert never imports requests or googlesearch, and
+--help of this script imports none of them.
+"""
+import argparse
+import collections
+import importlib
+
+_PROG = 'rosters.py'
+
+# The module and description of each stage, in the order they run.
+STAGES = collections.OrderedDict([
+  ('collect', ('collect_roster_urls',
+               'Collect the roster url of each school.')),
+  ('download', ('download_roster_webpages',
+                'Download the roster webpages.')),
+  ('convert', ('convert_roster_webpages_to_csv',
+               'Convert the roster webpages into a CSV file.')),
+])
+
+
+def run_stage(stage, argv):
+  """Imports the module of a stage and runs it like its script.
+
+  Arguments:
+    stage: A string of the stage name, a key of STAGES.
+    argv: A list of strings of the arguments of the stage's script.
+  """
+  module = importlib.import_module(STAGES[stage][0])
+  module.flags = module._set_arguments(
+      argv, prog='{} {}'.format(_PROG, stage))
+  module.LOGGER = module._set_logger()
+  module.main()
+
+
+def main():
+  if flags.command == 'run':
+    stages = [s.strip() for s in flags.stages.split(',')]
+    for stage in stages:
+      if stage not in STAGES:
+        raise SystemExit('Unknown stage: {}'.format(stage))
+    argv = ['--schools', flags.schools] if flags.schools else []
+    for stage in stages:
+      run_stage(stage, argv)
+  else:
+    run_stage(flags.command, flags.stage_args)
+
+
+def _set_arguments(argv=None):
+  parser = argparse.ArgumentParser(prog=_PROG)
+  subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+  subparsers.required = True
+  for stage, (module_name, description) in STAGES.items():
+    # The stage's own parser reads the arguments, including --help.
+    subparsers.add_parser(stage, add_help=False, help=description,
+                          description='{} See {}.py.'.format(description,
+                                                             module_name))
+  run_parser = subparsers.add_parser(
+      'run', help='Run the stages in order.',
+      description='Run the stages in order, with the default arguments of '
+        'each stage.')
+  run_parser.add_argument('--stages', default=','.join(STAGES),
+                          help='A comma-separated list of the stages to run.')
+  run_parser.add_argument('--schools',
+                          metavar='"SCHOOL 1,SCHOOL 2,SCHOOL 3"',
+                          help='A comma-separated list of schools to run '
+                            'the stages for.')
+  flags, stage_args = parser.parse_known_args(argv)
+  if flags.command == 'run' and stage_args:
+    parser.error('unrecognized arguments: {}'.format(' '.join(stage_args)))
+  flags.stage_args = stage_args
+  return flags
+
+
+if __name__ == '__main__':
+  flags = _set_arguments()
+  main()
@@ -0,0 +1,82 @@
+"""Unit tests for rosters.py"""
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from parameterized import parameterized
+
+import rosters
+
+
+class RostersTest(unittest.TestCase):
+
+  def test_set_arguments_forwards_stage_arguments(self):
+    flags = rosters._set_arguments(['convert', '-o', 'out.csv', '--schools',
+                                    'Stanford, UCLA', '--help'])
+    self.assertEqual('convert', flags.command)
+    self.assertEqual(['-o', 'out.csv', '--schools', 'Stanford, UCLA',
+                      '--help'], flags.stage_args)
+
+  def test_set_arguments_run(self):
+    flags = rosters._set_arguments(['run', '--schools', 'Stanford'])
+    self.assertEqual('collect,download,convert', flags.stages)
+    self.assertEqual('Stanford', flags.schools)
+    with mock.patch('sys.stderr'), self.assertRaises(SystemExit):
+      rosters._set_arguments(['run', '--mmap'])
+
+  @mock.patch('rosters.importlib')
+  def test_run_stage(self, mock_importlib):
+    module = mock_importlib.import_module.return_value
+    rosters.run_stage('download', ['--workers', '4'])
+    mock_importlib.import_module.assert_called_once_with(
+        'download_roster_webpages')
+    module._set_arguments.assert_called_once_with(
+        ['--workers', '4'], prog='rosters.py download')
+    self.assertEqual(module._set_arguments.return_value, module.flags)
+    self.assertEqual(module._set_logger.return_value, module.LOGGER)
+    module.main.assert_called_once_with()
+
+  @mock.patch('rosters.run_stage')
+  def test_main_run(self, mock_run_stage):
+    rosters.flags = rosters._set_arguments(['run', '--stages',
+                                            'download,convert', '--schools',
+                                            'Stanford'])
+    rosters.main()
+    self.assertEqual([mock.call('download', ['--schools', 'Stanford']),
+                      mock.call('convert', ['--schools', 'Stanford'])],
+                     mock_run_stage.mock_calls)
+    rosters.flags = rosters._set_arguments(['run', '--stages', 'parse'])
+    with self.assertRaises(SystemExit):
+      rosters.main()
+
+  def test_help_imports_no_stage(self):
+    code = ('import sys, rosters\n'
+            'try:\n'
+            '  rosters._set_arguments(["--help"])\n'
+            'except SystemExit:\n'
+            '  pass\n'
+            'print(",".join(sorted(m for m in sys.modules if m in ('
+            '"bs4", "requests", "googlesearch", "wikitables", "brotli", '
+            '"convert_roster_webpages_to_csv"))))\n')
+    output = subprocess.run([sys.executable, '-c', code], check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True)
+    self.assertEqual('', output.stdout.splitlines()[-1])
+
+  @parameterized.expand([(stage,) for stage in rosters.STAGES])
+  def test_stage_help_imports_no_library(self, stage):
+    code = ('import sys, rosters\n'
+            'try:\n'
+            '  rosters.run_stage({!r}, ["--help"])\n'
+            'except SystemExit:\n'
+            '  pass\n'
+            'print(",".join(sorted(m for m in sys.modules if m in ('
+            '"bs4", "requests", "user_agent", "httpx", "brotli", "zstandard", '
+            '"googlesearch", "wikitables"))))\n').format(stage)
+    output = subprocess.run([sys.executable, '-c', code], check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True)
+    self.assertEqual('', output.stdout.splitlines()[-1])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,244 @@
+"""Extracts SidearmSports roster players without building a document tree.
+
+Building a BeautifulSoup tree of a whole roster page costs far more than
+reading the few fields of each player. SidearmStreamParser runs the same
+html.parser tokenizer that BeautifulSoup uses, but only keeps the text of the
+elements that hold player fields as their tags open and close:
+  dgrd: The <td> cells of each <tr class="default_dgrd..."> row, as read by
+      ncaa_roster_parser.SidearmSportsDgrdProcessor.
+  sidearm: The field nodes of each <li class="sidearm-roster-player">, as read
+      by ncaa_roster_parser.SidearmSportsSidearmClassNameProcessor.
+
+Elements are opened and closed the way BeautifulSoup's html.parser tree
+builder does it, and the fields are formatted by the processors themselves,
+so the teams are the same as ncaa_roster_parser.SidearmProcessor returns.
+"""
+import html.parser
+
+from bs4 import UnicodeDammit
+from util import diagnostics
+
+import ncaa_roster_parser
+
+# Elements that never have content, which BeautifulSoup closes right away.
+_VOID_ELEMENTS = frozenset([
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed',
+    'frame', 'hr', 'image', 'img', 'input', 'isindex', 'keygen', 'link',
+    'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer', 'track', 'wbr'])
+# Text inside these elements isn't part of BeautifulSoup's get_text().
+_HIDDEN_TEXT_ELEMENTS = frozenset(['script', 'style', 'template'])
+# The class attribute values of the player field nodes of the sidearm layout.
+_FIELD_CLASSES = {
+  'sidearm-roster-player-name': 'name',
+  'sidearm-roster-player-jersey-number': 'jersey',
+  'sidearm-roster-player-height': 'height',
+  'sidearm-roster-player-hometown': 'hometown',
+  'sidearm-roster-player-highschool': 'highschool',
+  'sidearm-roster-player-previous-school': 'previous_school',
+  'sidearm-roster-player-academic-year': 'year',
+  'sidearm-roster-player-custom1': 'custom1',
+}
+_POSITION_SHORT_CLASSES = ('sidearm-roster-player-position-long-short',
+                           'hide-on-medium')
+
+
+class _Text(object):
+  """Collects the text of one element."""
+  __slots__ = ('parts',)
+
+  def __init__(self):
+    self.parts = []
+
+  def get_text(self):
+    return ''.join(self.parts)
+
+
+class _Player(object):
+  """The field nodes found in one sidearm-roster-player list item."""
+
+  def __init__(self):
+    self.fields = {}
+    self.position_div_seen = False
+    self.position_div_open = False
+    self.position_span = None
+
+  def close_position_div(self):
+    self.position_div_open = False
+
+
+class SidearmStreamParser(html.parser.HTMLParser):
+  """Collects the player fields of both Sidearm layouts in a single pass.
+
+  Attributes:
+    has_dgrd_table: True if the page has a <table class="...default_dgrd...">.
+    rows: A list of the dgrd rows. Each row is a list of (class names or None,
+        _Text) tuples, one for each <td> in the row.
+    players: A list of _Player instances of the sidearm list items.
+  """
+
+  def __init__(self):
+    super().__init__(convert_charrefs=True)
+    self.has_dgrd_table = False
+    self.rows = []
+    self.players = []
+    # Each open element is a tuple of (tag, list of functions to call when
+    # the element is closed).
+    self._stack = []
+    self._texts = []
+    self._open_rows = []
+    self._open_players = []
+    self._hidden = 0
+
+  def _capture_text(self, closers):
+    text = _Text()
+    self._texts.append(text)
+    closers.append(lambda: self._texts.remove(text))
+    return text
+
+  def _unhide(self):
+    self._hidden -= 1
+
+  def _match_player_fields(self, tag, classes, closers):
+    """Checks if the element is a field node of the open players."""
+    field = None
+    if classes is not None:
+      field = _FIELD_CLASSES.get(' '.join(classes))
+    is_position_short = (tag == 'span' and classes is not None and
+                         all(c in classes for c in _POSITION_SHORT_CLASSES))
+    is_position_div = (tag == 'div' and classes is not None and
+                       'sidearm-roster-player-position' in classes)
+    text = None
+    for player in self._open_players:
+      # Only the first matching node of each field is read.
+      if field and field not in player.fields:
+        text = text or self._capture_text(closers)
+        player.fields[field] = text
+      if is_position_short and 'position_short' not in player.fields:
+        text = text or self._capture_text(closers)
+        player.fields['position_short'] = text
+      if (tag == 'span' and player.position_div_open and
+          player.position_span is None):
+        text = text or self._capture_text(closers)
+        player.position_span = text
+      if is_position_div and not player.position_div_seen:
+        player.position_div_seen = player.position_div_open = True
+        closers.append(player.close_position_div)
+
+  def handle_starttag(self, tag, attrs):
+    # Like BeautifulSoup, the last of any duplicate attributes is kept.
+    attrs = dict(attrs)
+    classes = None
+    if 'class' in attrs:
+      classes = (attrs['class'] or '').split()
+    closers = []
+    if tag in _HIDDEN_TEXT_ELEMENTS:
+      self._hidden += 1
+      closers.append(self._unhide)
+    if self._open_players:
+      self._match_player_fields(tag, classes, closers)
+    if tag == 'td' and self._open_rows:
+      cell = (classes, self._capture_text(closers))
+      for row in self._open_rows:
+        row.append(cell)
+    elif classes is not None:
+      if tag == 'table' and any('default_dgrd' in c for c in classes):
+        self.has_dgrd_table = True
+      elif tag == 'tr' and any(c.startswith('default_dgrd') for c in classes):
+        row = []
+        self.rows.append(row)
+        self._open_rows.append(row)
+        closers.append(lambda: self._open_rows.remove(row))
+      elif tag == 'li' and 'sidearm-roster-player' in classes:
+        player = _Player()
+        self.players.append(player)
+        self._open_players.append(player)
+        closers.append(lambda: self._open_players.remove(player))
+    self._stack.append((tag, closers))
+    if tag in _VOID_ELEMENTS:
+      self._pop_to(len(self._stack) - 1)
+
+  def handle_endtag(self, tag):
+    # Close the most recently opened element of the tag, and every element
+    # opened after it. End tags of elements that aren't open are ignored.
+    for i in range(len(self._stack) - 1, -1, -1):
+      if self._stack[i][0] == tag:
+        self._pop_to(i)
+        return
+
+  def handle_data(self, data):
+    if not self._hidden:
+      for text in self._texts:
+        text.parts.append(data)
+
+  def close(self):
+    super().close()
+    self._pop_to(0)
+
+  def _pop_to(self, index):
+    while len(self._stack) > index:
+      _, closers = self._stack.pop()
+      for closer in closers:
+        closer()
+
+  def get_team(self):
+    """Returns a list of dicts of each player's data."""
+    if self.has_dgrd_table:
+      return self._get_dgrd_team()
+    return self._get_sidearm_team()
+
+  def _get_dgrd_team(self):
+    processor = ncaa_roster_parser.SidearmSportsDgrdProcessor(None)
+    for row in self.rows:
+      for classes, text in row:
+        if classes is not None:
+          processor.process_cell(classes, text.get_text())
+      processor.add_player_to_team()
+    return processor.team
+
+  def _get_sidearm_team(self):
+    processor = ncaa_roster_parser.SidearmSportsSidearmClassNameProcessor(None)
+    for player in self.players:
+      fields = {name: text.get_text() for name, text in player.fields.items()}
+      for field in ('name', 'jersey', 'height', 'hometown', 'year'):
+        if field not in fields:
+          diagnostics.MISSING_FIELDS.record(field)
+      if 'highschool' not in fields and 'previous_school' not in fields:
+        diagnostics.MISSING_FIELDS.record('high_school')
+      if 'name' in fields:
+        processor.name = processor.format_player_name(fields['name'])
+      processor.jersey = processor.remove_extra_spaces(fields.get('jersey', ''))
+      if 'position_short' in fields:
+        processor.position = processor.remove_extra_spaces(
+            fields['position_short'])
+      elif player.position_span is not None:
+        processor.position = processor.remove_extra_spaces(
+            player.position_span.get_text())
+      processor.height = processor.remove_extra_spaces(fields.get('height', ''))
+      if 'hometown' in fields:
+        processor.hometown, processor.home_state = \
+            processor.format_hometown_and_home_state(fields['hometown'])
+      high_school = fields.get('highschool', fields.get('previous_school', ''))
+      processor.high_school = processor.remove_extra_spaces(high_school)
+      processor.year = processor.remove_extra_spaces(fields.get('year', ''))
+      processor.club = processor.format_club(fields.get('custom1', ''))
+      processor.add_player_to_team()
+    return processor.team
+
+
+def get_team(content):
+  """Extracts the players of a SidearmSports roster page.
+
+  Arguments:
+    content: The str or bytes of the page HTML.
+
+  Returns:
+    A list of dicts of each player's data, the same as
+    ncaa_roster_parser.SidearmProcessor returns for the page.
+  """
+  if not isinstance(content, str):
+    # Decode bytes the same way BeautifulSoup does.
+    content = UnicodeDammit(bytes(content)).unicode_markup
+  parser = SidearmStreamParser()
+  parser.feed(content)
+  parser.close()
+  return parser.get_team()
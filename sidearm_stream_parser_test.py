@@ -0,0 +1,103 @@
+"""Unit tests for sidearm_stream_parser.py
+
+The stream parser must return the same teams as the BeautifulSoup processors
+in ncaa_roster_parser.py, so each test compares the two.
+"""
+from bs4 import BeautifulSoup as bs
+import logging
+import os
+import unittest
+
+from parameterized import parameterized
+
+import ncaa_roster_parser
+import sidearm_stream_parser
+
+TESTDATA_DIR = 'testdata'
+
+
+def _processor_team(content):
+  return ncaa_roster_parser.SidearmProcessor(
+      bs(content, 'html.parser')).get_team()
+
+
+class SidearmStreamParserTest(unittest.TestCase):
+
+  def setUp(self):
+    # The processors log warnings for the players they can't read.
+    logging.disable(logging.WARNING)
+
+  def tearDown(self):
+    logging.disable(logging.NOTSET)
+
+  def assertSameTeam(self, content):
+    expected = _processor_team(content)
+    actual = sidearm_stream_parser.get_team(content)
+    self.maxDiff = None
+    self.assertEqual(expected, actual)
+    return actual
+
+  @parameterized.expand(sorted(os.listdir(TESTDATA_DIR)))
+  def test_same_team_as_processors(self, file_name):
+    with open(os.path.join(TESTDATA_DIR, file_name), 'r') as fo:
+      content = fo.read()
+    self.assertSameTeam(content)
+
+  def test_same_team_from_bytes(self):
+    with open(os.path.join(TESTDATA_DIR, 'UTSA.webpage'), 'rb') as fo:
+      content = fo.read()
+    actual = sidearm_stream_parser.get_team(content)
+    self.assertEqual(31, len(actual))
+    self.assertEqual(_processor_team(content), actual)
+
+  def test_dgrd_rows(self):
+    actual = self.assertSameTeam("""
+        <table class="default_dgrd roster_dgrd">
+          <tr class="default_dgrd_header"><th>Name</th></tr>
+          <tr class="default_dgrd_item">
+            <td class="roster_dgrd_no">#7</td>
+            <td class="roster_dgrd_full_name"><a>Jane <b>Doe</b></a></td>
+            <td class="roster_dgrd_rp_position_short">F</td>
+            <td class="roster_dgrd_hometown">Austin, Texas / Westlake HS</td>
+            <td>ignored</td>
+          </tr>
+          <tr class="default_dgrd_alt">
+            <td class="roster_dgrd_full_name">Amy &amp; <script>x</script>Sue
+            <td class="roster_dgrd_no">8
+          </tr>
+        </table>""")
+    self.assertEqual(['Jane Doe', 'Amy & Sue 8'], [p['name'] for p in actual])
+
+  def test_sidearm_list_items(self):
+    actual = self.assertSameTeam("""
+        <ul class="sidearm-roster-players">
+          <li class="sidearm-roster-player">
+            <div class="sidearm-roster-player-name">
+              <span class="sidearm-roster-player-jersey-number">11</span>
+              <a href="#">Mia Hamm</a>
+            </div>
+            <div class="sidearm-roster-player-position">
+              <span class="text-bold">F<br>Forward</span>
+            </div>
+            <span class="sidearm-roster-player-height">5-5</span>
+            <span class="sidearm-roster-player-hometown">Selma, Ala.</span>
+            <span class="sidearm-roster-player-previous-school">Lake Braddock
+            </span>
+            <span class="sidearm-roster-player-custom1">ECNL Club</span>
+          </li>
+          <li class="sidearm-roster-player other">
+            <div class="sidearm-roster-player-name"><h3>Kristine Lilly</h3>
+            </div>
+            <span class="sidearm-roster-player-position-long-short
+                         hide-on-medium">M</span>
+            <span class="sidearm-roster-player-academic-year">Sr.</span>
+            <span class="sidearm-roster-player-custom1">AB</span>
+          </li>
+          <li class="sidearm-roster-player"><template>Hidden</template></li>
+        </ul>""")
+    self.assertEqual(['Mia Hamm', 'Kristine Lilly'],
+                     [p['name'] for p in actual])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,157 @@
+"""Content-addressed, compressed storage of downloaded roster pages.
+
+Each page is stored once, gzipped, under the sha256 hash of its content:
+  <root>/objects/<first 2 hex digits>/<remaining hex digits>.gz
+Pages that don't change between runs, or that several schools share, cost no
+more space. Each run writes a manifest that maps every school to the hash of
+its page:
+  <root>/manifests/<run id>.json
+so the pages of any past run can be read back, and an unchanged page is found
+by comparing hashes instead of parsing it.
+"""
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+_MANIFESTS_DIR = 'manifests'
+_OBJECTS_DIR = 'objects'
+
+
+def content_digest(content):
+  """Returns the sha256 hex digest of str or bytes content."""
+  if isinstance(content, str):
+    content = content.encode('utf-8')
+  return hashlib.sha256(content).hexdigest()
+
+
+def _write_tmp(file_path, data):
+  """Writes the data to a temporary file next to the file path, and returns
+  the temporary file path.
+  """
+  os.makedirs(os.path.dirname(file_path), exist_ok=True)
+  tmp_path = '{}.{}.{}.tmp'.format(file_path, os.getpid(),
+                                   threading.get_ident())
+  with open(tmp_path, 'wb') as fw:
+    fw.write(data)
+  return tmp_path
+
+
+def _write_atomic(file_path, data):
+  os.replace(_write_tmp(file_path, data), file_path)
+
+
+def _write_new(file_path, data):
+  """Writes a file that must not exist yet, like open() with mode 'x'.
+
+  The file is linked into place once it's written, so it's never read half
+  written, and the link fails if the file exists.
+
+  Raises:
+    FileExistsError: If the file exists.
+  """
+  tmp_path = _write_tmp(file_path, data)
+  try:
+    os.link(tmp_path, file_path)
+  finally:
+    os.remove(tmp_path)
+
+
+class BlobStore(object):
+  """A directory of gzipped blobs named by their hash, and run manifests.
+
+  Attributes:
+    root_dir: A string of the store directory.
+  """
+
+  def __init__(self, root_dir):
+    self.root_dir = root_dir
+
+  def path(self, digest):
+    """Returns the file path of the blob with the digest."""
+    return os.path.join(self.root_dir, _OBJECTS_DIR, digest[:2],
+                        digest[2:] + '.gz')
+
+  def contains(self, digest):
+    return os.path.exists(self.path(digest))
+
+  def put(self, content):
+    """Stores the content, unless it is already stored.
+
+    Arguments:
+      content: The str or bytes to store. Strings are stored as UTF-8.
+
+    Returns:
+      A string of the hex digest of the content.
+    """
+    if isinstance(content, str):
+      content = content.encode('utf-8')
+    digest = content_digest(content)
+    if not self.contains(digest):
+      _write_atomic(self.path(digest), gzip.compress(content))
+    return digest
+
+  def get(self, digest):
+    """Returns the bytes of the blob with the digest.
+
+    Raises:
+      KeyError: If no blob has the digest.
+    """
+    try:
+      with gzip.open(self.path(digest), 'rb') as fo:
+        return fo.read()
+    except FileNotFoundError:
+      raise KeyError(digest)
+
+  def run_ids(self):
+    """Returns a sorted list of the ids of the runs with a manifest."""
+    dir_path = os.path.join(self.root_dir, _MANIFESTS_DIR)
+    if not os.path.isdir(dir_path):
+      return []
+    return sorted(f[:-len('.json')] for f in os.listdir(dir_path)
+                  if f.endswith('.json'))
+
+  def read_manifest(self, run_id=None):
+    """Returns the {school: digest} dict of a run.
+
+    Arguments:
+      run_id: A string of the run id, or None for the latest run.
+
+    Returns:
+      The dict of the run's pages, or an empty dict if there are no runs.
+    """
+    if run_id is None:
+      run_ids = self.run_ids()
+      if not run_ids:
+        return {}
+      run_id = run_ids[-1]
+    file_path = os.path.join(self.root_dir, _MANIFESTS_DIR, run_id + '.json')
+    with open(file_path, 'r', encoding='utf-8') as fo:
+      return json.load(fo)['pages']
+
+  def write_manifest(self, pages, run_id=None):
+    """Saves the manifest of a run.
+
+    Arguments:
+      pages: A dict of {school: digest}.
+      run_id: An optional string of the run id. Defaults to the current UTC
+          time to the microsecond, so the ids sort in the order of the runs.
+
+    Returns:
+      A string of the run id.
+
+    Raises:
+      FileExistsError: If a manifest of the run id exists. Manifests are
+          never overwritten.
+    """
+    if run_id is None:
+      run_id = datetime.datetime.now(datetime.timezone.utc).strftime(
+          '%Y%m%dT%H%M%S.%fZ')
+    manifest = {'run': run_id, 'created': time.time(), 'pages': pages}
+    file_path = os.path.join(self.root_dir, _MANIFESTS_DIR, run_id + '.json')
+    _write_new(file_path, json.dumps(manifest, indent=2,
+                                     sort_keys=True).encode('utf-8'))
+    return run_id
@@ -0,0 +1,64 @@
+"""Unit tests for blob_store.py"""
+import os
+import tempfile
+import unittest
+
+import blob_store
+
+
+class BlobStoreTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.store = blob_store.BlobStore(self.tmp_dir.name)
+
+  def tearDown(self):
+    self.tmp_dir.cleanup()
+
+  def test_put_and_get(self):
+    digest = self.store.put('<html>Roster</html>')
+    self.assertEqual(blob_store.content_digest(b'<html>Roster</html>'), digest)
+    self.assertEqual(b'<html>Roster</html>', self.store.get(digest))
+    self.assertTrue(self.store.path(digest).endswith('.gz'))
+
+  def test_put_dedupes(self):
+    digest = self.store.put(b'<html>Roster</html>')
+    mtime = os.path.getmtime(self.store.path(digest))
+    os.utime(self.store.path(digest), (mtime - 100, mtime - 100))
+    self.assertEqual(digest, self.store.put('<html>Roster</html>'))
+    self.assertEqual(mtime - 100, os.path.getmtime(self.store.path(digest)))
+
+  def test_get_missing(self):
+    with self.assertRaises(KeyError):
+      self.store.get(blob_store.content_digest(b'missing'))
+
+  def test_manifests(self):
+    self.assertEqual({}, self.store.read_manifest())
+    self.store.write_manifest({'Stanford': 'aa'}, '20191121T000000Z')
+    self.store.write_manifest({'Stanford': 'bb'}, '20191122T000000Z')
+    self.assertEqual(['20191121T000000Z', '20191122T000000Z'],
+                     self.store.run_ids())
+    self.assertEqual({'Stanford': 'bb'}, self.store.read_manifest())
+    self.assertEqual({'Stanford': 'aa'},
+                     self.store.read_manifest('20191121T000000Z'))
+
+  def test_manifests_are_not_overwritten(self):
+    self.store.write_manifest({'Stanford': 'aa'}, '20191121T000000Z')
+    with self.assertRaises(FileExistsError):
+      self.store.write_manifest({'Stanford': 'bb'}, '20191121T000000Z')
+    self.assertEqual({'Stanford': 'aa'},
+                     self.store.read_manifest('20191121T000000Z'))
+    # No temporary file is left behind.
+    self.assertEqual(['20191121T000000Z.json'],
+                     os.listdir(os.path.join(self.tmp_dir.name, 'manifests')))
+
+  def test_run_ids_of_the_same_second(self):
+    first = self.store.write_manifest({'Stanford': 'aa'})
+    second = self.store.write_manifest({'Stanford': 'bb'})
+    self.assertNotEqual(first, second)
+    self.assertEqual([first, second], self.store.run_ids())
+    self.assertEqual({'Stanford': 'bb'}, self.store.read_manifest())
+
+
+if __name__ == '__main__':
+  unittest.main()
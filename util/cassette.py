@@ -0,0 +1,336 @@
+"""Records roster downloads into a WARC-style archive and replays them offline.
+
+RecordingTransport sends requests as usual and writes every exchange into a
+gzipped archive of WARC/1.0 records. Each exchange is written as a "request"
+record followed by a "response" record that holds the raw HTTP status line,
+headers and body. A request that failed is written with a "metadata" record
+that names the error instead. The time until the response headers arrived and
+the time spent reading the body are kept in the X-Latency-Seconds and
+X-Body-Seconds fields.
+
+ReplayTransport serves the responses from an archive without touching the
+network, optionally waiting the recorded times, so the rest of the pipeline
+can be run and timed against a real night's traffic.
+
+Bodies are stored as received, before content decoding, and only as far as
+the downloader read them (see WARC-Truncated).
+"""
+import collections
+import gzip
+import threading
+import time
+from urllib.parse import urlparse
+import uuid
+
+import requests
+
+WARC_VERSION = b'WARC/1.0'
+_CRLF = b'\r\n'
+
+
+def _warc_date(timestamp):
+  return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+
+def _record_id():
+  return '<urn:uuid:{}>'.format(uuid.uuid4())
+
+
+def _encode_headers(headers):
+  return b''.join('{}: {}\r\n'.format(k, v).encode('utf-8')
+                  for k, v in headers)
+
+
+def write_record(fw, warc_type, url, block, timestamp, extra_headers=()):
+  """Writes one WARC record as its own gzip member.
+
+  Arguments:
+    fw: A binary file object to write into.
+    warc_type: A string of the WARC-Type, e.g. "response".
+    url: A string of the WARC-Target-URI.
+    block: The bytes of the record content.
+    timestamp: A timestamp of the WARC-Date.
+    extra_headers: A sequence of (name, value) tuples of more WARC headers.
+
+  Returns:
+    A string of the WARC-Record-ID of the record.
+  """
+  record_id = _record_id()
+  headers = [('WARC-Type', warc_type), ('WARC-Target-URI', url),
+             ('WARC-Date', _warc_date(timestamp)),
+             ('WARC-Record-ID', record_id)]
+  headers.extend(extra_headers)
+  headers.append(('Content-Length', len(block)))
+  record = (WARC_VERSION + _CRLF + _encode_headers(headers) + _CRLF + block +
+            _CRLF + _CRLF)
+  fw.write(gzip.compress(record))
+  return record_id
+
+
+def read_records(file_path):
+  """Yields each record of a WARC archive.
+
+  Arguments:
+    file_path: A string of the .warc.gz file.
+
+  Yields:
+    A tuple of (dict of WARC headers, bytes of the record content).
+  """
+  with gzip.open(file_path, 'rb') as fo:
+    while True:
+      line = fo.readline()
+      if not line:
+        return
+      if line.strip() != WARC_VERSION:
+        raise ValueError('Not a WARC record in {}: {!r}'.format(file_path,
+                                                                 line))
+      headers = {}
+      for line in iter(fo.readline, _CRLF):
+        if not line:
+          raise ValueError('Truncated WARC record in {}'.format(file_path))
+        name, _, value = line.decode('utf-8').partition(':')
+        headers[name.strip()] = value.strip()
+      block = fo.read(int(headers['Content-Length']))
+      fo.read(len(_CRLF + _CRLF))
+      yield headers, block
+
+
+def _http_block(resp, body):
+  version = getattr(resp, 'http_version', 'HTTP/1.1')
+  status_line = '{} {} {}\r\n'.format(version, resp.status_code,
+                                      resp.reason or '').encode('utf-8')
+  return status_line + _encode_headers(resp.headers.items()) + _CRLF + body
+
+
+def _parse_http_block(block):
+  head, _, body = block.partition(_CRLF + _CRLF)
+  lines = head.decode('utf-8').split('\r\n')
+  _, status_code, reason = (lines[0].split(' ', 2) + [''])[:3]
+  headers = requests.structures.CaseInsensitiveDict()
+  for line in lines[1:]:
+    name, _, value = line.partition(':')
+    headers[name.strip()] = value.strip()
+  return int(status_code), reason, headers, body
+
+
+class RecordingTransport(object):
+  """Sends requests like requests.get() and records them into an archive.
+
+  Attributes:
+    file_path: A string of the .warc.gz file. An existing file is replaced.
+  """
+
+  def __init__(self, file_path, transport=None):
+    """Opens the archive.
+
+    Arguments:
+      file_path: A string of the .warc.gz file to write.
+      transport: An optional object with a get() method like requests.get()
+          to send the requests with, e.g. an http2_transport.HttpxTransport.
+          The requests module is used by default.
+    """
+    self.file_path = file_path
+    self._transport = transport
+    self._get = transport.get if transport else requests.get
+    self._fw = open(file_path, 'wb')
+    self._lock = threading.Lock()
+
+  @property
+  def versions(self):
+    return getattr(self._transport, 'versions', {})
+
+  def get(self, url, headers=None, **kwargs):
+    """Sends a GET request, like requests.get()."""
+    start = time.time()
+    try:
+      resp = self._get(url=url, headers=headers, **kwargs)
+    except (requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout) as e:
+      self._write_error(url, headers, start, e)
+      raise
+    return _RecordingResponse(self, url, headers, resp, start,
+                              time.time() - start)
+
+  def _write_error(self, url, headers, start, error):
+    with self._lock:
+      self._write_request(url, headers, start)
+      write_record(self._fw, 'metadata', url,
+                   str(error).encode('utf-8'), start,
+                   [('Content-Type', 'text/plain'),
+                    ('X-Error', type(error).__name__),
+                    ('X-Latency-Seconds', round(time.time() - start, 3))])
+
+  def _write_request(self, url, headers, start):
+    parts = urlparse(url)
+    path = parts.path or '/'
+    if parts.query:
+      path += '?' + parts.query
+    request_headers = [('Host', parts.netloc)] + list((headers or {}).items())
+    block = ('GET {} HTTP/1.1\r\n'.format(path).encode('utf-8') +
+             _encode_headers(request_headers) + _CRLF)
+    write_record(self._fw, 'request', url, block, start,
+                 [('Content-Type', 'application/http; msgtype=request')])
+
+  def write_exchange(self, url, headers, resp, body, start, latency,
+                     body_seconds, complete):
+    """Writes the request and response records of one exchange."""
+    extra_headers = [('Content-Type', 'application/http; msgtype=response'),
+                     ('X-Latency-Seconds', round(latency, 3)),
+                     ('X-Body-Seconds', round(body_seconds, 3))]
+    if not complete:
+      extra_headers.append(('WARC-Truncated', 'unspecified'))
+    with self._lock:
+      self._write_request(url, headers, start)
+      write_record(self._fw, 'response', url, _http_block(resp, body), start,
+                   extra_headers)
+
+  def close(self):
+    with self._lock:
+      self._fw.close()
+    if self._transport and hasattr(self._transport, 'close'):
+      self._transport.close()
+
+
+class _RecordingRaw(object):
+  """Keeps a copy of each chunk of the body as it is read."""
+
+  def __init__(self, recording):
+    self._recording = recording
+
+  def stream(self, chunk_size, decode_content=False):
+    recording = self._recording
+    for chunk in recording.resp.raw.stream(chunk_size,
+                                           decode_content=decode_content):
+      recording.body.extend(chunk)
+      yield chunk
+    recording.complete = True
+
+  def getheaders(self):
+    return self._recording.resp.raw.getheaders()
+
+
+class _RecordingResponse(object):
+  """Wraps a response and records it when it is closed."""
+
+  def __init__(self, recorder, url, headers, resp, start, latency):
+    self.resp = resp
+    self.body = bytearray()
+    self.complete = False
+    self.status_code = resp.status_code
+    self.reason = resp.reason
+    self.headers = resp.headers
+    self.raw = _RecordingRaw(self)
+    self._recorder = recorder
+    self._request = (url, headers, start, latency)
+    self._closed = False
+
+  def close(self):
+    if self._closed:
+      return
+    self._closed = True
+    self.resp.close()
+    url, headers, start, latency = self._request
+    body_seconds = time.time() - start - latency
+    self._recorder.write_exchange(url, headers, self.resp, bytes(self.body),
+                                  start, latency, body_seconds,
+                                  self.complete)
+
+
+class ReplayTransport(object):
+  """Serves responses from an archive written by RecordingTransport.
+
+  When a url was requested more than once, e.g. because of retries, the
+  recorded exchanges are served in order and the last one is repeated.
+  """
+
+  def __init__(self, file_path, replay_latency=False):
+    """Loads the archive.
+
+    Arguments:
+      file_path: A string of the .warc.gz file to read.
+      replay_latency: If True, wait the recorded time before each response
+          and while its body is read.
+    """
+    self.replay_latency = replay_latency
+    self.versions = collections.Counter()
+    self._exchanges = collections.defaultdict(collections.deque)
+    self._lock = threading.Lock()
+    for headers, block in read_records(file_path):
+      if headers['WARC-Type'] not in ('response', 'metadata'):
+        continue
+      self._exchanges[headers['WARC-Target-URI']].append((headers, block))
+
+  def urls(self):
+    """Returns a list of the urls in the archive."""
+    return list(self._exchanges)
+
+  def get(self, url, headers=None, **kwargs):
+    """Returns the recorded response of the url, like requests.get().
+
+    Raises:
+      requests.exceptions.ConnectionError: If the url isn't in the archive or
+          its request failed with a connection error.
+      requests.exceptions.Timeout: If its request timed out.
+    """
+    del headers, kwargs
+    with self._lock:
+      exchanges = self._exchanges.get(url)
+      if not exchanges:
+        raise requests.exceptions.ConnectionError(
+            'No recorded response for {}'.format(url))
+      warc_headers, block = (exchanges.popleft() if len(exchanges) > 1
+                             else exchanges[0])
+    if self.replay_latency:
+      time.sleep(float(warc_headers.get('X-Latency-Seconds', 0)))
+    if warc_headers['WARC-Type'] == 'metadata':
+      error = getattr(requests.exceptions, warc_headers.get('X-Error', ''),
+                      requests.exceptions.ConnectionError)
+      if not (isinstance(error, type) and
+              issubclass(error, requests.exceptions.RequestException)):
+        error = requests.exceptions.ConnectionError
+      raise error(block.decode('utf-8'))
+    body_seconds = 0.0
+    if self.replay_latency:
+      body_seconds = float(warc_headers.get('X-Body-Seconds', 0))
+    resp = ReplayResponse(*_parse_http_block(block), body_seconds=body_seconds)
+    with self._lock:
+      self.versions['replay'] += 1
+    return resp
+
+  def close(self):
+    pass
+
+
+class _ReplayRaw(object):
+
+  def __init__(self, response):
+    self._response = response
+
+  def stream(self, chunk_size, decode_content=False):
+    del decode_content  # Bodies are recorded before content decoding.
+    body = self._response.body
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    for chunk in chunks:
+      if self._response.body_seconds:
+        time.sleep(self._response.body_seconds / len(chunks))
+      yield chunk
+
+  def getheaders(self):
+    return list(self._response.headers.items())
+
+
+class ReplayResponse(object):
+  """A recorded response with the parts of the requests.Response API the
+  downloader uses.
+  """
+
+  def __init__(self, status_code, reason, headers, body, body_seconds=0.0):
+    self.status_code = status_code
+    self.reason = reason
+    self.headers = headers
+    self.body = body
+    self.body_seconds = body_seconds
+    self.raw = _ReplayRaw(self)
+
+  def close(self):
+    pass
@@ -0,0 +1,108 @@
+"""Unit tests for cassette.py"""
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+import cassette
+
+TEST_URL = 'https://gostanford.com/roster.aspx?path=wsoc'
+
+
+def _fake_response(status_code, chunks, headers=None):
+  resp = mock.MagicMock()
+  resp.http_version = 'HTTP/1.1'
+  resp.status_code = status_code
+  resp.reason = 'OK' if status_code == 200 else 'Service Unavailable'
+  resp.headers = headers or {}
+  resp.raw.stream.return_value = chunks
+  return resp
+
+
+class CassetteTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.file_path = os.path.join(self.tmp_dir.name, 'night.warc.gz')
+
+  def tearDown(self):
+    self.tmp_dir.cleanup()
+
+  def _record(self, responses):
+    transport = mock.MagicMock()
+    transport.get.side_effect = responses
+    recorder = cassette.RecordingTransport(self.file_path, transport)
+    for _ in responses:
+      try:
+        resp = recorder.get(url=TEST_URL, headers={'User-Agent': 'Mozilla'},
+                            stream=True, timeout=(1, 2))
+      except requests.exceptions.RequestException:
+        continue
+      list(resp.raw.stream(4, decode_content=False))
+      resp.close()
+    recorder.close()
+    transport.get.assert_called_with(url=TEST_URL,
+                                     headers={'User-Agent': 'Mozilla'},
+                                     stream=True, timeout=(1, 2))
+
+  def test_record_writes_warc_records(self):
+    body = gzip.compress(b'<html>Roster</html>')
+    self._record([_fake_response(200, [body[:5], body[5:]],
+                                 {'Content-Encoding': 'gzip'})])
+    records = list(cassette.read_records(self.file_path))
+    self.assertEqual(['request', 'response'],
+                     [headers['WARC-Type'] for headers, _ in records])
+    request_headers, request_block = records[0]
+    self.assertEqual(TEST_URL, request_headers['WARC-Target-URI'])
+    self.assertTrue(request_block.startswith(
+        b'GET /roster.aspx?path=wsoc HTTP/1.1\r\nHost: gostanford.com\r\n'))
+    response_headers, response_block = records[1]
+    self.assertIn('X-Latency-Seconds', response_headers)
+    self.assertNotIn('WARC-Truncated', response_headers)
+    self.assertTrue(response_block.startswith(b'HTTP/1.1 200 OK\r\n'))
+    self.assertTrue(response_block.endswith(b'\r\n\r\n' + body))
+
+  def test_replay(self):
+    self._record([
+        requests.exceptions.ReadTimeout('Read timed out'),
+        _fake_response(503, [b'Busy']),
+        _fake_response(200, [b'<html>', b'Roster</html>'],
+                       {'Content-Type': 'text/html'}),
+    ])
+    replay = cassette.ReplayTransport(self.file_path)
+    self.assertEqual([TEST_URL], replay.urls())
+    with self.assertRaises(requests.exceptions.ReadTimeout):
+      replay.get(url=TEST_URL, headers={}, stream=True)
+    self.assertEqual(503, replay.get(url=TEST_URL).status_code)
+    for _ in range(2):
+      resp = replay.get(url=TEST_URL)
+      self.assertEqual(200, resp.status_code)
+      self.assertEqual('text/html', resp.headers['content-type'])
+      self.assertEqual(b'<html>Roster</html>',
+                       b''.join(resp.raw.stream(4, decode_content=False)))
+
+  def test_replay_missing_url(self):
+    self._record([_fake_response(200, [b'page'])])
+    replay = cassette.ReplayTransport(self.file_path)
+    with self.assertRaises(requests.exceptions.ConnectionError):
+      replay.get(url='https://gocards.com/roster.aspx')
+
+  def test_record_partial_body_is_truncated(self):
+    transport = mock.MagicMock()
+    transport.get.return_value = _fake_response(200,
+                                                [b'<ul>', b'</ul>', b'x'])
+    recorder = cassette.RecordingTransport(self.file_path, transport)
+    resp = recorder.get(url=TEST_URL)
+    next(iter(resp.raw.stream(4)))
+    resp.close()
+    recorder.close()
+    headers, block = list(cassette.read_records(self.file_path))[1]
+    self.assertEqual('unspecified', headers['WARC-Truncated'])
+    self.assertTrue(block.endswith(b'\r\n\r\n<ul>'))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,56 @@
+"""Unit tests for columnar.py"""
+import pickle
+import unittest
+
+import columnar
+
+FIELDS = ('name', 'jersey', 'hometown')
+ROWS = [
+  {'name': 'Mia Hamm', 'jersey': '9', 'hometown': 'Selma'},
+  {'name': 'Zoë Müller', 'jersey': '', 'hometown': 'Zürich'},
+  {'name': 'Kristine Lilly'},
+]
+
+
+class ColumnarTest(unittest.TestCase):
+
+  def test_encode_and_read(self):
+    table = columnar.ColumnarTable(columnar.encode(ROWS, FIELDS))
+    self.assertEqual(3, len(table))
+    self.assertEqual(FIELDS, table.fields)
+    self.assertEqual(['Selma', 'Zürich', ''], table.column('hometown'))
+    self.assertEqual({'name': 'Kristine Lilly', 'jersey': '', 'hometown': ''},
+                     table[2])
+    self.assertEqual(['name', 'jersey', 'hometown'], list(table[0].keys()))
+    with self.assertRaises(IndexError):
+      table[3]
+    table.release()
+
+  def test_empty(self):
+    self.assertEqual([], list(columnar.ColumnarTable(
+        columnar.encode([], FIELDS))))
+    self.assertEqual((), columnar.ColumnarTable(columnar.encode([], [])).fields)
+
+  def test_pickled(self):
+    # The buffer is sent back from a worker as a single bytes string.
+    buf = pickle.loads(pickle.dumps(columnar.encode(ROWS, FIELDS)))
+    expected = [dict((f, row.get(f, '')) for f in FIELDS) for row in ROWS]
+    self.assertEqual(expected, list(columnar.ColumnarTable(buf)))
+
+  def test_value(self):
+    table = columnar.ColumnarTable(columnar.encode(ROWS, FIELDS))
+    self.assertEqual('Zoë Müller', table.value(1, 0))
+    self.assertEqual('', table.value(2, 1))
+    self.assertEqual(['9', '', ''], table.column('jersey'))
+    self.assertEqual([('Mia Hamm', '9', 'Selma'), ('Zoë Müller', '', 'Zürich'),
+                      ('Kristine Lilly', '', '')], list(table.rows()))
+
+  def test_value_with_separator(self):
+    rows = [{'name': 'Mia\0Hamm', 'jersey': '9'}, {'name': '\0'}]
+    table = columnar.ColumnarTable(columnar.encode(rows, ('name', 'jersey')))
+    self.assertEqual([{'name': 'Mia\0Hamm', 'jersey': '9'},
+                      {'name': '\0', 'jersey': ''}], list(table))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,110 @@
+"""Adaptive limit on the number of requests in flight.
+
+The limit follows additive-increase/multiplicative-decrease (AIMD), like TCP
+congestion control: every successful, timely response raises the limit by
+about one request per round of requests, and each sign of overload (a slow
+response, a 429 or 503 status, or a connection error) cuts it in half.
+"""
+import threading
+import time
+
+# Status codes that mean the server is overloaded or throttling requests.
+OVERLOAD_STATUS_CODES = frozenset([429, 503])
+
+
+class AimdLimiter(object):
+  """Blocks callers while the number of requests in flight is at the limit.
+
+  Attributes:
+    limit: A float of the current limit. Callers may run while in_flight is
+        below int(limit).
+    minimum: An int of the lowest limit.
+    maximum: An int of the highest limit.
+    increase: A number added to the limit over one round of successes.
+    decrease: A float between 0 and 1 the limit is multiplied by on overload.
+    slow_seconds: Responses slower than this many seconds count as overload,
+        or None to ignore latency.
+    in_flight: An int of the requests currently in flight.
+    peak: An int of the highest number of requests in flight at once.
+    increases: An int of how many times the limit was raised.
+    decreases: An int of how many times the limit was cut.
+  """
+
+  def __init__(self, initial=4, minimum=1, maximum=16, increase=1.0,
+               decrease=0.5, slow_seconds=10.0, clock=time.time):
+    self.minimum = minimum
+    self.maximum = max(minimum, maximum)
+    self.limit = float(min(max(initial, minimum), self.maximum))
+    self.increase = increase
+    self.decrease = decrease
+    self.slow_seconds = slow_seconds
+    self.in_flight = 0
+    self.peak = 0
+    self.increases = 0
+    self.decreases = 0
+    self._clock = clock
+    self._last_decrease = None
+    self._cond = threading.Condition()
+
+  def acquire(self, timeout=None):
+    """Waits for a free slot.
+
+    Arguments:
+      timeout: An optional number of seconds to wait.
+
+    Returns:
+      True if a slot was taken, False if the timeout expired first.
+    """
+    with self._cond:
+      if not self._cond.wait_for(lambda: self.in_flight < int(self.limit),
+                                 timeout):
+        return False
+      self.in_flight += 1
+      self.peak = max(self.peak, self.in_flight)
+      return True
+
+  def release(self):
+    """Frees a slot taken with acquire()."""
+    with self._cond:
+      self.in_flight -= 1
+      self._cond.notify_all()
+
+  def on_success(self, seconds, sent_at=None):
+    """Reports a response that arrived after the number of seconds.
+
+    Arguments:
+      seconds: A number of seconds the response took.
+      sent_at: An optional timestamp of when the request was sent.
+    """
+    if self.slow_seconds is not None and seconds > self.slow_seconds:
+      self.on_overload(sent_at)
+      return
+    with self._cond:
+      if self.limit < self.maximum:
+        self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+        self.increases += 1
+        self._cond.notify_all()
+
+  def on_overload(self, sent_at=None):
+    """Reports a sign of overload, such as a 429 status or connection error.
+
+    Requests sent before the last decrease saw the old limit, so their
+    signals don't cut the limit again.
+
+    Arguments:
+      sent_at: An optional timestamp of when the request was sent.
+    """
+    with self._cond:
+      if (sent_at is not None and self._last_decrease is not None and
+          sent_at < self._last_decrease):
+        return
+      self.limit = max(float(self.minimum), self.limit * self.decrease)
+      self.decreases += 1
+      self._last_decrease = self._clock()
+
+  def stats(self):
+    """Returns a dict of the limiter state for run reports."""
+    with self._cond:
+      return {'limit': round(self.limit, 2), 'in_flight': self.in_flight,
+              'peak_in_flight': self.peak, 'increases': self.increases,
+              'decreases': self.decreases}
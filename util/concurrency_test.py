@@ -0,0 +1,61 @@
+"""Unit tests for concurrency.py"""
+import threading
+import unittest
+
+import concurrency
+
+
+class AimdLimiterTest(unittest.TestCase):
+
+  def test_acquire_blocks_at_limit(self):
+    limiter = concurrency.AimdLimiter(initial=2, maximum=4)
+    self.assertTrue(limiter.acquire())
+    self.assertTrue(limiter.acquire())
+    self.assertFalse(limiter.acquire(timeout=0.01))
+    limiter.release()
+    self.assertTrue(limiter.acquire(timeout=0.01))
+    self.assertEqual(2, limiter.peak)
+
+  def test_additive_increase(self):
+    limiter = concurrency.AimdLimiter(initial=2, maximum=3)
+    limiter.on_success(0.5)
+    self.assertAlmostEqual(2.5, limiter.limit)
+    for _ in range(10):
+      limiter.on_success(0.5)
+    self.assertEqual(3, limiter.limit)
+
+  def test_multiplicative_decrease(self):
+    now = [100.0]
+    limiter = concurrency.AimdLimiter(initial=8, maximum=16,
+                                      clock=lambda: now[0])
+    limiter.on_overload(sent_at=99.0)
+    self.assertEqual(4, limiter.limit)
+    # Sent before the last decrease, so it is ignored.
+    limiter.on_overload(sent_at=99.5)
+    self.assertEqual(4, limiter.limit)
+    limiter.on_overload(sent_at=100.0)
+    self.assertEqual(2, limiter.limit)
+    limiter.on_overload()
+    limiter.on_overload()
+    self.assertEqual(1, limiter.limit)
+    self.assertEqual(4, limiter.decreases)
+
+  def test_slow_response_is_overload(self):
+    limiter = concurrency.AimdLimiter(initial=4, slow_seconds=5)
+    limiter.on_success(6)
+    self.assertEqual(2, limiter.limit)
+
+  def test_increase_wakes_waiters(self):
+    limiter = concurrency.AimdLimiter(initial=1, maximum=2)
+    limiter.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(
+        limiter.acquire(timeout=5)))
+    waiter.start()
+    limiter.on_success(0.1)
+    waiter.join(5)
+    self.assertEqual([True], acquired)
+
+
+if __name__ == '__main__':
+  unittest.main()
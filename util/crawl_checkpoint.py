@@ -0,0 +1,95 @@
+"""Checkpoint manifest that lets an interrupted roster download resume.
+
+The manifest is a JSON file that maps each school name to the outcome of its
+most recent fetch:
+  {"Stanford": {"url": "https://gostanford.com/roster.aspx?path=wsoc",
+                "status": "ok",
+                "timestamp": 1574294400.0,
+                "sha256": "9f86d081884c7d65..."}}
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+
+
+def content_hash(content):
+  """Returns the hex SHA-256 digest of a string or bytes."""
+  if isinstance(content, str):
+    content = content.encode('utf-8')
+  return hashlib.sha256(content).hexdigest()
+
+
+class CrawlCheckpoint(object):
+  """Records the status, time and content hash of each school's fetch.
+
+  Every call to record() rewrites the manifest file, so the progress of a run
+  survives the process dying part way through.
+
+  Attributes:
+    file_path: A string of the manifest file path.
+    entries: A dict of {school: fetch entry dict}.
+  """
+
+  def __init__(self, file_path):
+    self.file_path = file_path
+    self.entries = {}
+    self._lock = threading.Lock()
+    if os.path.exists(file_path):
+      with open(file_path, 'r', encoding='utf-8') as fo:
+        self.entries = json.load(fo)
+
+  def record(self, school, url, status, content=None):
+    """Saves the outcome of a fetch into the manifest.
+
+    Arguments:
+      school: A string of the school name.
+      url: A string of the roster URL that was fetched.
+      status: STATUS_OK or STATUS_ERROR.
+      content: The optional string or bytes of the fetched page.
+    """
+    entry = {
+      'url': url,
+      'status': status,
+      'timestamp': time.time(),
+      'sha256': content_hash(content) if content is not None else None,
+    }
+    with self._lock:
+      self.entries[school] = entry
+      self._save()
+
+  def is_fresh(self, school, max_age_seconds, url=None):
+    """Returns True if the school was fetched successfully recently enough.
+
+    Arguments:
+      school: A string of the school name.
+      max_age_seconds: A number of seconds a successful fetch stays fresh.
+      url: An optional string of the roster URL. If the URL has changed since
+          the last fetch, the entry is not fresh.
+    """
+    entry = self.entries.get(school)
+    if not entry or entry['status'] != STATUS_OK:
+      return False
+    if url and entry['url'] != url:
+      return False
+    return time.time() - entry['timestamp'] < max_age_seconds
+
+  def failed_schools(self):
+    """Returns a list of schools whose most recent fetch failed."""
+    return [school for school, entry in self.entries.items()
+            if entry['status'] != STATUS_OK]
+
+  def _save(self):
+    # Write to a temporary file first so a crash never leaves a truncated
+    # manifest behind.
+    dir_path = os.path.dirname(self.file_path)
+    if dir_path:
+      os.makedirs(dir_path, exist_ok=True)
+    tmp_path = self.file_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as fw:
+      json.dump(self.entries, fw, indent=2, sort_keys=True)
+    os.replace(tmp_path, self.file_path)
@@ -0,0 +1,54 @@
+"""Unit tests for crawl_checkpoint.py"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import crawl_checkpoint
+
+TEST_URL = 'https://gostanford.com/roster.aspx?path=wsoc'
+
+
+class CrawlCheckpointTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.file_path = os.path.join(self.tmp_dir.name, 'checkpoint.json')
+
+  def tearDown(self):
+    self.tmp_dir.cleanup()
+
+  def test_content_hash(self):
+    self.assertEqual(crawl_checkpoint.content_hash(b'roster'),
+                     crawl_checkpoint.content_hash('roster'))
+
+  def test_record_persists_between_instances(self):
+    checkpoint = crawl_checkpoint.CrawlCheckpoint(self.file_path)
+    checkpoint.record('Stanford', TEST_URL, crawl_checkpoint.STATUS_OK,
+                      '<html>Roster</html>')
+    reloaded = crawl_checkpoint.CrawlCheckpoint(self.file_path)
+    entry = reloaded.entries['Stanford']
+    self.assertEqual(TEST_URL, entry['url'])
+    self.assertEqual(crawl_checkpoint.STATUS_OK, entry['status'])
+    self.assertEqual(crawl_checkpoint.content_hash('<html>Roster</html>'),
+                     entry['sha256'])
+
+  @mock.patch('crawl_checkpoint.time')
+  def test_is_fresh(self, mock_time):
+    mock_time.time.return_value = 1000.0
+    checkpoint = crawl_checkpoint.CrawlCheckpoint(self.file_path)
+    checkpoint.record('Stanford', TEST_URL, crawl_checkpoint.STATUS_OK, 'a')
+    checkpoint.record('Akron', 'https://gozips.com/roster.aspx',
+                      crawl_checkpoint.STATUS_ERROR)
+    mock_time.time.return_value = 1500.0
+    self.assertTrue(checkpoint.is_fresh('Stanford', 600))
+    self.assertTrue(checkpoint.is_fresh('Stanford', 600, TEST_URL))
+    self.assertFalse(checkpoint.is_fresh('Stanford', 600, 'https://new.url'))
+    self.assertFalse(checkpoint.is_fresh('Stanford', 300))
+    self.assertFalse(checkpoint.is_fresh('Akron', 600))
+    self.assertFalse(checkpoint.is_fresh('Navy', 600))
+    self.assertEqual(['Akron'], checkpoint.failed_schools())
+
+
+if __name__ == '__main__':
+  unittest.main()
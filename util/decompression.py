@@ -0,0 +1,167 @@
+"""Incremental decoders for HTTP response content encodings.
+
+gzip and deflate are always supported. Brotli and Zstandard are supported when
+their optional modules are installed:
+pip install --user brotli
+pip install --user zstandard
+
+Each decoder decompresses one chunk at a time, so a compressed body never has
+to be held in memory as a whole.
+"""
+import zlib
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+try:
+  import zstandard
+except ImportError:
+  zstandard = None
+
+# Exceptions raised when content is not valid for its encoding.
+DECODE_ERRORS = (ValueError, zlib.error)
+if brotli:
+  DECODE_ERRORS += (brotli.error,)
+if zstandard:
+  DECODE_ERRORS += (zstandard.ZstdError,)
+
+
+def supported_encodings():
+  """Returns a list of the content encodings that can be decoded."""
+  encodings = ['gzip', 'deflate']
+  if brotli:
+    encodings.append('br')
+  if zstandard:
+    encodings.append('zstd')
+  return encodings
+
+
+def accept_encoding():
+  """Returns an Accept-Encoding header value for the supported encodings."""
+  return ', '.join(supported_encodings())
+
+
+class IdentityDecoder(object):
+  """Passes content through unchanged."""
+
+  def decompress(self, chunk):
+    return chunk
+
+  def flush(self):
+    return b''
+
+
+class ZlibDecoder(object):
+  """Decodes gzip or deflate content."""
+
+  def __init__(self, encoding):
+    self._encoding = encoding
+    if encoding == 'gzip':
+      self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    else:
+      self._decompressor = zlib.decompressobj()
+    self._first_chunk = True
+
+  def decompress(self, chunk):
+    if self._first_chunk and chunk and self._encoding == 'deflate':
+      self._first_chunk = False
+      try:
+        return self._decompressor.decompress(chunk)
+      except zlib.error:
+        # Some servers send raw deflate data without the zlib header.
+        self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    return self._decompressor.decompress(chunk)
+
+  def flush(self):
+    return self._decompressor.flush()
+
+
+class BrotliDecoder(object):
+  """Decodes br content."""
+
+  def __init__(self):
+    self._decompressor = brotli.Decompressor()
+
+  def decompress(self, chunk):
+    if not chunk:
+      return b''
+    return self._decompressor.process(chunk)
+
+  def flush(self):
+    return b''
+
+
+class ZstdDecoder(object):
+  """Decodes zstd content, which may contain several frames."""
+
+  def __init__(self):
+    self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+
+  def decompress(self, chunk):
+    output = []
+    while chunk:
+      output.append(self._decompressor.decompress(chunk))
+      chunk = self._decompressor.unused_data
+      if chunk:
+        self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+    return b''.join(output)
+
+  def flush(self):
+    return b''
+
+
+class MultiDecoder(object):
+  """Decodes content that had several encodings applied, e.g. "gzip, br"."""
+
+  def __init__(self, decoders):
+    # Encodings are listed in the order they were applied, so they are removed
+    # in reverse.
+    self._decoders = list(reversed(decoders))
+
+  def decompress(self, chunk):
+    for decoder in self._decoders:
+      chunk = decoder.decompress(chunk)
+    return chunk
+
+  def flush(self):
+    chunk = b''
+    for decoder in self._decoders:
+      chunk = decoder.decompress(chunk) + decoder.flush()
+    return chunk
+
+
+def _single_decoder(encoding):
+  if encoding in ('', 'identity'):
+    return IdentityDecoder()
+  if encoding in ('gzip', 'x-gzip'):
+    return ZlibDecoder('gzip')
+  if encoding == 'deflate':
+    return ZlibDecoder('deflate')
+  if encoding == 'br' and brotli:
+    return BrotliDecoder()
+  if encoding == 'zstd' and zstandard:
+    return ZstdDecoder()
+  raise ValueError('Unsupported content encoding: {}'.format(encoding))
+
+
+def get_decoder(content_encoding):
+  """Returns an incremental decoder for a Content-Encoding header value.
+
+  Arguments:
+    content_encoding: A string of the header value, or None.
+
+  Returns:
+    An object with decompress(chunk) and flush() methods that return bytes.
+
+  Raises:
+    ValueError: If an encoding isn't supported.
+  """
+  encodings = [e.strip().lower() for e in (content_encoding or '').split(',')]
+  decoders = [_single_decoder(e) for e in encodings if e]
+  if not decoders:
+    return IdentityDecoder()
+  if len(decoders) == 1:
+    return decoders[0]
+  return MultiDecoder(decoders)
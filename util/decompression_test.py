@@ -0,0 +1,66 @@
+"""Unit tests for decompression.py"""
+import gzip
+import unittest
+import zlib
+
+import decompression
+
+HTML = b'<html>' + b'<li class="sidearm-roster-player">Player</li>' * 500 + \
+    b'</html>'
+
+
+def _decode_in_chunks(decoder, data, size=64):
+  output = [decoder.decompress(data[i:i + size])
+            for i in range(0, len(data), size)]
+  output.append(decoder.flush())
+  return b''.join(output)
+
+
+class DecompressionTest(unittest.TestCase):
+
+  def test_accept_encoding(self):
+    actual = decompression.accept_encoding()
+    self.assertTrue(actual.startswith('gzip, deflate'))
+    self.assertEqual(bool(decompression.brotli), 'br' in actual)
+    self.assertEqual(bool(decompression.zstandard), 'zstd' in actual)
+
+  def test_identity(self):
+    decoder = decompression.get_decoder(None)
+    self.assertEqual(HTML, _decode_in_chunks(decoder, HTML))
+
+  def test_gzip(self):
+    decoder = decompression.get_decoder('gzip')
+    self.assertEqual(HTML, _decode_in_chunks(decoder, gzip.compress(HTML)))
+
+  def test_deflate_with_and_without_zlib_header(self):
+    decoder = decompression.get_decoder('deflate')
+    self.assertEqual(HTML, _decode_in_chunks(decoder, zlib.compress(HTML)))
+    raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    raw_data = raw.compress(HTML) + raw.flush()
+    decoder = decompression.get_decoder('deflate')
+    self.assertEqual(HTML, _decode_in_chunks(decoder, raw_data))
+
+  @unittest.skipUnless(decompression.brotli, 'brotli is not installed')
+  def test_brotli(self):
+    decoder = decompression.get_decoder('br')
+    data = decompression.brotli.compress(HTML)
+    self.assertEqual(HTML, _decode_in_chunks(decoder, data, 10))
+
+  @unittest.skipUnless(decompression.zstandard, 'zstandard is not installed')
+  def test_zstd(self):
+    decoder = decompression.get_decoder('zstd')
+    data = decompression.zstandard.ZstdCompressor().compress(HTML)
+    self.assertEqual(HTML, _decode_in_chunks(decoder, data, 10))
+
+  def test_multiple_encodings(self):
+    decoder = decompression.get_decoder('deflate, gzip')
+    data = gzip.compress(zlib.compress(HTML))
+    self.assertEqual(HTML, _decode_in_chunks(decoder, data))
+
+  def test_unsupported_encoding(self):
+    with self.assertRaises(ValueError):
+      decompression.get_decoder('compress')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,112 @@
+"""Aggregated diagnostics of the player fields the parsers could not find.
+
+A page that is missing a field is missing it for every player, so logging
+each miss buries the log in copies of the same warning, and the HTML that is
+logged with it costs more to serialize than reading the player. Instead, the
+parsers record each miss here. Misses are counted per school and field, and
+the HTML of the first few players of each count is kept as a sample, so a
+summary can be logged, or added to a run report, once parsing is done.
+
+The school of a miss is set by the caller of the parsers with school(), so
+the parsers don't need to know which page they read.
+"""
+import collections
+import contextlib
+import threading
+
+# The number of HTML excerpts kept for each school and field.
+MAX_SAMPLES = 3
+# The number of characters of each HTML excerpt.
+MAX_EXCERPT_LEN = 300
+
+
+class MissingFields(object):
+  """Thread-safe counts of missing fields, with sampled HTML excerpts.
+
+  Attributes:
+    counts: A collections.Counter of {(school, field): number of misses}.
+    samples: A dict of {(school, field): list of HTML excerpt strings}.
+  """
+
+  def __init__(self, max_samples=MAX_SAMPLES):
+    self.max_samples = max_samples
+    self.counts = collections.Counter()
+    self.samples = collections.defaultdict(list)
+    self._lock = threading.Lock()
+    self._local = threading.local()
+
+  @contextlib.contextmanager
+  def school(self, name):
+    """Attributes the misses recorded by this thread to a school."""
+    previous = getattr(self._local, 'school', None)
+    self._local.school = name
+    try:
+      yield
+    finally:
+      self._local.school = previous
+
+  def record(self, field, node=None):
+    """Counts a missing field of the current school.
+
+    Arguments:
+      field: A string of the missing field or its selector.
+      node: An optional BeautifulSoup node of the player the field is missing
+          from. It's only serialized if an excerpt is sampled.
+    """
+    key = (getattr(self._local, 'school', None) or '', field)
+    with self._lock:
+      self.counts[key] += 1
+      sample = node is not None and len(self.samples[key]) < self.max_samples
+      if sample:
+        # Reserve the slot, so the node is serialized outside of the lock.
+        self.samples[key].append(None)
+        index = len(self.samples[key]) - 1
+    if sample:
+      excerpt = ' '.join(str(node).split())[:MAX_EXCERPT_LEN]
+      with self._lock:
+        self.samples[key][index] = excerpt
+
+  def snapshot(self):
+    """Returns a tuple of (counts dict, samples dict) of the misses, e.g. to
+    send them from a worker process to merge().
+    """
+    with self._lock:
+      return dict(self.counts), {k: list(v) for k, v in self.samples.items()}
+
+  def merge(self, snapshot):
+    """Adds the misses of a snapshot() to these."""
+    counts, samples = snapshot
+    with self._lock:
+      self.counts.update(counts)
+      for key, excerpts in samples.items():
+        room = self.max_samples - len(self.samples[key])
+        self.samples[key].extend(excerpts[:max(room, 0)])
+
+  def clear(self):
+    with self._lock:
+      self.counts.clear()
+      self.samples.clear()
+
+  def log_summary(self, logger):
+    """Logs a warning for each school and field with misses."""
+    with self._lock:
+      items = sorted(self.counts.items())
+      samples = {key: list(self.samples.get(key, [])) for key, _ in items}
+    for (school, field), count in items:
+      logger.warning('%s: %d players without %s', school or '<unknown>',
+                     count, field)
+      for excerpt in samples[(school, field)]:
+        logger.warning('  Player HTML: %s', excerpt)
+
+  def add_to_report(self, report):
+    """Adds the counts to a run_report.RunReport as the "missing_fields"
+    tally, keyed by "school: field".
+    """
+    with self._lock:
+      items = list(self.counts.items())
+    for (school, field), count in items:
+      report.set_tally('missing_fields', '{}: {}'.format(school, field), count)
+    report.increment('missing_fields', sum(count for _, count in items))
+
+
+MISSING_FIELDS = MissingFields()
@@ -0,0 +1,76 @@
+"""Unit tests for diagnostics.py"""
+import unittest
+from unittest import mock
+
+from bs4 import BeautifulSoup as bs
+
+import diagnostics
+import run_report
+
+
+class MissingFieldsTest(unittest.TestCase):
+
+  def setUp(self):
+    self.missing_fields = diagnostics.MissingFields(max_samples=2)
+
+  def test_record(self):
+    player = bs('<li class="sidearm-roster-player">\n  <h3>Mia Hamm</h3></li>',
+                'html.parser')
+    with self.missing_fields.school('North Carolina'):
+      for _ in range(3):
+        self.missing_fields.record('jersey', player)
+      self.missing_fields.record('height')
+    self.missing_fields.record('jersey')
+    self.assertEqual({('North Carolina', 'jersey'): 3,
+                      ('North Carolina', 'height'): 1,
+                      ('', 'jersey'): 1},
+                     dict(self.missing_fields.counts))
+    excerpt = '<li class="sidearm-roster-player"> <h3>Mia Hamm</h3></li>'
+    self.assertEqual([excerpt, excerpt],
+                     self.missing_fields.samples[('North Carolina', 'jersey')])
+    self.assertEqual([],
+                     self.missing_fields.samples[('North Carolina', 'height')])
+
+  def test_record_serializes_only_samples(self):
+    player = mock.MagicMock()
+    player.__str__.return_value = '<li></li>'
+    for _ in range(5):
+      self.missing_fields.record('name', player)
+    self.assertEqual(2, player.__str__.call_count)
+
+  def test_merge_snapshot(self):
+    worker = diagnostics.MissingFields()
+    with worker.school('Stanford'):
+      worker.record('year', bs('<li>a</li>', 'html.parser'))
+      worker.record('year', bs('<li>b</li>', 'html.parser'))
+    with self.missing_fields.school('Stanford'):
+      self.missing_fields.record('year', bs('<li>c</li>', 'html.parser'))
+    self.missing_fields.merge(worker.snapshot())
+    self.assertEqual({('Stanford', 'year'): 3},
+                     dict(self.missing_fields.counts))
+    self.assertEqual(['<li>c</li>', '<li>a</li>'],
+                     self.missing_fields.samples[('Stanford', 'year')])
+
+  def test_log_summary(self):
+    with self.missing_fields.school('Stanford'):
+      self.missing_fields.record('year', bs('<li>x</li>', 'html.parser'))
+      self.missing_fields.record('year')
+    logger = mock.MagicMock()
+    self.missing_fields.log_summary(logger)
+    logger.warning.assert_has_calls([
+        mock.call('%s: %d players without %s', 'Stanford', 2, 'year'),
+        mock.call('  Player HTML: %s', '<li>x</li>')])
+
+  def test_add_to_report(self):
+    with self.missing_fields.school('Stanford'):
+      self.missing_fields.record('year')
+      self.missing_fields.record('club')
+    report = run_report.RunReport('convert')
+    self.missing_fields.add_to_report(report)
+    self.assertEqual({'Stanford: year': 1, 'Stanford: club': 1},
+                     report.tallies['missing_fields'])
+    self.assertEqual(2, report.counters['missing_fields'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,122 @@
+"""Historical download timings and page sizes for each roster host.
+
+The stats of past runs are used to schedule the slowest downloads first, so a
+few slow hosts don't start at the end of a run and set its total run time
+(longest-processing-time-first scheduling). Whether the lighter print view of
+a host's roster page had the roster is kept as well, so hosts without one
+aren't asked for it again.
+"""
+import json
+import os
+import statistics
+import threading
+import time
+from urllib.parse import urlparse
+
+# The weight of the newest sample in the moving averages.
+SMOOTHING = 0.3
+
+
+def _host(url):
+  return urlparse(url).netloc.lower()
+
+
+class HostStats(object):
+  """Moving averages of the download time and body size of each host.
+
+  Attributes:
+    file_path: A string of the JSON file the stats are loaded from and saved
+        into, or None to keep them in memory only.
+    hosts: A dict of {host: {'seconds': float, 'bytes': float,
+        'samples': int, 'updated': timestamp, 'light_view': bool}}. Hosts
+        with only a light_view result have no timing fields.
+  """
+
+  def __init__(self, file_path=None):
+    self.file_path = file_path
+    self.hosts = {}
+    self._lock = threading.Lock()
+    if file_path and os.path.exists(file_path):
+      with open(file_path, 'r', encoding='utf-8') as fo:
+        self.hosts = json.load(fo)
+
+  def record(self, url, seconds, size):
+    """Adds the timing and size of one finished download.
+
+    Arguments:
+      url: A string of the downloaded url.
+      seconds: A number of seconds the download took.
+      size: An int of the bytes of the body.
+    """
+    host = _host(url)
+    with self._lock:
+      entry = self.hosts.setdefault(host, {})
+      if 'seconds' not in entry:
+        entry.update({'seconds': float(seconds), 'bytes': float(size),
+                      'samples': 0})
+      else:
+        entry['seconds'] += SMOOTHING * (seconds - entry['seconds'])
+        entry['bytes'] += SMOOTHING * (size - entry['bytes'])
+      entry['samples'] += 1
+      entry['updated'] = time.time()
+
+  def estimate(self, url):
+    """Returns a tuple of the expected (seconds, bytes) of a download.
+
+    Hosts with no history are expected to take the median time and size of
+    the known hosts, or (0, 0) if no host is known.
+    """
+    with self._lock:
+      entry = self.hosts.get(_host(url))
+      if entry is not None and 'seconds' in entry:
+        return entry['seconds'], entry['bytes']
+      known = [e for e in self.hosts.values() if 'seconds' in e]
+      if not known:
+        return 0.0, 0.0
+      return (statistics.median(e['seconds'] for e in known),
+              statistics.median(e['bytes'] for e in known))
+
+  def record_light_view(self, url, has_roster):
+    """Records whether the light view of a host's roster page had the roster.
+
+    Arguments:
+      url: A string of the roster page url.
+      has_roster: True if the light view had the roster.
+    """
+    with self._lock:
+      self.hosts.setdefault(_host(url), {})['light_view'] = bool(has_roster)
+
+  def light_view(self, url):
+    """Returns True or False if the light view of the host had the roster
+    the last time it was tried, or None if it hasn't been tried.
+    """
+    with self._lock:
+      return self.hosts.get(_host(url), {}).get('light_view')
+
+  def longest_first(self, items, url_key=lambda item: item):
+    """Orders items so the slowest, then largest, downloads come first.
+
+    Items with the same estimate keep their original order.
+
+    Arguments:
+      items: An iterable of items to order.
+      url_key: A function that returns the url of an item.
+
+    Returns:
+      A new list of the items.
+    """
+    return sorted(items, key=lambda item: self.estimate(url_key(item)),
+                  reverse=True)
+
+  def save(self):
+    """Saves the stats into the file, if there is one."""
+    if not self.file_path:
+      return
+    dir_path = os.path.dirname(self.file_path)
+    if dir_path:
+      os.makedirs(dir_path, exist_ok=True)
+    tmp_path = self.file_path + '.tmp'
+    with self._lock:
+      with open(tmp_path, 'w', encoding='utf-8') as fw:
+        json.dump(self.hosts, fw, indent=2, sort_keys=True)
+    os.replace(tmp_path, self.file_path)
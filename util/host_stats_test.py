@@ -0,0 +1,62 @@
+"""Unit tests for host_stats.py"""
+import os
+import tempfile
+import unittest
+
+import host_stats
+
+
+class HostStatsTest(unittest.TestCase):
+
+  def test_record_smooths_samples(self):
+    stats = host_stats.HostStats()
+    stats.record('https://gostanford.com/roster.aspx', 10, 1000)
+    stats.record('https://GoStanford.com/other', 20, 2000)
+    seconds, size = stats.estimate('https://gostanford.com/roster.aspx')
+    self.assertAlmostEqual(13.0, seconds)
+    self.assertAlmostEqual(1300.0, size)
+    self.assertEqual(2, stats.hosts['gostanford.com']['samples'])
+
+  def test_estimate_unknown_host(self):
+    stats = host_stats.HostStats()
+    self.assertEqual((0.0, 0.0), stats.estimate('http://one.edu'))
+    stats.record('http://one.edu', 1, 100)
+    stats.record('http://two.edu', 3, 300)
+    stats.record('http://three.edu', 8, 800)
+    self.assertEqual((3.0, 300.0), stats.estimate('http://four.edu'))
+
+  def test_longest_first(self):
+    stats = host_stats.HostStats()
+    stats.record('http://fast.edu', 1, 100)
+    stats.record('http://slow.edu', 9, 100)
+    stats.record('http://big.edu', 9, 900)
+    items = [('Fast', 'http://fast.edu'), ('Slow', 'http://slow.edu'),
+             ('New', 'http://new.edu'), ('Big', 'http://big.edu')]
+    actual = stats.longest_first(items, url_key=lambda item: item[1])
+    self.assertEqual(['Big', 'Slow', 'New', 'Fast'],
+                     [school for school, _ in actual])
+
+  def test_light_view(self):
+    stats = host_stats.HostStats()
+    self.assertIsNone(stats.light_view('https://goutsa.com/roster.aspx'))
+    stats.record_light_view('https://goutsa.com/roster.aspx?print=true', False)
+    self.assertFalse(stats.light_view('https://goutsa.com/roster.aspx'))
+    # Hosts without timings don't count towards the estimate of new hosts.
+    stats.record('http://one.edu', 4, 100)
+    self.assertEqual((4.0, 100.0), stats.estimate('https://goutsa.com'))
+    stats.record('https://goutsa.com/roster.aspx', 2, 50)
+    self.assertEqual((2.0, 50.0), stats.estimate('https://goutsa.com'))
+    self.assertFalse(stats.light_view('https://goutsa.com/roster.aspx'))
+
+  def test_save_and_load(self):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      file_path = os.path.join(tmp_dir, 'host_stats.json')
+      stats = host_stats.HostStats(file_path)
+      stats.record('http://one.edu', 2, 200)
+      stats.save()
+      reloaded = host_stats.HostStats(file_path)
+      self.assertEqual((2.0, 200.0), reloaded.estimate('http://one.edu'))
+
+
+if __name__ == '__main__':
+  unittest.main()
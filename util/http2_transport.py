@@ -0,0 +1,151 @@
+"""Optional HTTP/2 transport for the roster downloader.
+
+The downloader sends requests with the requests module, which only speaks
+HTTP/1.1, so every roster page needs its own connection. When httpx and h2 are
+installed, HttpxTransport sends the requests through a single httpx client
+instead, and HTTP/2 servers multiplex all of the requests to an origin over
+one connection. Servers that don't offer HTTP/2 are still sent HTTP/1.1.
+pip install --user httpx[http2]
+
+HttpxTransport.get() takes the same args as requests.get() and returns a
+response with the parts of the requests.Response API the downloader uses.
+Errors are raised as the requests and urllib3 exceptions the downloader
+already handles.
+"""
+import collections
+import threading
+
+import requests
+import urllib3
+
+try:
+  import h2
+  import httpx
+except ImportError:
+  h2 = httpx = None
+
+
+def available():
+  """Returns True if the modules needed for HTTP/2 are installed."""
+  return httpx is not None and h2 is not None
+
+
+class _RawStream(object):
+  """The response.raw part of the requests.Response API."""
+
+  def __init__(self, response):
+    self._response = response
+
+  def stream(self, chunk_size, decode_content=False):
+    """Yields the body as it arrives, still content encoded.
+
+    Raises:
+      urllib3.exceptions.ReadTimeoutError: If a read timed out.
+      urllib3.exceptions.ProtocolError: If the connection failed.
+    """
+    del decode_content  # The body is always read without decoding.
+    try:
+      for chunk in self._response.iter_raw(chunk_size):
+        yield chunk
+    except httpx.TimeoutException as e:
+      raise urllib3.exceptions.ReadTimeoutError(
+          None, str(self._response.url), str(e)) from e
+    except httpx.TransportError as e:
+      raise urllib3.exceptions.ProtocolError(str(e)) from e
+
+  def getheaders(self):
+    return list(self._response.headers.items())
+
+
+class HttpxResponse(object):
+  """Wraps a streamed httpx.Response.
+
+  Attributes:
+    status_code: An int of the HTTP status code.
+    reason: A string of the HTTP reason phrase.
+    headers: A case-insensitive mapping of the response headers.
+    http_version: A string of the protocol version, e.g. "HTTP/2".
+    raw: An object with stream() and getheaders() methods.
+  """
+
+  def __init__(self, response):
+    self._response = response
+    self.status_code = response.status_code
+    self.reason = response.reason_phrase
+    self.headers = response.headers
+    self.http_version = response.http_version
+    self.raw = _RawStream(response)
+
+  def close(self):
+    self._response.close()
+
+
+class HttpxTransport(object):
+  """Sends requests through one shared httpx client.
+
+  The client is safe to use from several threads.
+
+  Attributes:
+    versions: A collections.Counter of the protocol versions of the responses.
+  """
+
+  def __init__(self, http2=True, prior_knowledge=False, max_connections=100):
+    """Creates the client.
+
+    Arguments:
+      http2: If True, offer HTTP/2 to servers that support it.
+      prior_knowledge: If True, send HTTP/2 without negotiating it first. Use
+          this for plain http:// servers known to speak HTTP/2.
+      max_connections: An int of the most open connections.
+
+    Raises:
+      ImportError: If httpx or h2 isn't installed.
+    """
+    if not available():
+      raise ImportError('HTTP/2 needs httpx and h2: pip install httpx[http2]')
+    self.versions = collections.Counter()
+    self._lock = threading.Lock()
+    self._client = httpx.Client(
+        http1=not prior_knowledge, http2=http2 or prior_knowledge,
+        limits=httpx.Limits(max_connections=max_connections),
+        follow_redirects=True)
+
+  def get(self, url, headers=None, stream=True, timeout=None):
+    """Sends a GET request, like requests.get().
+
+    Arguments:
+      url: A string of the url.
+      headers: An optional dict of request headers.
+      stream: Ignored. The body is always streamed with response.raw.stream().
+      timeout: An optional tuple of (connect, read) seconds.
+
+    Returns:
+      An HttpxResponse.
+
+    Raises:
+      requests.exceptions.ConnectTimeout: If connecting timed out.
+      requests.exceptions.ReadTimeout: If the response headers timed out.
+      requests.exceptions.ConnectionError: If the connection failed.
+    """
+    del stream
+    if timeout is not None:
+      connect, read = timeout
+      timeout = httpx.Timeout(read, connect=connect, pool=read)
+    else:
+      timeout = httpx.Timeout(None)
+    request = self._client.build_request('GET', url, headers=headers,
+                                         timeout=timeout)
+    try:
+      response = self._client.send(request, stream=True)
+    except httpx.ConnectTimeout as e:
+      raise requests.exceptions.ConnectTimeout(str(e)) from e
+    except httpx.TimeoutException as e:
+      raise requests.exceptions.ReadTimeout(str(e)) from e
+    except httpx.TransportError as e:
+      raise requests.exceptions.ConnectionError(str(e)) from e
+    with self._lock:
+      self.versions[response.http_version] += 1
+    return HttpxResponse(response)
+
+  def close(self):
+    self._client.close()
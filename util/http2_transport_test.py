@@ -0,0 +1,54 @@
+"""Unit tests for http2_transport.py"""
+import socket
+import unittest
+
+import requests
+
+import http2_transport
+import mock_roster_server
+
+PAGES = {'Roster': b'<html>' + b'<p>Player</p>' * 10000 + b'</html>'}
+
+
+@unittest.skipUnless(http2_transport.available(), 'httpx[http2] not installed')
+class HttpxTransportTest(unittest.TestCase):
+
+  def _get_pages(self, transport, base_url, count):
+    bodies = []
+    for i in range(count):
+      resp = transport.get('%s/%d/Roster' % (base_url, i), timeout=(5, 5))
+      self.assertEqual(200, resp.status_code)
+      bodies.append(b''.join(resp.raw.stream(1024, decode_content=False)))
+      resp.close()
+    return bodies
+
+  def test_http2_uses_one_connection(self):
+    with mock_roster_server.MockRosterServer(PAGES, http2=True) as server:
+      transport = http2_transport.HttpxTransport(prior_knowledge=True)
+      bodies = self._get_pages(transport, server.base_url, 3)
+      transport.close()
+    self.assertEqual([PAGES['Roster']] * 3, bodies)
+    self.assertEqual(1, server.connections)
+    self.assertEqual({'HTTP/2': 3}, dict(transport.versions))
+
+  def test_falls_back_to_http1(self):
+    with mock_roster_server.MockRosterServer(PAGES) as server:
+      transport = http2_transport.HttpxTransport()
+      bodies = self._get_pages(transport, server.base_url, 2)
+      transport.close()
+    self.assertEqual([PAGES['Roster']] * 2, bodies)
+    self.assertEqual({'HTTP/1.1': 2}, dict(transport.versions))
+
+  def test_connection_error(self):
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    transport = http2_transport.HttpxTransport()
+    with self.assertRaises(requests.exceptions.ConnectionError):
+      transport.get('http://127.0.0.1:%d/Roster' % port, timeout=(1, 1))
+    transport.close()
+
+
+if __name__ == '__main__':
+  unittest.main()
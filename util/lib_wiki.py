@@ -1,14 +1,115 @@
 # -*- coding: utf-8 -*-
 # Required: pip install wikitables
+# wikitables is only imported to fetch the article, so the scripts can use the
+# cleanup functions, or a snapshot, without loading it.
 
 import logging
-from wikitables import import_tables
+import re
 
+from util import query_cache
 
-def GetWomensSoccerArticleTable(schools_filter=None):
+ARTICLE_TITLE = "List of NCAA Division I women's soccer programs"
+# Separates table cells when all cells are cleaned in a single pass. The ASCII
+# unit separator character never appears in the article text.
+CELL_SEPARATOR = '\x1f'
+# Text after a footnote link or HTML tag in a cell is ignored.
+_TRAILING_MARKUP = re.compile(r'[\[<][^\x1f]*')
+# Bracketed text, up to the end of the bracket or the end of the cell, and any
+# stray closing bracket.
+_BRACKETED_TEXT = re.compile(r'[{\[<][^}\]>\x1f]*|[}\]>]')
+_NON_ASCII = re.compile(r'[^\x00-\x80]')
+# The wikitables module unfortunately includes all citation text if a table
+# cell includes a link to one in the wiki page. Institution cells that start
+# with these names are cut down to the name (as of Nov. 2019).
+_CITED_NAMES = ('California Baptist', 'Merrimack')
+# Ignore these schools since they aren't yet, or are soon leaving, D1.
+_IGNORED_SCHOOLS = ('California Baptist', 'LIU Brooklyn', 'North Alabama',
+                    'New Orleans')
+
+
+def ImportArticleRows(title=ARTICLE_TITLE, snapshot_file=None,
+                      ttl_seconds=None, offline=False):
+  """Returns the rows of the first table in a Wikipedia article.
+
+  The rows are saved into a local snapshot file so repeated runs don't fetch
+  the article again until the snapshot is older than the TTL.
+
+  Args:
+    title: A string of the Wikipedia article title.
+    snapshot_file: An optional string of the JSON snapshot file.
+    ttl_seconds: An optional number of seconds the snapshot stays valid.
+    offline: If True, always read the snapshot, regardless of its age, and
+        never fetch the article.
+
+  Returns:
+    A list of dicts of {column name: raw cell text}, one for each table row.
+
+  Raises:
+    ValueError: If offline is True and there is no snapshot of the article.
+  """
+  logger = logging.getLogger(__name__)
+  cache = None
+  if snapshot_file:
+    cache = query_cache.QueryCache(snapshot_file, ttl_seconds)
+    rows = cache.get(title, ignore_ttl=offline)
+    if rows is not None:
+      logger.debug('Using the snapshot of "%s" in %s', title, snapshot_file)
+      return rows
+  if offline:
+    raise ValueError('No snapshot of "{}" in {}'.format(title, snapshot_file))
+  from wikitables import import_tables
+  tables = import_tables(title)
+  rows = [{col_name: row[col_name].value for col_name in row.keys()}
+          for row in tables[0].rows]
+  if cache:
+    cache.put(title, rows)
+  return rows
+
+
+def CleanCells(values, keep_trailing_text=False):
+  """Cleans the text of many table cells in a single pass.
+
+  Converts en dashes to regular dashes, replaces any other non-ASCII character
+  with a space, and drops the text after a footnote link or HTML tag.
+
+  Args:
+    values: A list of strings of raw cell text.
+    keep_trailing_text: If True, only the bracketed text, like footnote links
+        (e.g. [a]), is removed, and the text after it is kept.
+
+  Returns:
+    A list of strings of the clean text, in the same order.
+  """
+  # Bracketed text never runs past the end of its own cell.
+  markup = _BRACKETED_TEXT if keep_trailing_text else _TRAILING_MARKUP
+  text = CELL_SEPARATOR.join(values)
+  text = markup.sub('', text).replace('–', '-')
+  text = _NON_ASCII.sub(' ', text)
+  return [cell.strip() for cell in text.split(CELL_SEPARATOR)]
+
+
+def CutCitedName(institution):
+  """Cuts the clean text of an Institution cell down to the institution name,
+  if wikitables included citation text after it.
+
+  Args:
+    institution: A string of the clean Institution cell text.
+
+  Returns:
+    A string of the institution name.
+  """
+  return next((name for name in _CITED_NAMES if institution.startswith(name)),
+              institution)
+
+
+def GetWomensSoccerArticleTable(schools_filter=None, snapshot_file=None,
+                                ttl_seconds=None, offline=False):
   """Specific function for importing and parsing the Wikipedia
   article on NCAA D1 Women's Soccer Programs.
 
+  The snapshot_file, ttl_seconds and offline args are passed to
+  ImportArticleRows().
+
   Returns:
     A dictionary of Wikipedia table data:
       key: A string of the school name. Example: "Stanford"
@@ -24,31 +125,20 @@ def GetWomensSoccerArticleTable(schools_filter=None):
 
   # Get the list of schools from Wikipedia
   # https://en.wikipedia.org/wiki/List_of_NCAA_Division_I_women%27s_soccer_programs
-  programs = import_tables("List of NCAA Division I women's soccer programs")
+  programs = ImportArticleRows(ARTICLE_TITLE, snapshot_file, ttl_seconds,
+                               offline)
 
-  schools = {}
-  for program in programs[0].rows:
-    columns = {}
-    if schools_filter and program['Institution'] not in schools_filter:
+  rows = []
+  for program in programs:
+    if schools_filter and program.get('Institution') not in schools_filter:
       continue
-    for col_name in program.keys():
-      cell_text = ''
-      val = program[col_name].value
-      # Ignore these schools since they aren't yet, or are soon leaving, D1.
-      if (not val.startswith('California Baptist') and
-          not val.startswith('LIU Brooklyn') and
-          not val.startswith('North Alabama') and
-          not val.startswith('New Orleans')):
-        # Format the text of each table cell by removing non-ascii characters
-        # and ignoring text after comment/formatting characters.
-        for c in val:
-          if c == '–': cell_text += '-'
-          elif ord(c) > 128: cell_text += ' '
-          elif c == '[': break
-          elif c == '<': break
-          else: cell_text += c
-        clean_text = cell_text.strip()
-        columns[col_name] = clean_text
+    rows.append([(col_name, val) for col_name, val in program.items()
+                 if not val.startswith(_IGNORED_SCHOOLS)])
+  clean_values = iter(CleanCells([val for row in rows for _, val in row]))
+
+  schools = {}
+  for row in rows:
+    columns = {col_name: next(clean_values) for col_name, _ in row}
     if 'Institution' in columns:
       schools[columns['Institution']] = columns
       logger.debug(columns)
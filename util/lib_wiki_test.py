@@ -1,22 +1,24 @@
 # -*- coding: utf-8 -*-
 
+from collections import namedtuple
+import os
+import tempfile
 import unittest
 from unittest import mock
 import lib_wiki
 
+WikiData = namedtuple('WikiData', ['value'])
+
 
 COL_HEADS = ['Institution', 'Location', 'State', 'Type', 'Nickname', 'Conference']
 ACU = ['Abilene Christian', 'Abilene', 'Texas', 'Private', 'Wildcats', 'Southland']
-CU = ['Colorado', 'Boulder', 'Colorado', 'Public', 'Buffalos', 'Pac-12']
+CU = ['Colorado[a]', 'Boulder', 'Colorado', 'Public', 'Buffalos', 'Pac–12']
 SHS = ['Sam Houston State', 'Huntsville', 'Texas', 'Public', 'Peahens', 'Metro Atlantic']
 STANFORD = ['Stanford', 'Palo Alto', 'California', 'Private', 'Cardinal', 'Pac-12']
 YSU = ['Youngstown State', 'Youngstown', 'Ohio', 'Public', 'Penguins', 'Horizon']
 FAKE_ROWS = []
-FAKE_ROWS.append(dict(zip(COL_HEADS, ACU)))
-FAKE_ROWS.append(dict(zip(COL_HEADS, CU)))
-FAKE_ROWS.append(dict(zip(COL_HEADS, SHS)))
-FAKE_ROWS.append(dict(zip(COL_HEADS, STANFORD)))
-FAKE_ROWS.append(dict(zip(COL_HEADS, YSU)))
+for row in [ACU, CU, SHS, STANFORD, YSU]:
+  FAKE_ROWS.append(dict(zip(COL_HEADS, [WikiData(v) for v in row])))
 FAKE_TABLE = mock.MagicMock()
 FAKE_TABLE.rows = FAKE_ROWS
 FAKE_WIKITABLE = [
@@ -25,11 +27,47 @@ FAKE_WIKITABLE = [
 
 class TestLibWiki(unittest.TestCase):
 
-  @mock.patch('lib_wiki.import_tables')
+  @mock.patch('wikitables.import_tables')
   def testGetWomensSoccerArticleTable(self, mock_import_tables):
     mock_import_tables.return_value = FAKE_WIKITABLE
     actual = lib_wiki.GetWomensSoccerArticleTable()
-    self.assertTrue(True)
+    self.assertEqual(['Abilene Christian', 'Colorado', 'Sam Houston State',
+                      'Stanford', 'Youngstown State'], list(actual.keys()))
+    self.assertEqual(dict(zip(COL_HEADS, STANFORD)), actual['Stanford'])
+    self.assertEqual('Pac-12', actual['Colorado']['Conference'])
+
+  def testCleanCells(self):
+    actual = lib_wiki.CleanCells(['Kansas City[b]', 'Loyola–Chicago',
+                                  'UCLA æ', '<ref>', ''])
+    self.assertEqual(['Kansas City', 'Loyola-Chicago', 'UCLA', '', ''],
+                     actual)
+
+  def testCleanCellsKeepTrailingText(self):
+    actual = lib_wiki.CleanCells(['Kansas City[b] Roos', '{{a}}b>',
+                                  'Merrimack[c] Warriors', 'UCLA'],
+                                 keep_trailing_text=True)
+    self.assertEqual(['Kansas City Roos', 'b', 'Merrimack Warriors', 'UCLA'],
+                     actual)
+
+  def testCutCitedName(self):
+    self.assertEqual('Merrimack', lib_wiki.CutCitedName('Merrimack Warriors'))
+    self.assertEqual('UCLA', lib_wiki.CutCitedName('UCLA'))
+
+  @mock.patch('wikitables.import_tables')
+  def testImportArticleRowsSnapshot(self, mock_import_tables):
+    mock_import_tables.return_value = FAKE_WIKITABLE
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      snapshot_file = os.path.join(tmp_dir, 'snapshot.json')
+      with self.assertRaises(ValueError):
+        lib_wiki.ImportArticleRows(snapshot_file=snapshot_file, offline=True)
+      first = lib_wiki.ImportArticleRows(snapshot_file=snapshot_file)
+      second = lib_wiki.ImportArticleRows(snapshot_file=snapshot_file)
+      offline = lib_wiki.ImportArticleRows(snapshot_file=snapshot_file,
+                                           offline=True)
+    self.assertEqual(1, mock_import_tables.call_count)
+    self.assertEqual(dict(zip(COL_HEADS, ACU)), first[0])
+    self.assertEqual(first, second)
+    self.assertEqual(first, offline)
 
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,203 @@
+"""Local web server that serves saved roster pages, for tests and benchmarks.
+
+Every request path ending in a page name, e.g. /17/UTSA, is answered with that
+page after an optional delay, which stands in for the latency of a real
+athletics web server. The server speaks either HTTP/1.1 or, when h2 is
+installed, HTTP/2 with prior knowledge (no TLS).
+"""
+import http.server
+import os
+import threading
+import time
+
+try:
+  import h2.config
+  import h2.connection
+  import h2.events
+  import h2.exceptions
+except ImportError:
+  h2 = None
+
+
+def read_pages(dir_path, suffix='.webpage'):
+  """Returns a dict of {page name: bytes} of the saved pages in a directory."""
+  pages = {}
+  for file_name in sorted(os.listdir(dir_path)):
+    if file_name.endswith(suffix):
+      with open(os.path.join(dir_path, file_name), 'rb') as fo:
+        pages[file_name[:-len(suffix)]] = fo.read()
+  return pages
+
+
+class MockRosterServer(object):
+  """Serves pages on a free port of localhost from a background thread.
+
+  Attributes:
+    pages: A dict of {page name: bytes}.
+    delay_seconds: A number of seconds to wait before each response.
+    http2: If True, speak HTTP/2 instead of HTTP/1.1.
+    base_url: A string of the server url, set by start().
+    connections: An int of the connections accepted so far.
+  """
+
+  def __init__(self, pages, delay_seconds=0, http2=False):
+    if http2 and h2 is None:
+      raise ImportError('The HTTP/2 server needs h2: pip install h2')
+    self.pages = pages
+    self.delay_seconds = delay_seconds
+    self.http2 = http2
+    self.base_url = None
+    self.connections = 0
+    self._server = None
+    self._thread = None
+
+  def page_for_path(self, path):
+    """Returns the bytes of the page named by the last part of the path."""
+    return self.pages.get(path.rstrip('/').rsplit('/', 1)[-1])
+
+  def start(self):
+    """Starts serving and returns the base url."""
+    server_class = _H2Server if self.http2 else _Http1Server
+    self._server = server_class(('127.0.0.1', 0), self)
+    self._thread = threading.Thread(target=self._server.serve_forever,
+                                    daemon=True)
+    self._thread.start()
+    self.base_url = 'http://127.0.0.1:%d' % self._server.server_address[1]
+    return self.base_url
+
+  def stop(self):
+    self._server.shutdown()
+    self._server.server_close()
+    self._thread.join()
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, *exc_info):
+    self.stop()
+
+
+class _Http1Handler(http.server.BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+
+  def do_GET(self):
+    mock = self.server.mock
+    time.sleep(mock.delay_seconds)
+    page = mock.page_for_path(self.path)
+    if page is None:
+      self.send_error(404)
+      return
+    self.send_response(200)
+    self.send_header('Content-Type', 'text/html')
+    self.send_header('Content-Length', str(len(page)))
+    self.end_headers()
+    self.wfile.write(page)
+
+  def log_message(self, *args):
+    pass
+
+
+class _Http1Server(http.server.ThreadingHTTPServer):
+  daemon_threads = True
+
+  def __init__(self, address, mock):
+    self.mock = mock
+    super().__init__(address, _Http1Handler)
+
+  def process_request(self, request, client_address):
+    self.mock.connections += 1
+    super().process_request(request, client_address)
+
+  def handle_error(self, request, client_address):
+    # Clients close connections early once they have the roster section.
+    pass
+
+
+class _H2Server(http.server.ThreadingHTTPServer):
+  """Accepts connections and hands each one to an _H2Connection."""
+  daemon_threads = True
+
+  def __init__(self, address, mock):
+    self.mock = mock
+    super().__init__(address, None)
+
+  def finish_request(self, request, client_address):
+    self.mock.connections += 1
+    _H2Connection(request, self.mock).serve()
+
+
+class _H2Connection(object):
+  """Serves the streams of one HTTP/2 connection, each in its own thread."""
+
+  def __init__(self, sock, mock):
+    self._sock = sock
+    self._mock = mock
+    self._conn = h2.connection.H2Connection(
+        config=h2.config.H2Configuration(client_side=False))
+    # Guards the connection state and signals flow control window updates.
+    self._cond = threading.Condition()
+    self._closed = False
+
+  def serve(self):
+    with self._cond:
+      self._conn.initiate_connection()
+      self._flush()
+    try:
+      while not self._closed:
+        data = self._sock.recv(65536)
+        if not data:
+          break
+        with self._cond:
+          events = self._conn.receive_data(data)
+          for event in events:
+            if isinstance(event, h2.events.RequestReceived):
+              path = dict(event.headers).get(b':path', b'/').decode('ascii')
+              threading.Thread(target=self._respond,
+                               args=(event.stream_id, path),
+                               daemon=True).start()
+            elif isinstance(event, h2.events.ConnectionTerminated):
+              self._closed = True
+          self._flush()
+          self._cond.notify_all()
+    except (OSError, h2.exceptions.ProtocolError):
+      pass
+    finally:
+      with self._cond:
+        self._closed = True
+        self._cond.notify_all()
+
+  def _flush(self):
+    data = self._conn.data_to_send()
+    if data:
+      self._sock.sendall(data)
+
+  def _respond(self, stream_id, path):
+    time.sleep(self._mock.delay_seconds)
+    page = self._mock.page_for_path(path)
+    status = b'200' if page is not None else b'404'
+    page = page or b''
+    try:
+      with self._cond:
+        self._conn.send_headers(stream_id, [
+            (b':status', status),
+            (b'content-type', b'text/html'),
+            (b'content-length', str(len(page)).encode('ascii'))],
+            end_stream=not page)
+        self._flush()
+        sent = 0
+        while sent < len(page):
+          window = min(self._conn.local_flow_control_window(stream_id),
+                       self._conn.max_outbound_frame_size)
+          if window <= 0:
+            if self._closed:
+              return
+            self._cond.wait()
+            continue
+          chunk = page[sent:sent + window]
+          sent += len(chunk)
+          self._conn.send_data(stream_id, chunk,
+                               end_stream=sent == len(page))
+          self._flush()
+    except (OSError, h2.exceptions.ProtocolError):
+      pass
@@ -0,0 +1,154 @@
+"""Per-domain request rate limiting and retry backoff for roster downloads.
+
+Classes:
+  TokenBucket: Limits the request rate to a single domain.
+  DomainScheduler: Hands out a TokenBucket per domain and computes the delay
+      before retrying a failed request.
+"""
+import email.utils
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+# HTTP status codes that usually clear up on their own, so the request is
+# worth retrying.
+RETRY_STATUS_CODES = frozenset([429, 502, 503, 504])
+
+
+def parse_retry_after(value):
+  """Converts a Retry-After header value into a number of seconds.
+
+  Arguments:
+    value: A string of the header value. It is either a number of seconds or an
+        HTTP date.
+
+  Returns:
+    A float of the seconds to wait, or None if the value can't be parsed.
+  """
+  if not value:
+    return None
+  value = value.strip()
+  if value.isdigit():
+    return float(value)
+  try:
+    retry_date = email.utils.parsedate_to_datetime(value)
+  except (TypeError, ValueError):
+    return None
+  if retry_date is None:
+    return None
+  return max(0.0, retry_date.timestamp() - time.time())
+
+
+class TokenBucket(object):
+  """Token bucket that limits how often requests are sent to one domain.
+
+  Attributes:
+    rate: A float of the tokens added per second.
+    capacity: A float of the maximum number of tokens, i.e. the burst size.
+  """
+
+  def __init__(self, rate, capacity=1.0, clock=time.monotonic,
+               sleep=time.sleep):
+    self.rate = rate
+    self.capacity = capacity
+    self._clock = clock
+    self._sleep = sleep
+    self._tokens = capacity
+    self._updated = clock()
+    self._paused_until = 0.0
+    self._lock = threading.Lock()
+
+  def _refill(self, now):
+    elapsed = max(0.0, now - self._updated)
+    self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+    self._updated = now
+
+  def acquire(self):
+    """Blocks until a request may be sent to the domain."""
+    while True:
+      with self._lock:
+        now = self._clock()
+        self._refill(now)
+        if now < self._paused_until:
+          wait = self._paused_until - now
+        elif self._tokens >= 1:
+          self._tokens -= 1
+          return
+        else:
+          wait = (1 - self._tokens) / self.rate
+      self._sleep(wait)
+
+  def pause(self, seconds):
+    """Holds back all requests to the domain for the number of seconds."""
+    with self._lock:
+      self._paused_until = max(self._paused_until, self._clock() + seconds)
+      self._tokens = 0.0
+
+
+class DomainScheduler(object):
+  """Enforces a per-domain request rate and computes retry backoff delays.
+
+  Attributes:
+    rate: A float of the requests per second allowed for each domain.
+    burst: A float of how many requests may be sent back to back to a domain.
+    max_retries: An int of how many times a transient failure is retried.
+    backoff_base: A float of the seconds to wait before the first retry. Each
+        further retry doubles the delay.
+    backoff_max: A float of the maximum seconds to wait between retries.
+    max_retry_after: A float of the longest Retry-After delay that is honored.
+        Servers asking for a longer delay are not retried.
+  """
+
+  def __init__(self, rate=1.0, burst=1.0, max_retries=3, backoff_base=1.0,
+               backoff_max=60.0, max_retry_after=120.0, clock=time.monotonic,
+               sleep=time.sleep):
+    self.rate = rate
+    self.burst = burst
+    self.max_retries = max_retries
+    self.backoff_base = backoff_base
+    self.backoff_max = backoff_max
+    self.max_retry_after = max_retry_after
+    self._clock = clock
+    self._sleep = sleep
+    self._buckets = {}
+    self._lock = threading.Lock()
+
+  def _bucket(self, url):
+    domain = urlparse(url).netloc
+    with self._lock:
+      if domain not in self._buckets:
+        self._buckets[domain] = TokenBucket(self.rate, self.burst,
+                                            clock=self._clock,
+                                            sleep=self._sleep)
+      return self._buckets[domain]
+
+  def wait_for_turn(self, url):
+    """Blocks until a request to the domain of the url may be sent."""
+    self._bucket(url).acquire()
+
+  def backoff_delay(self, attempt, retry_after=None):
+    """Returns the seconds to wait before retrying a failed request.
+
+    Arguments:
+      attempt: An int of the zero-based attempt number that just failed.
+      retry_after: An optional float of the seconds the server asked us to
+          wait with the Retry-After header.
+
+    Returns:
+      A float of the seconds to wait, or None if the request should not be
+      retried.
+    """
+    if attempt >= self.max_retries:
+      return None
+    if retry_after is not None:
+      if retry_after > self.max_retry_after:
+        return None
+      return retry_after
+    delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+    # Jitter the delay so that retries to the same domain don't line up.
+    return random.uniform(delay / 2, delay)
+
+  def pause_domain(self, url, seconds):
+    """Holds back all requests to the domain of the url."""
+    self._bucket(url).pause(seconds)
@@ -0,0 +1,80 @@
+"""Unit tests for politeness.py"""
+import unittest
+from unittest import mock
+
+import politeness
+
+
+class FakeClock(object):
+  """A clock that only moves forward when something sleeps."""
+
+  def __init__(self):
+    self.now = 100.0
+
+  def time(self):
+    return self.now
+
+  def sleep(self, seconds):
+    self.now += seconds
+
+
+class PolitenessTest(unittest.TestCase):
+
+  def test_parse_retry_after_seconds(self):
+    self.assertEqual(30.0, politeness.parse_retry_after('30'))
+
+  def test_parse_retry_after_http_date(self):
+    with mock.patch('politeness.time') as mock_time:
+      # Wed, 21 Oct 2015 07:28:00 GMT
+      mock_time.time.return_value = 1445412470.0
+      actual = politeness.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT')
+    self.assertEqual(10.0, actual)
+
+  def test_parse_retry_after_invalid(self):
+    self.assertIsNone(politeness.parse_retry_after(None))
+    self.assertIsNone(politeness.parse_retry_after('soon'))
+
+  def test_token_bucket_limits_rate(self):
+    clock = FakeClock()
+    bucket = politeness.TokenBucket(2.0, 1.0, clock=clock.time,
+                                    sleep=clock.sleep)
+    for _ in range(5):
+      bucket.acquire()
+    # The first token is free, the other 4 arrive at 2 tokens per second.
+    self.assertAlmostEqual(102.0, clock.now)
+
+  def test_token_bucket_pause(self):
+    clock = FakeClock()
+    bucket = politeness.TokenBucket(10.0, 1.0, clock=clock.time,
+                                    sleep=clock.sleep)
+    bucket.pause(5.0)
+    bucket.acquire()
+    self.assertGreaterEqual(clock.now, 105.0)
+
+  def test_domain_scheduler_uses_one_bucket_per_domain(self):
+    clock = FakeClock()
+    scheduler = politeness.DomainScheduler(rate=1.0, clock=clock.time,
+                                           sleep=clock.sleep)
+    scheduler.wait_for_turn('https://gostanford.com/roster.aspx?path=wsoc')
+    scheduler.wait_for_turn('https://goheels.com/roster.aspx?path=wsoc')
+    self.assertEqual(100.0, clock.now)
+    scheduler.wait_for_turn('https://gostanford.com/schedule.aspx')
+    self.assertEqual(101.0, clock.now)
+
+  def test_backoff_delay(self):
+    scheduler = politeness.DomainScheduler(max_retries=3, backoff_base=1.0,
+                                           backoff_max=3.0)
+    for attempt, max_delay in enumerate([1.0, 2.0, 3.0]):
+      delay = scheduler.backoff_delay(attempt)
+      self.assertGreaterEqual(delay, max_delay / 2)
+      self.assertLessEqual(delay, max_delay)
+    self.assertIsNone(scheduler.backoff_delay(3))
+
+  def test_backoff_delay_retry_after(self):
+    scheduler = politeness.DomainScheduler(max_retry_after=60.0)
+    self.assertEqual(45.0, scheduler.backoff_delay(0, retry_after=45.0))
+    self.assertIsNone(scheduler.backoff_delay(0, retry_after=3600.0))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,67 @@
+"""Persistent JSON cache of slow lookups, such as Google search results.
+
+Each entry is stored with the time it was saved so stale entries can be
+refreshed after a time-to-live (TTL) expires.
+"""
+import json
+import os
+import threading
+import time
+
+
+class QueryCache(object):
+  """A JSON file of {key: {'saved': timestamp, 'value': value}} entries.
+
+  Attributes:
+    file_path: A string of the cache file path.
+    ttl_seconds: A number of seconds an entry stays valid, or None if entries
+        never expire.
+  """
+
+  def __init__(self, file_path, ttl_seconds=None):
+    self.file_path = file_path
+    self.ttl_seconds = ttl_seconds
+    self._entries = {}
+    self._lock = threading.Lock()
+    if os.path.exists(file_path):
+      with open(file_path, 'r', encoding='utf-8') as fo:
+        self._entries = json.load(fo)
+
+  def get(self, key, ignore_ttl=False):
+    """Returns the cached value of the key.
+
+    Arguments:
+      key: A string of the cache key.
+      ignore_ttl: If True, return the value even if it has expired.
+
+    Returns:
+      The cached value, or None if the key is missing or has expired.
+    """
+    with self._lock:
+      entry = self._entries.get(key)
+    if entry is None:
+      return None
+    if (not ignore_ttl and self.ttl_seconds is not None and
+        time.time() - entry['saved'] > self.ttl_seconds):
+      return None
+    return entry['value']
+
+  def put(self, key, value):
+    """Caches the value and saves the cache file.
+
+    Arguments:
+      key: A string of the cache key.
+      value: A JSON serializable value.
+    """
+    with self._lock:
+      self._entries[key] = {'saved': time.time(), 'value': value}
+      self._save()
+
+  def _save(self):
+    dir_path = os.path.dirname(self.file_path)
+    if dir_path:
+      os.makedirs(dir_path, exist_ok=True)
+    tmp_path = self.file_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as fw:
+      json.dump(self._entries, fw, indent=2, sort_keys=True)
+    os.replace(tmp_path, self.file_path)
@@ -0,0 +1,40 @@
+"""Unit tests for query_cache.py"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import query_cache
+
+
+class QueryCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.file_path = os.path.join(self.tmp_dir.name, 'cache.json')
+
+  def tearDown(self):
+    self.tmp_dir.cleanup()
+
+  def test_put_persists_between_instances(self):
+    cache = query_cache.QueryCache(self.file_path)
+    cache.put("Navy women's soccer roster", ['https://navysports.com'])
+    reloaded = query_cache.QueryCache(self.file_path)
+    self.assertEqual(['https://navysports.com'],
+                     reloaded.get("Navy women's soccer roster"))
+    self.assertIsNone(reloaded.get("Army women's soccer roster"))
+
+  @mock.patch('query_cache.time')
+  def test_get_expired_entry(self, mock_time):
+    mock_time.time.return_value = 1000.0
+    cache = query_cache.QueryCache(self.file_path, ttl_seconds=60)
+    cache.put('query', ['result'])
+    mock_time.time.return_value = 1030.0
+    self.assertEqual(['result'], cache.get('query'))
+    mock_time.time.return_value = 1100.0
+    self.assertIsNone(cache.get('query'))
+    self.assertEqual(['result'], cache.get('query', ignore_ttl=True))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,108 @@
+"""Logging that doesn't block the threads that log.
+
+basic_config() sets up the root logger like logging.basicConfig(), but the
+root logger only puts each record on a queue. A listener thread formats the
+records and writes them to the log file, so the file writes and the message
+formatting don't hold up downloading or parsing.
+
+Worker processes log through a multiprocessing queue to the same listener
+thread: worker_queue() makes the queue in the parent, and each worker calls
+worker_config() with it.
+"""
+import atexit
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+
+# The listener started by basic_config(), and its handler.
+_listener = None
+_handler = None
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+  """Puts records on the queue as they are.
+
+  logging.handlers.QueueHandler formats the message before queueing it, so
+  that records can be pickled. The queue here never leaves the process, so
+  the formatting is left to the listener thread.
+  """
+
+  def prepare(self, record):
+    return record
+
+
+class _QueueListener(logging.handlers.QueueListener):
+  """A QueueListener that can be stopped more than once."""
+
+  def stop(self):
+    if self._thread is not None:
+      super().stop()
+
+
+def basic_config(level=logging.WARNING, format=None, datefmt=None,
+                 filename=None, filemode='a'):
+  """Sets up the root logger to log through a queue.
+
+  Arguments:
+    level: The level of the root logger.
+    format: A format string of the log lines.
+    datefmt: A date format string of the log lines.
+    filename: A string of the log file. Logs to stderr if None.
+    filemode: The mode to open the log file with.
+
+  Returns:
+    The started logging.handlers.QueueListener. It's stopped when the process
+    exits, or when basic_config() is called again, which writes out any
+    records still on the queue.
+  """
+  global _listener, _handler
+  if filename:
+    handler = logging.FileHandler(filename, filemode, encoding='utf-8')
+  else:
+    handler = logging.StreamHandler()
+  handler.setFormatter(logging.Formatter(format, datefmt))
+  log_queue = queue.SimpleQueue()
+  root = logging.getLogger()
+  for h in list(root.handlers):
+    root.removeHandler(h)
+  root.addHandler(_QueueHandler(log_queue))
+  root.setLevel(level)
+  listener = _QueueListener(log_queue, handler)
+  listener.start()
+  atexit.register(listener.stop)
+  if _listener is not None:
+    # Writes out the records queued before the root logger was set up again.
+    _listener.stop()
+    _handler.close()
+  _listener, _handler = listener, handler
+  return listener
+
+
+def worker_queue():
+  """Returns a multiprocessing queue for worker processes to log through, or
+  None if basic_config() wasn't called.
+
+  The records on the queue are written by the handler of basic_config().
+  """
+  if _handler is None:
+    return None
+  log_queue = multiprocessing.Queue()
+  listener = _QueueListener(log_queue, _handler, respect_handler_level=True)
+  listener.start()
+  atexit.register(listener.stop)
+  return log_queue
+
+
+def worker_config(log_queue, level=logging.WARNING):
+  """Sets up the root logger of a worker process to log through a queue
+  from worker_queue(). Does nothing if the queue is None.
+  """
+  if log_queue is None:
+    return
+  root = logging.getLogger()
+  for h in list(root.handlers):
+    root.removeHandler(h)
+  # The records are pickled, so they are formatted before they are queued.
+  root.addHandler(logging.handlers.QueueHandler(log_queue))
+  root.setLevel(level)
@@ -0,0 +1,47 @@
+"""Unit tests for queue_logging.py"""
+import logging
+import os
+import tempfile
+import unittest
+
+import queue_logging
+
+
+class QueueLoggingTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.root = logging.getLogger()
+    self.saved = (self.root.level, list(self.root.handlers))
+
+  def tearDown(self):
+    level, handlers = self.saved
+    for h in list(self.root.handlers):
+      self.root.removeHandler(h)
+    for h in handlers:
+      self.root.addHandler(h)
+    self.root.setLevel(level)
+    self.tmp_dir.cleanup()
+
+  def test_basic_config(self):
+    file_path = os.path.join(self.tmp_dir.name, 'convert.log')
+    listener = queue_logging.basic_config(level=logging.INFO,
+                                          format='%(levelname)s %(message)s',
+                                          filename=file_path, filemode='w')
+    logger = logging.getLogger('queue_logging_test')
+    logger.debug('Dropped %s', 'record')
+    logger.info('Parsed %d players of %s', 26, 'UTSA')
+    try:
+      raise ValueError('Bad page')
+    except ValueError:
+      logger.exception('Failed')
+    listener.stop()
+    with open(file_path, 'r') as fo:
+      lines = fo.read().splitlines()
+    self.assertEqual(['INFO Parsed 26 players of UTSA', 'ERROR Failed'],
+                     lines[:2])
+    self.assertEqual('ValueError: Bad page', lines[-1])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,5 +1,7 @@
 """Utility for file operations."""
+import contextlib
 import csv
+import mmap
 import os
 
 def read_school_info_file(file_name, school_filter=None):
@@ -43,6 +45,21 @@ def read_school_info_file(file_name, school_filter=None):
   return schools, locations, states, types, nicknames, conferences, urls
 
 
+def read_school_rows(file_name):
+  """Reads a school information CSV file into a dict of rows.
+
+  Arguments:
+    file_name: A string of the file name to read from.
+
+  Returns:
+    A dict that maps each school name to a dict of its CSV columns, in the
+    order the schools appear in the file.
+  """
+  with open(file_name, 'r') as school_info_csv:
+    reader = csv.DictReader(school_info_csv)
+    return {row['Institution']: dict(row) for row in reader}
+
+
 def read_file(file_path):
   """Reads and returns the contents of the specificed file.
 
@@ -56,6 +73,28 @@ def read_file(file_path):
     return fo.read()
 
 
+@contextlib.contextmanager
+def map_file(file_path):
+  """Memory-maps the specified file for reading.
+
+  The file content is paged in by the OS as it is read, instead of being copied
+  into a Python string up front.
+
+  Arguments:
+    file_path: A string of the file to open.
+
+  Yields:
+    A read-only mmap.mmap of the file content, or empty bytes for an empty
+    file, which can't be memory-mapped.
+  """
+  with open(file_path, 'rb') as fo:
+    if os.fstat(fo.fileno()).st_size == 0:
+      yield b''
+      return
+    with mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+      yield mapped
+
+
 def write_file(file_name, content, dir_path=None):
   """Saves content into specificed file. Creates sub-directories if needed.
 
@@ -26,6 +26,16 @@ class RosterFileUtilTest(unittest.TestCase):
       print(actual)
       self.assertTrue(False)
 
+  def test_read_school_rows(self):
+    with mock.patch('roster_file_util.open',
+                    mock.mock_open(read_data=TEST_CSV)):
+      actual = roster_file_util.read_school_rows('fake_file')
+    self.assertEqual(['School 1', 'Abilene Christian', 'Air Force', 'Akron'],
+                     list(actual.keys()))
+    self.assertEqual('https://gozips.com/roster.aspx?roster=206&path=wsoc',
+                     actual['Akron']['Url'])
+    self.assertEqual('Southland', actual['Abilene Christian']['Conference'])
+
   def test_write_file(self):
     mo = mock_open()
     with mock.patch('roster_file_util.open', mo):
@@ -0,0 +1,232 @@
+"""Locates the roster section of known roster page layouts in raw HTML.
+
+Most of a roster web page is navigation, scripts and sponsor markup. For the
+SidearmSports layouts, every player sits inside a single element:
+  sidearm: The <ul class="sidearm-roster-players"> list parsed by
+      ncaa_roster_parser.SidearmSportsSidearmClassNameProcessor.
+  dgrd: The <table class="default_dgrd ..."> grid parsed by
+      ncaa_roster_parser.SidearmSportsDgrdProcessor.
+SportSelect pages keep their players in a single element as well:
+  sportselect: The <div id="roster-grid-layout"> parsed by
+      ncaa_roster_parser.SportSelectProcessor.
+
+Functions here work on str, bytes or mmap content, so they can run on pages
+while they are being downloaded or before they are parsed.
+"""
+import re
+
+# The longest closing tag, e.g. "</table >", used so that a tag split across
+# two downloaded chunks is still found.
+_MAX_END_TAG_LEN = 16
+# How far back to search for an opening tag that was split across chunks.
+_MAX_START_TAG_LEN = 1024
+# How far past a closed roster section a section of a preferred layout is
+# looked for. A second rendering of the roster follows the first closely.
+LOOKAHEAD_BYTES = 32 * 1024
+
+
+class RosterLayout(object):
+  """The opening tag and element of the roster section of one page layout.
+
+  Attributes:
+    name: A string naming the layout.
+    tag: A string of the element name that contains every player.
+    start_pattern: A regex string that matches the opening tag of the element.
+  """
+
+  def __init__(self, name, tag, start_pattern):
+    self.name = name
+    self.tag = tag
+    self.start_pattern = start_pattern
+    tag_pattern = r'<(/?)%s\b' % tag
+    self._start = {str: re.compile(start_pattern, re.I),
+                   bytes: re.compile(start_pattern.encode('ascii'), re.I)}
+    self._tags = {str: re.compile(tag_pattern, re.I),
+                  bytes: re.compile(tag_pattern.encode('ascii'), re.I)}
+
+  def start_regex(self, data):
+    return self._start[str if isinstance(data, str) else bytes]
+
+  def tag_regex(self, data):
+    return self._tags[str if isinstance(data, str) else bytes]
+
+
+LAYOUTS = (
+  RosterLayout('sidearm', 'ul',
+               r'<ul\b[^>]*\bsidearm-roster-players(?![\w-])'),
+  RosterLayout('dgrd', 'table', r'<table\b[^>]*\bdefault_dgrd(?![\w-])'),
+)
+# The layouts in the order the converter prefers them when a page has
+# sections of several, like the priorities of processor_registry.py.
+LAYOUTS_BY_PRIORITY = (LAYOUTS[1], LAYOUTS[0])
+SPORTSELECT_LAYOUT = RosterLayout(
+    'sportselect', 'div',
+    r'<div\b[^>]*\bid=["\']?roster-grid-layout(?![\w-])')
+
+
+def find_section_start(data, layouts=LAYOUTS, pos=0):
+  """Finds the first opening tag of a known roster section.
+
+  Arguments:
+    data: The str, bytes or mmap page content.
+    layouts: A sequence of RosterLayout instances to look for.
+    pos: An int of the index to start searching from.
+
+  Returns:
+    A tuple of (layout, start index), or (None, None) if none was found.
+  """
+  best_layout = best_start = None
+  for layout in layouts:
+    m = layout.start_regex(data).search(data, pos)
+    if m and (best_start is None or m.start() < best_start):
+      best_layout, best_start = layout, m.start()
+  return best_layout, best_start
+
+
+def find_section_end(data, layout, start):
+  """Finds the end of the roster element that opens at the start index.
+
+  Nested elements of the same tag name are skipped.
+
+  Arguments:
+    data: The str, bytes or mmap page content.
+    layout: The RosterLayout of the section.
+    start: An int of the index of the section's opening tag.
+
+  Returns:
+    An int of the index just past the closing tag, or None if the element is
+    not closed in the data.
+  """
+  scanner = SectionEndScanner(layout, start)
+  return scanner.scan(data)
+
+
+def slice_section(data, layouts=LAYOUTS):
+  """Cuts the first roster section of a known layout out of a page.
+
+  Arguments:
+    data: The str, bytes or mmap page content.
+    layouts: A sequence of RosterLayout instances to look for.
+
+  Returns:
+    The str or bytes of the roster element, from its opening tag through its
+    closing tag, or None if no section was found or it isn't closed.
+  """
+  layout, start = find_section_start(data, layouts)
+  if layout is None:
+    return None
+  end = find_section_end(data, layout, start)
+  if end is None:
+    return None
+  return data[start:end]
+
+
+class SectionEndScanner(object):
+  """Incrementally counts nested tags until a roster element is closed."""
+
+  def __init__(self, layout, start):
+    self.layout = layout
+    self._pos = start
+    self._depth = 0
+
+  def scan(self, data):
+    """Scans the data received so far.
+
+    Arguments:
+      data: The str, bytes or mmap page content received so far. Each call
+          must pass the same content, possibly with more data appended.
+
+    Returns:
+      An int of the index just past the closing tag, or None if the element is
+      not closed yet.
+    """
+    last_end = self._pos
+    for m in self.layout.tag_regex(data).finditer(data, self._pos):
+      last_end = m.end()
+      if m.group(1):
+        self._depth -= 1
+        if self._depth <= 0:
+          close = data.find(b'>' if not isinstance(data, str) else '>',
+                            m.end())
+          if close == -1:
+            # The rest of the closing tag hasn't arrived yet.
+            self._depth += 1
+            self._pos = m.start()
+            return None
+          return close + 1
+      else:
+        self._depth += 1
+    self._pos = max(last_end, len(data) - _MAX_END_TAG_LEN)
+    return None
+
+
+class RosterEndDetector(object):
+  """Detects the end of the roster section while a page is downloaded.
+
+  A page can have sections of several layouts, e.g. a sidearm list followed
+  by a dgrd table, and the converter reads it with the processor of the
+  layout it prefers (see processor_registry.py), not of the first section.
+  So once a section is closed, the next lookahead bytes are still read for a
+  section of a layout that is preferred to it. The end is reported after a
+  section of the most preferred layout, or after the lookahead when no
+  preferred section starts in it.
+
+  Pages of layouts with no known roster section are never reported as done.
+  """
+
+  def __init__(self, layouts=LAYOUTS_BY_PRIORITY, lookahead=LOOKAHEAD_BYTES):
+    """
+    Arguments:
+      layouts: A sequence of RosterLayout instances to look for, the most
+          preferred first.
+      lookahead: An int of the bytes after a closed section that are read
+          for the start of a section of a preferred layout.
+    """
+    self.layouts = layouts
+    self.layout = None
+    self.lookahead = lookahead
+    self._candidates = layouts
+    self._searched = 0
+    self._search_from = 0
+    self._scanner = None
+    # The layout and end of the last closed section.
+    self._closed = None
+
+  def feed(self, body):
+    """Checks the body received so far.
+
+    Arguments:
+      body: The bytes or bytearray of the page received so far.
+
+    Returns:
+      An int of the index just past the roster section once it has been
+      received and no section of a preferred layout can follow, otherwise
+      None.
+    """
+    while True:
+      if self._scanner is None:
+        pos = max(self._search_from, self._searched - _MAX_START_TAG_LEN)
+        layout, start = find_section_start(body, self._candidates, pos)
+        self._searched = len(body)
+        if self._closed is not None:
+          give_up_at = self._closed[1] + self.lookahead
+          if layout is None and len(body) >= give_up_at or (
+              layout is not None and start >= give_up_at):
+            # No preferred section follows closely enough.
+            self.layout, end = self._closed
+            return end
+        if layout is None:
+          return None
+        self.layout = layout
+        self._scanner = SectionEndScanner(layout, start)
+      end = self._scanner.scan(body)
+      if end is None:
+        return None
+      self._candidates = self._candidates[:self._candidates.index(
+          self.layout)]
+      if not self._candidates:
+        return end
+      # Looks for a section of a preferred layout after this one.
+      self._closed = self.layout, end
+      self._scanner = None
+      self._search_from = end
@@ -0,0 +1,107 @@
+"""Unit tests for roster_markers.py"""
+import unittest
+
+from parameterized import parameterized
+
+import roster_markers
+
+SIDEARM_HTML = ('<html><div class="sidearm-roster-players-container">'
+                '<ul class="sidearm-roster-players">'
+                '<li class="sidearm-roster-player"><ul><li>A</li></ul></li>'
+                '<li class="sidearm-roster-player">B</li>'
+                '</ul><ul class="footer"></ul></html>')
+DGRD_HTML = ('<html><table class="default_dgrd roster_dgrd">'
+             '<tr class="default_dgrd_item"><td>A</td></tr></table >'
+             '<table class="default_dgrd roster_coaches_dgrd"></table></html>')
+
+
+class RosterMarkersTest(unittest.TestCase):
+
+  def test_find_section_sidearm(self):
+    layout, start = roster_markers.find_section_start(SIDEARM_HTML)
+    self.assertEqual('sidearm', layout.name)
+    self.assertTrue(SIDEARM_HTML[start:].startswith(
+        '<ul class="sidearm-roster-players">'))
+    end = roster_markers.find_section_end(SIDEARM_HTML, layout, start)
+    self.assertTrue(SIDEARM_HTML[:end].endswith('<li class="sidearm-roster-'
+                                                'player">B</li></ul>'))
+
+  def test_find_section_dgrd_bytes(self):
+    data = DGRD_HTML.encode('utf-8')
+    layout, start = roster_markers.find_section_start(data)
+    self.assertEqual('dgrd', layout.name)
+    end = roster_markers.find_section_end(data, layout, start)
+    self.assertTrue(data[:end].endswith(b'</td></tr></table >'))
+
+  def test_find_section_not_found(self):
+    self.assertEqual((None, None), roster_markers.find_section_start(
+        '<html><table class="roster"></table></html>'))
+
+  def test_slice_section(self):
+    self.assertEqual(DGRD_HTML[DGRD_HTML.index('<table'):
+                               DGRD_HTML.index('<table class="default_dgrd '
+                                               'roster_coaches')],
+                     roster_markers.slice_section(DGRD_HTML))
+    sportselect_html = ('<div id="roster-list-layout"></div>'
+                        '<div class="active" id="roster-grid-layout">'
+                        '<div class="player left"><div>A</div></div></div>')
+    self.assertEqual(sportselect_html[sportselect_html.index('<div class='):],
+                     roster_markers.slice_section(
+                         sportselect_html,
+                         [roster_markers.SPORTSELECT_LAYOUT]))
+
+  def test_slice_section_not_closed(self):
+    self.assertIsNone(roster_markers.slice_section(
+        SIDEARM_HTML[:SIDEARM_HTML.index('</ul><ul')]))
+    self.assertIsNone(roster_markers.slice_section('<html></html>'))
+
+  def test_roster_end_detector_in_small_chunks(self):
+    data = SIDEARM_HTML.encode('utf-8')
+    detector = roster_markers.RosterEndDetector()
+    body = bytearray()
+    end = None
+    for i in range(0, len(data), 3):
+      body.extend(data[i:i + 3])
+      end = detector.feed(body)
+      if end is not None:
+        break
+    # A dgrd table could still follow the list.
+    self.assertIsNone(end)
+    self.assertEqual('sidearm', detector.layout.name)
+
+  def test_roster_end_detector_sidearm_only(self):
+    html = SIDEARM_HTML + '<footer>' + 'x' * 200 + '</footer>' + DGRD_HTML
+    data = html.encode('utf-8')
+    detector = roster_markers.RosterEndDetector(lookahead=100)
+    body = bytearray()
+    end = None
+    for i in range(0, len(data), 7):
+      body.extend(data[i:i + 7])
+      end = detector.feed(body)
+      if end is not None:
+        break
+    # The dgrd table starts after the lookahead, so it's never read.
+    self.assertEqual('sidearm', detector.layout.name)
+    self.assertEqual(SIDEARM_HTML.index('<ul class="footer">'), end)
+    self.assertLess(len(body), html.index('<table'))
+
+  @parameterized.expand([
+    (SIDEARM_HTML[:SIDEARM_HTML.index('<ul class="footer">')] + DGRD_HTML,),
+    (DGRD_HTML + SIDEARM_HTML,),
+  ])
+  def test_roster_end_detector_both_layouts(self, html):
+    data = html.encode('utf-8')
+    detector = roster_markers.RosterEndDetector()
+    body = bytearray()
+    end = None
+    for i in range(0, len(data), 7):
+      body.extend(data[i:i + 7])
+      end = detector.feed(body)
+      if end is not None:
+        break
+    self.assertEqual('dgrd', detector.layout.name)
+    self.assertTrue(html[:end].endswith('<td>A</td></tr></table >'))
+
+
+if __name__ == '__main__':
+  unittest.main()
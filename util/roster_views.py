@@ -0,0 +1,47 @@
+"""Lighter views of roster pages that hold the same roster.
+
+SidearmSports roster pages carry the site navigation, scripts and sponsor
+markup of every page of the site. The same roster is served without them by
+the print view that each roster page links to, e.g.
+  https://goutsa.com/roster.aspx?path=wsoc&print=true
+"""
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+PRINT_PARAM = 'print'
+
+
+def _replace_print_param(url, value):
+  parts = urlparse(url)
+  params = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if k.lower() != PRINT_PARAM]
+  if value is not None:
+    params.append((PRINT_PARAM, value))
+  return urlunparse(parts._replace(query=urlencode(params)))
+
+
+def light_view_url(url):
+  """Returns the url of the print view of a roster page.
+
+  Arguments:
+    url: A string of the roster page url.
+
+  Returns:
+    A string of the print view url, or None if the layout of the page has no
+    known lighter view.
+  """
+  if not urlparse(url).path.lower().endswith('roster.aspx'):
+    return None
+  return _replace_print_param(url, 'true')
+
+
+def is_light_view_url(url):
+  """Returns True if the url is of the print view of a roster page."""
+  parts = urlparse(url)
+  return any(k.lower() == PRINT_PARAM for k, _ in parse_qsl(parts.query))
+
+
+def full_view_url(url):
+  """Returns the url of the roster page a print view url was made from."""
+  if not is_light_view_url(url):
+    return url
+  return _replace_print_param(url, None)
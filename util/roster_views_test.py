@@ -0,0 +1,36 @@
+"""Unit tests for roster_views.py"""
+import unittest
+
+from parameterized import parameterized
+
+import roster_views
+
+
+class RosterViewsTest(unittest.TestCase):
+
+  @parameterized.expand([
+    ('https://goutsa.com/roster.aspx?path=wsoc',
+     'https://goutsa.com/roster.aspx?path=wsoc&print=true'),
+    ('https://lionsports.net/roster.aspx?roster=180&path=wsoc&print=false',
+     'https://lionsports.net/roster.aspx?roster=180&path=wsoc&print=true'),
+    ('https://www.gopoly.com/sports/wsoc/2018-19/roster', None),
+    ('http://huskers.com/SportSelect.aspx?SPID=11', None),
+  ])
+  def test_light_view_url(self, url, expected):
+    self.assertEqual(expected, roster_views.light_view_url(url))
+
+  def test_full_view_url(self):
+    light_url = roster_views.light_view_url(
+        'https://goutsa.com/roster.aspx?path=wsoc')
+    self.assertTrue(roster_views.is_light_view_url(light_url))
+    self.assertEqual('https://goutsa.com/roster.aspx?path=wsoc',
+                     roster_views.full_view_url(light_url))
+    self.assertFalse(roster_views.is_light_view_url(
+        'https://goutsa.com/roster.aspx?path=wsoc'))
+    self.assertEqual('https://goutsa.com/roster.aspx?path=wsoc',
+                     roster_views.full_view_url(
+                         'https://goutsa.com/roster.aspx?path=wsoc'))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,155 @@
+"""Collects counters and timings for a pipeline stage and saves them as JSON.
+
+Each script keeps a module level RunReport instance, updates it while it runs,
+and writes it to a file when it finishes so schedulers can alert on throughput
+or yield regressions without grepping the log files.
+"""
+import collections
+import contextlib
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, pct):
+  """Returns the nearest-rank percentile of a list of numbers.
+
+  Arguments:
+    values: A list of numbers.
+    pct: A number between 0 and 100.
+
+  Returns:
+    The value at the requested percentile, or None if values is empty.
+  """
+  if not values:
+    return None
+  ordered = sorted(values)
+  rank = max(1, -(-len(ordered) * pct // 100))
+  return ordered[min(rank, len(ordered)) - 1]
+
+
+class RunReport(object):
+  """Thread-safe collection of run metrics for one pipeline stage.
+
+  Attributes:
+    stage: A string of the stage name, e.g. "download".
+    counters: A dict of counter names to integer totals.
+    histograms: A dict of histogram names to dicts of {bucket: count}.
+    tallies: A dict of tally names to dicts of {key: value}, e.g. the number
+        of players extracted for each school.
+    durations: A dict of timed step names to seconds.
+  """
+
+  def __init__(self, stage):
+    self.stage = stage
+    self.started = time.time()
+    self.counters = collections.Counter()
+    self.histograms = collections.defaultdict(collections.Counter)
+    self.tallies = collections.defaultdict(dict)
+    self.durations = {}
+    self._latencies = collections.defaultdict(list)
+    self._lock = threading.Lock()
+
+  def increment(self, name, amount=1):
+    with self._lock:
+      self.counters[name] += amount
+
+  def add_to_histogram(self, name, bucket):
+    with self._lock:
+      self.histograms[name][str(bucket)] += 1
+
+  def set_tally(self, name, key, value):
+    with self._lock:
+      self.tallies[name][key] = value
+
+  def add_to_tally(self, name, key, amount=1):
+    with self._lock:
+      self.tallies[name][key] = self.tallies[name].get(key, 0) + amount
+
+  def record_latency(self, url, seconds):
+    """Records the latency of a request against the host of the url."""
+    host = urlparse(url).netloc or url
+    with self._lock:
+      self._latencies[host].append(seconds)
+
+  @contextlib.contextmanager
+  def timer(self, name):
+    """Context manager that records the duration of the enclosed block."""
+    start = time.time()
+    try:
+      yield
+    finally:
+      with self._lock:
+        self.durations[name] = round(time.time() - start, 3)
+
+  def snapshot(self):
+    """Returns a tuple of (counters, histograms, tallies) dicts, e.g. to send
+    the metrics of a worker process to merge().
+    """
+    with self._lock:
+      return (dict(self.counters),
+              {k: dict(v) for k, v in self.histograms.items()},
+              {k: dict(v) for k, v in self.tallies.items()})
+
+  def merge(self, snapshot):
+    """Adds the metrics of a snapshot() to these.
+
+    Tally values are added as well, so a key that is set with set_tally()
+    must only be in one of the merged snapshots, e.g. a school's key.
+    """
+    counters, histograms, tallies = snapshot
+    with self._lock:
+      self.counters.update(counters)
+      for name, buckets in histograms.items():
+        self.histograms[name].update(buckets)
+      for name, values in tallies.items():
+        tally = self.tallies[name]
+        for key, value in values.items():
+          tally[key] = tally.get(key, 0) + value
+
+  def clear(self):
+    """Drops the counters, histograms and tallies."""
+    with self._lock:
+      self.counters.clear()
+      self.histograms.clear()
+      self.tallies.clear()
+
+  def latency_percentiles(self):
+    """Returns a dict of {host: {'count': n, 'p50': s, 'p90': s, ...}}."""
+    with self._lock:
+      latencies = {h: list(v) for h, v in self._latencies.items()}
+    stats = {}
+    for host, values in latencies.items():
+      host_stats = {'count': len(values)}
+      for pct in PERCENTILES:
+        host_stats['p%d' % pct] = round(percentile(values, pct), 3)
+      host_stats['max'] = round(max(values), 3)
+      stats[host] = host_stats
+    return stats
+
+  def to_dict(self):
+    report = {
+      'stage': self.stage,
+      'started': time.strftime('%Y-%m-%dT%H:%M:%S',
+                               time.localtime(self.started)),
+      'elapsed_seconds': round(time.time() - self.started, 3),
+      'latency_by_host': self.latency_percentiles(),
+    }
+    with self._lock:
+      report['counters'] = dict(self.counters)
+      report['histograms'] = {k: dict(v) for k, v in self.histograms.items()}
+      report['tallies'] = {k: dict(v) for k, v in self.tallies.items()}
+      report['durations'] = dict(self.durations)
+    return report
+
+  def write(self, file_path):
+    """Saves the report as a JSON file.
+
+    Arguments:
+      file_path: A string of the file to write into.
+    """
+    with open(file_path, 'w', encoding='utf-8') as fw:
+      json.dump(self.to_dict(), fw, indent=2, sort_keys=True)
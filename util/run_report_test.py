@@ -0,0 +1,82 @@
+"""Unit tests for run_report.py"""
+import json
+import os
+import tempfile
+import unittest
+
+import run_report
+
+
+class RunReportTest(unittest.TestCase):
+
+  def test_percentile(self):
+    values = [5, 1, 4, 2, 3, 6, 7, 8, 9, 10]
+    self.assertEqual(5, run_report.percentile(values, 50))
+    self.assertEqual(9, run_report.percentile(values, 90))
+    self.assertEqual(10, run_report.percentile(values, 99))
+    self.assertIsNone(run_report.percentile([], 50))
+
+  def test_counters_histograms_and_tallies(self):
+    report = run_report.RunReport('download')
+    report.increment('requests_sent')
+    report.increment('bytes_received', 1024)
+    report.increment('bytes_received', 1024)
+    report.add_to_histogram('status_codes', 200)
+    report.add_to_histogram('status_codes', 200)
+    report.add_to_histogram('status_codes', 503)
+    report.set_tally('players_per_school', 'Stanford', 28)
+    report.add_to_tally('players_per_processor', 'SidearmProcessor', 28)
+    report.add_to_tally('players_per_processor', 'SidearmProcessor', 30)
+    actual = report.to_dict()
+    self.assertEqual('download', actual['stage'])
+    self.assertEqual({'requests_sent': 1, 'bytes_received': 2048},
+                     actual['counters'])
+    self.assertEqual({'status_codes': {'200': 2, '503': 1}},
+                     actual['histograms'])
+    self.assertEqual({'players_per_school': {'Stanford': 28},
+                      'players_per_processor': {'SidearmProcessor': 58}},
+                     actual['tallies'])
+
+  def test_snapshot_merge_and_clear(self):
+    worker = run_report.RunReport('convert')
+    worker.increment('pages_parsed')
+    worker.add_to_histogram('status_codes', 200)
+    worker.set_tally('players_per_school', 'UCLA', 30)
+    worker.add_to_tally('players_per_processor', 'SidearmProcessor', 30)
+    report = run_report.RunReport('convert')
+    report.increment('pages_parsed')
+    report.set_tally('players_per_school', 'Stanford', 28)
+    report.add_to_tally('players_per_processor', 'SidearmProcessor', 28)
+    report.merge(worker.snapshot())
+    self.assertEqual(({'pages_parsed': 2}, {'status_codes': {'200': 1}},
+                      {'players_per_school': {'Stanford': 28, 'UCLA': 30},
+                       'players_per_processor': {'SidearmProcessor': 58}}),
+                     report.snapshot())
+    worker.clear()
+    self.assertEqual(({}, {}, {}), worker.snapshot())
+
+  def test_latency_percentiles_by_host(self):
+    report = run_report.RunReport('download')
+    for seconds in [0.1, 0.2, 0.3, 0.4]:
+      report.record_latency('https://gostanford.com/roster.aspx', seconds)
+    report.record_latency('https://goheels.com/roster.aspx', 1.5)
+    actual = report.latency_percentiles()
+    self.assertEqual({'count': 4, 'p50': 0.2, 'p90': 0.4, 'p99': 0.4,
+                      'max': 0.4}, actual['gostanford.com'])
+    self.assertEqual(1, actual['goheels.com']['count'])
+
+  def test_timer_and_write(self):
+    report = run_report.RunReport('convert')
+    with report.timer('parse'):
+      pass
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      file_path = os.path.join(tmp_dir, 'report.json')
+      report.write(file_path)
+      with open(file_path, 'r', encoding='utf-8') as fo:
+        actual = json.load(fo)
+    self.assertIn('parse', actual['durations'])
+    self.assertEqual('convert', actual['stage'])
+
+
+if __name__ == '__main__':
+  unittest.main()